@@ -0,0 +1,444 @@
+# backtest_kernel.py
+# Shared array-based backtest kernel.
+#
+# Strategies supply boolean entry arrays plus TP/SL distances; the kernel
+# resolves exits for every candidate entry at once (block-wise first-passage
+# search over the close array) and then chains the one-position-at-a-time
+# state with searchsorted, so no strategy needs its own per-bar Python loop.
+#
+# Both runners take an optional `end` bar: entries stop before it and trades
+# still open are closed on bar end - 1, so a strategy can compute indicators on
+# the full history and trade only a window of it (see trading_window).
+#
+# The runners check exits on closes unless given ohlc=(open, high, low). Then
+# they are resolved intrabar: the first bar whose high/low touches TP or SL,
+# filled at the level (or a gapping open) with a bid/ask spread, and a rule for
+# bars that touch both (see resolve_exits). Strategies use intrabar exits
+# unless a combo asks for "fill": "close" (see exit_options).
+
+import numpy as np
+from stage_timer import stage
+from metrics import stats_dicts, bars_per_year
+from tuner_options import FILL_MODES, AMBIGUOUS_RULES
+
+CONTRACT_SIZE = 100000
+INITIAL_BALANCE = 400
+LOT_SIZE = 0.01
+# Exit model strategies use unless a combo sets "fill" (see exit_options)
+DEFAULT_FILL = "intrabar"
+
+
+def trading_window(df):
+    # (first, end) bars a strategy may trade on; walk-forward folds set attrs["window"]
+    lo, hi = df.attrs.get("window", (0, len(df)))
+    return int(lo), int(hi)
+
+
+def first_touch(high, low, entry_idx, upper, lower, horizon=64):
+    # For each entry, the first later bar whose high reaches `upper` or whose low
+    # reaches `lower` (absolute levels, one per entry). Returns (exit bars, upper
+    # touched, lower touched); the exit bar is len(high) when neither level is ever
+    # touched. Bars are searched in blocks that double in size, so quick exits
+    # cost one small block and long trades a few large ones.
+    n = len(high)
+    entry_idx = np.asarray(entry_idx, dtype="int64")
+    upper = np.broadcast_to(np.asarray(upper, dtype="float64"), entry_idx.shape)
+    lower = np.broadcast_to(np.asarray(lower, dtype="float64"), entry_idx.shape)
+    exits = np.full(len(entry_idx), n, dtype="int64")
+    touched_upper = np.zeros(len(entry_idx), dtype=bool)
+    touched_lower = np.zeros(len(entry_idx), dtype=bool)
+
+    pending = np.arange(len(entry_idx))
+    offset = 1
+    while len(pending) and offset < n:
+        e = entry_idx[pending]
+        bars = e[:, None] + np.arange(offset, offset + horizon)[None, :]
+        in_range = bars < n
+        bars = np.minimum(bars, n - 1)
+        highs = high[bars]
+        lows = highs if low is high else low[bars]
+
+        up = (highs >= upper[pending][:, None]) & in_range
+        down = (lows <= lower[pending][:, None]) & in_range
+        hit = up | down
+
+        found = hit.any(axis=1)
+        rows = np.flatnonzero(found)
+        first = hit[rows].argmax(axis=1)
+        exits[pending[rows]] = e[rows] + offset + first
+        touched_upper[pending[rows]] = up[rows, first]
+        touched_lower[pending[rows]] = down[rows, first]
+        pending = pending[~found & in_range[:, -1]]
+        offset += horizon
+        horizon *= 2
+    return exits, touched_upper, touched_lower
+
+
+def first_exit(close, entry_idx, direction, tp, sl, horizon=64):
+    # For each entry, the first later bar whose close reaches TP or SL
+    # (len(close) when the trade never closes)
+    entry_idx = np.asarray(entry_idx, dtype="int64")
+    entry_price = close[entry_idx]
+    long = np.asarray(direction) > 0
+    upper = np.where(long, entry_price + tp, entry_price + sl)
+    lower = np.where(long, entry_price - sl, entry_price - tp)
+    return first_touch(close, close, entry_idx, upper, lower, horizon)[0]
+
+
+def resolve_exits(open_, high, low, close, entry_idx, direction, tp, sl, spread=0.0, ambiguous="sl"):
+    # Intrabar exits from bid OHLC: longs enter at the ask (close + spread) and
+    # exit at the bid, shorts enter at the bid and exit at the ask (bid + spread).
+    # A trade exits on the first later bar whose high/low touches TP or SL, filled
+    # at the level, or at the open when the bar gaps through it. When one bar
+    # touches both, `ambiguous` picks the outcome: "sl" (pessimistic), "tp", or
+    # "ohlc" (an up bar is assumed to trade open -> low -> high -> close).
+    # Returns (exit bars, entry prices, exit prices); unresolved trades exit at len(close).
+    n = len(close)
+    entry_idx = np.asarray(entry_idx, dtype="int64")
+    long = np.asarray(direction) > 0
+    tp = np.broadcast_to(np.asarray(tp, dtype="float64"), entry_idx.shape)
+    sl = np.broadcast_to(np.asarray(sl, dtype="float64"), entry_idx.shape)
+    entry_price = close[entry_idx] + np.where(long, spread, 0.0)
+
+    # TP/SL levels in bid terms: a short's ask touches a level when the bid is `spread` below it
+    take = np.where(long, entry_price + tp, entry_price - tp - spread)
+    stop = np.where(long, entry_price - sl, entry_price + sl - spread)
+    upper = np.where(long, take, stop)
+    lower = np.where(long, stop, take)
+    exits, touched_upper, touched_lower = first_touch(high, low, entry_idx, upper, lower)
+
+    # Which level filled: the only one touched, a level the open already gapped
+    # through, or the ambiguity rule when the bar touched both from inside
+    bar = np.minimum(exits, n - 1)
+    gap_up = touched_upper & (open_[bar] >= upper)
+    gap_down = touched_lower & (open_[bar] <= lower)
+    upper_first = (touched_upper & ~touched_lower) | gap_up
+    both = touched_upper & touched_lower & ~gap_up & ~gap_down
+    if ambiguous == "tp":
+        upper_first |= both & long
+    elif ambiguous == "sl":
+        upper_first |= both & ~long
+    elif ambiguous == "ohlc":
+        upper_first |= both & (close[bar] < open_[bar])
+    else:
+        raise ValueError(f"Unknown ambiguous-bar rule: {ambiguous}")
+
+    # Gaps fill at the open, which is already beyond the level
+    level = np.where(upper_first, np.where(gap_up, open_[bar], upper), np.where(gap_down, open_[bar], lower))
+    exit_price = np.where(exits < n, level + np.where(long, 0.0, spread), np.nan)
+    return exits, entry_price, exit_price
+
+
+def chain_positions(candidates, exits, n):
+    # Walk flat -> entry -> exit -> next entry strictly after the exit bar.
+    # Returns positions (into candidates) of the trades actually taken.
+    next_candidate = np.searchsorted(candidates, exits, side="right")
+    taken = []
+    k = 0
+    while k < len(candidates) and exits[k] < n:
+        taken.append(k)
+        k = next_candidate[k]
+    return np.asarray(taken, dtype="int64")
+
+
+class PaperBroker:
+    # Bar-by-bar twin of run_signals for live/replayed feeds: one position at a
+    # time, entered on the close of a signal bar from `start` (long wins when both
+    # fire) and closed on the first later close that reaches TP or SL, or with
+    # fill="intrabar" on the first high/low touch as in resolve_exits; the next
+    # entry needs a bar after the exit bar. on_bar returns [(trade, bars held)].
+    def __init__(self, tp, sl, lot_size=LOT_SIZE, contract_size=CONTRACT_SIZE, start=0,
+                 fill="close", spread=0.0, ambiguous="sl"):
+        self.tp = tp
+        self.sl = sl
+        self.lot_size = lot_size
+        self.contract_size = contract_size
+        self.start = start
+        self.intrabar = fill == "intrabar"
+        self.spread = spread if self.intrabar else 0.0
+        self.ambiguous = ambiguous
+        self.position = None
+
+    def _exit_price(self, side, upper, lower, open_, high, low, close):
+        # Fill price when the position exits on this bar, else None
+        if not self.intrabar:
+            return close if close >= upper or close <= lower else None
+        up, down = high >= upper, low <= lower
+        if not (up or down):
+            return None
+        # A level the open gapped through fills first, at the open
+        if open_ >= upper or open_ <= lower:
+            return open_ + (self.spread if side < 0 else 0.0)
+        if up and down:
+            if self.ambiguous == "tp":
+                up = side > 0
+            elif self.ambiguous == "sl":
+                up = side < 0
+            else:
+                up = close < open_
+        return (upper if up else lower) + (self.spread if side < 0 else 0.0)
+
+    def on_bar(self, bar, time, close, long_signal, short_signal, open_=None, high=None, low=None):
+        if self.position is not None:
+            side, entry_bar, entry_time, entry_price, upper, lower = self.position
+            exit_price = self._exit_price(side, upper, lower, open_, high, low, close)
+            if exit_price is None:
+                return []
+            self.position = None
+            profit = (exit_price - entry_price if side > 0 else entry_price - exit_price) * self.contract_size * self.lot_size
+            return [({
+                "type": "long" if side > 0 else "short",
+                "entry_price": entry_price,
+                "entry_time": entry_time,
+                "exit_time": time,
+                "exit_price": exit_price,
+                "profit": profit,
+            }, bar - entry_bar)]
+        if bar >= self.start and (long_signal or short_signal):
+            side = 1 if long_signal else -1
+            # Levels as in first_exit / resolve_exits (bid terms for a short's ask exits)
+            if side > 0:
+                entry_price = close + self.spread
+                upper, lower = entry_price + self.tp, entry_price - self.sl
+            else:
+                entry_price = close
+                upper, lower = entry_price + self.sl - self.spread, entry_price - self.tp - self.spread
+            self.position = (side, bar, time, entry_price, upper, lower)
+        return []
+
+
+def exit_options(params):
+    # A combo's exit model: "fill" ("intrabar" by default, or "close"), "spread"
+    # (price units) and "ambiguous" ("sl", "tp" or "ohlc"), as PaperBroker options
+    options = {
+        "fill": params.get("fill", DEFAULT_FILL),
+        "spread": params.get("spread", 0.0),
+        "ambiguous": params.get("ambiguous", "sl"),
+    }
+    if options["fill"] not in FILL_MODES:
+        raise ValueError(f"Unknown fill: {options['fill']}")
+    if options["ambiguous"] not in AMBIGUOUS_RULES:
+        raise ValueError(f"Unknown ambiguous-bar rule: {options['ambiguous']}")
+    return options
+
+
+def fill_options(df, params):
+    # The same exit model as run_signals / run_signals_batch options
+    options = exit_options(params)
+    if options["fill"] != "intrabar":
+        return {}
+    return {
+        "ohlc": (df["Open"].to_numpy(), df["High"].to_numpy(), df["Low"].to_numpy()),
+        "spread": options["spread"],
+        "ambiguous": options["ambiguous"],
+    }
+
+
+def trade_stats(profits, equity_curve=None, durations=None, periods_per_year=None):
+    # Stats of one trade list; the equity curve defaults to the balance after each trade
+    profits = np.asarray(profits, dtype="float64")
+    if equity_curve is None:
+        equity_curve = INITIAL_BALANCE + np.concatenate(([0.0], np.cumsum(profits)))
+    return stats_dicts(profits[:, None], np.ones((len(profits), 1), dtype=bool),
+                       np.asarray(equity_curve, dtype="float64")[None, :], periods_per_year,
+                       durations=None if durations is None else np.asarray(durations)[:, None])[0]
+
+
+def run_signals(close, long_entries, short_entries, tp, sl, lot_size=LOT_SIZE,
+                contract_size=CONTRACT_SIZE, initial_balance=INITIAL_BALANCE,
+                start=0, index=None, exit_signals=None, max_hold=None, end=None,
+                ohlc=None, spread=0.0, ambiguous="sl"):
+    # ohlc=(open, high, low) switches from close-only exits to intrabar TP/SL
+    # fills with `spread` and the `ambiguous` rule (see resolve_exits)
+    close = np.asarray(close, dtype="float64")
+    n = len(close)
+    end = n if end is None else min(end, n)
+    long_entries = np.asarray(long_entries, dtype=bool)
+    short_entries = np.asarray(short_entries, dtype=bool)
+
+    candidates = np.flatnonzero(long_entries | short_entries)
+    candidates = candidates[(candidates >= start) & (candidates < (end - 1 if end < n else n))]
+    # Long wins when a bar carries both signals
+    direction = np.where(long_entries[candidates], 1, -1)
+
+    with stage("bar_loop"):
+        if ohlc is None:
+            exits = first_exit(close, candidates, direction,
+                               np.broadcast_to(tp, n)[candidates], np.broadcast_to(sl, n)[candidates])
+        else:
+            exits, entry_fills, exit_fills = resolve_exits(*ohlc, close, candidates, direction,
+                                                           np.broadcast_to(tp, n)[candidates],
+                                                           np.broadcast_to(sl, n)[candidates], spread, ambiguous)
+        resolved = exits
+        if exit_signals is not None:
+            signal_bars = np.append(np.flatnonzero(exit_signals), n)
+            exits = np.minimum(exits, signal_bars[np.searchsorted(signal_bars, candidates, side="right")])
+        if max_hold is not None:
+            exits = np.minimum(exits, np.minimum(candidates + max_hold, n))
+        if end < n:
+            exits = np.minimum(exits, end - 1)
+
+        taken = chain_positions(candidates, exits, n)
+        entry_bars = candidates[taken]
+        exit_bars = exits[taken]
+        sides = direction[taken]
+
+    with stage("stats"):
+        if ohlc is None:
+            entry_prices = close[entry_bars]
+            exit_prices = close[exit_bars]
+        else:
+            # Exits forced by signals, max_hold or the window end fill at that bar's close (the ask for shorts)
+            entry_prices = entry_fills[taken]
+            forced = exit_bars != resolved[taken]
+            exit_prices = np.where(forced, close[exit_bars] + np.where(sides > 0, 0.0, spread), exit_fills[taken])
+        profits = np.where(sides > 0, exit_prices - entry_prices, entry_prices - exit_prices) * contract_size * lot_size
+
+        # Realized balance after each bar from `start`, led by the initial balance
+        realized = np.bincount(exit_bars, weights=profits, minlength=n)[start:end]
+        equity_curve = np.concatenate(([initial_balance], initial_balance + np.cumsum(realized)))
+
+        times = index if index is not None else np.arange(n)
+        trades = [
+            {
+                "type": "long" if side > 0 else "short",
+                "entry_price": entry_price,
+                "entry_time": entry_time,
+                "exit_time": exit_time,
+                "exit_price": exit_price,
+                "profit": profit,
+            }
+            for side, entry_time, exit_time, entry_price, exit_price, profit
+            in zip(sides, times[entry_bars], times[exit_bars], entry_prices, exit_prices, profits)
+        ]
+
+    return {
+        "trades": trades,
+        "equity_curve": equity_curve,
+        "stats": trade_stats(profits, equity_curve, exit_bars - entry_bars, bars_per_year(index)),
+        "entry_bars": entry_bars,
+        "exit_bars": exit_bars,
+        "profits": profits,
+    }
+
+
+def batch_trade_stats(profits, closed, equity, periods_per_year=None, valid=None, durations=None):
+    # trade_stats for every column of a (trades x combos) profit matrix and
+    # every row of a (combos x bars) equity matrix at once
+    return stats_dicts(profits, closed, equity, periods_per_year, valid, durations)
+
+
+def run_signals_batch(close, long_entries, short_entries, tp, sl, lot_size=LOT_SIZE,
+                      contract_size=CONTRACT_SIZE, initial_balance=INITIAL_BALANCE,
+                      start=0, index=None, end=None, ohlc=None, spread=0.0, ambiguous="sl"):
+    # run_signals for a (combos x bars) matrix of entry signals in one pass.
+    # Exits depend only on the entry bar and side, so they are resolved once for
+    # every bar any combo enters on; the position chains of all combos then
+    # advance together, one trade per step.
+    close = np.asarray(close, dtype="float64")
+    n = len(close)
+    long_entries = np.atleast_2d(np.asarray(long_entries, dtype=bool))
+    short_entries = np.atleast_2d(np.asarray(short_entries, dtype=bool))
+    n_combos = len(long_entries)
+    end = n if end is None else min(end, n)
+    starts = np.broadcast_to(np.asarray(start, dtype="int64"), (n_combos,))
+    tp = np.broadcast_to(np.asarray(tp, dtype="float64"), (n,))
+    sl = np.broadcast_to(np.asarray(sl, dtype="float64"), (n,))
+
+    with stage("bar_loop"):
+        cols = np.arange(n)
+        active = (long_entries | short_entries) & (cols[None, :] >= starts[:, None])
+        if end < n:
+            active &= cols[None, :] < end - 1
+        is_long = long_entries & active
+
+        exit_long = np.full(n, n, dtype="int64")
+        exit_short = np.full(n, n, dtype="int64")
+        # Intrabar fills per entry bar and side: [entry price, exit price]
+        fills = {1: np.full((2, n), np.nan), -1: np.full((2, n), np.nan)}
+        for side, exit_bar, mask in ((1, exit_long, is_long.any(axis=0)),
+                                     (-1, exit_short, (active & ~is_long).any(axis=0))):
+            bars = np.flatnonzero(mask)
+            if ohlc is None:
+                exit_bar[bars] = first_exit(close, bars, np.full(len(bars), side), tp[bars], sl[bars])
+            else:
+                exit_bar[bars], fills[side][0, bars], fills[side][1, bars] = resolve_exits(
+                    *ohlc, close, bars, np.full(len(bars), side), tp[bars], sl[bars], spread, ambiguous)
+            if end < n:
+                forced = exit_bar[bars] > end - 1
+                exit_bar[bars] = np.minimum(exit_bar[bars], end - 1)
+                if ohlc is not None:
+                    fills[side][1, bars[forced]] = close[end - 1] + (spread if side < 0 else 0.0)
+
+        # next_entry[c, j]: first bar >= j where combo c may enter (n when none is left)
+        next_entry = np.where(active, cols[None, :], n)
+        next_entry = np.minimum.accumulate(next_entry[:, ::-1], axis=1)[:, ::-1]
+        next_entry = np.concatenate([next_entry, np.full((n_combos, 1), n)], axis=1)
+
+        rows = np.arange(n_combos)
+        pointer = np.zeros(n_combos, dtype="int64")
+        steps = []
+        while True:
+            entry = next_entry[rows, pointer]
+            opened = entry < n
+            if not opened.any():
+                break
+            entry = np.minimum(entry, n - 1)
+            side = np.where(is_long[rows, entry], 1, -1)
+            exit_bar = np.where(side > 0, exit_long[entry], exit_short[entry])
+            closed = opened & (exit_bar < n)
+            steps.append((entry, np.minimum(exit_bar, n - 1), side, closed))
+            pointer = np.where(closed, exit_bar + 1, n)
+
+        if steps:
+            entry_bars, exit_bars, sides, closed = (np.stack(parts) for parts in zip(*steps))
+        else:
+            entry_bars = exit_bars = sides = np.zeros((0, n_combos), dtype="int64")
+            closed = np.zeros((0, n_combos), dtype=bool)
+
+    with stage("stats"):
+        if ohlc is None:
+            entry_prices = close[entry_bars]
+            exit_prices = close[exit_bars]
+        else:
+            entry_prices = np.where(sides > 0, fills[1][0][entry_bars], fills[-1][0][entry_bars])
+            exit_prices = np.where(sides > 0, fills[1][1][entry_bars], fills[-1][1][entry_bars])
+        profits = np.where(sides > 0, exit_prices - entry_prices, entry_prices - exit_prices) * contract_size * lot_size
+
+        # Realized balance per combo and bar
+        trade_rows, trade_cols = np.nonzero(closed)
+        flat = trade_cols * n + exit_bars[trade_rows, trade_cols]
+        realized = np.bincount(flat, weights=profits[trade_rows, trade_cols], minlength=n_combos * n).reshape(n_combos, n)
+
+        # Every combo scored in one call on its own bars [start, end)
+        equity = initial_balance + np.cumsum(realized[:, :end], axis=1)
+        all_stats = batch_trade_stats(profits, closed, equity, bars_per_year(index),
+                                      valid=cols[None, :end] >= starts[:, None], durations=exit_bars - entry_bars)
+
+        times = index if index is not None else np.arange(n)
+        results = []
+        for c in range(n_combos):
+            taken = closed[:, c]
+            equity_curve = np.concatenate(([initial_balance], initial_balance + np.cumsum(realized[c, starts[c]:end])))
+            trades = [
+                {
+                    "type": "long" if s > 0 else "short",
+                    "entry_price": entry_price,
+                    "entry_time": entry_time,
+                    "exit_time": exit_time,
+                    "exit_price": exit_price,
+                    "profit": profit,
+                }
+                for s, entry_time, exit_time, entry_price, exit_price, profit
+                in zip(sides[taken, c], times[entry_bars[taken, c]], times[exit_bars[taken, c]],
+                       entry_prices[taken, c], exit_prices[taken, c], profits[taken, c])
+            ]
+            results.append({
+                "trades": trades,
+                "equity_curve": equity_curve,
+                "stats": all_stats[c],
+                "entry_bars": entry_bars[taken, c],
+                "exit_bars": exit_bars[taken, c],
+                "profits": profits[taken, c],
+            })
+    return results
@@ -0,0 +1,210 @@
+# benchmark.py
+# Throughput benchmarks for data loading, indicators, strategies and sweeps.
+#
+# Runs on synthetic, seeded OHLCV data (no Dukascopy exports needed) and writes
+# JSON with seconds, bars/sec, combos/sec and peak traced memory per case:
+#
+#     python benchmark.py --output output/bench_baseline.json
+#     python benchmark.py --compare output/bench_baseline.json   # exit code 1 on regressions
+
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+from itertools import product
+import numpy as np
+import pandas as pd
+import indicators
+from candle_store import candles_frame, write_arrays, load_candles, resample_arrays, timeframe_minutes
+from indicator_cache import default_cache
+from strategies import STRATEGY_REGISTRY, get_strategy_config
+from optimizer import search_space, sample_params
+from tuner_engine import run_backtest, _sweep_serial, _sweep_parallel
+
+
+def synthetic_arrays(n_bars, seed=0, minutes=5, start="2023-01-02", price=130.0):
+    # Random-walk closes with intrabar ranges; identical for the same arguments
+    rng = np.random.default_rng(seed)
+    step = minutes * 60_000_000_000
+    timestamps = pd.Timestamp(start).value + step * np.arange(n_bars, dtype="int64")
+    close = price * np.exp(np.cumsum(rng.normal(0, 4e-4, n_bars)))
+    open_ = np.r_[price, close[:-1]]
+    spread = np.abs(rng.normal(0, 3e-4, (2, n_bars))) * close
+    return {
+        "timestamp": timestamps,
+        "open": open_,
+        "high": np.maximum(open_, close) + spread[0],
+        "low": np.minimum(open_, close) - spread[1],
+        "close": close,
+        "volume": rng.lognormal(10, 1, n_bars),
+    }
+
+
+def synthetic_candles(n_bars, seed=0, timeframe="M5", symbol="SYNTH"):
+    return candles_frame(synthetic_arrays(n_bars, seed, timeframe_minutes(timeframe)), symbol, timeframe)
+
+
+def measure(fn, repeat=3):
+    # Best wall time over `repeat` runs, then one traced run for peak memory
+    times = []
+    for _ in range(repeat):
+        default_cache.clear()
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    default_cache.clear()
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def record(results, name, seconds, peak, bars=None, combos=None):
+    entry = {"seconds": round(seconds, 6), "peak_mb": round(peak / 2 ** 20, 2)}
+    if bars:
+        entry["bars_per_sec"] = round(bars / seconds, 1)
+    if combos:
+        entry["combos_per_sec"] = round(combos / seconds, 2)
+    results[name] = entry
+    rates = ", ".join(f"{k} {v:,}" for k, v in entry.items() if k.endswith("_per_sec"))
+    print(f"⏱️ {name:<45} {seconds * 1000:9.1f} ms  {entry['peak_mb']:8.1f} MB  {rates}")
+
+
+def bench_data(results, n_bars, repeat):
+    arrays = synthetic_arrays(n_bars)
+    with tempfile.TemporaryDirectory() as data_path:
+        write_arrays(arrays, "SYNTH", "M5", data_path)
+        # Open the memory-mapped store and touch every column
+        record(results, "data/load_candles", *measure(
+            lambda: load_candles("SYNTH", "M5", data_path).sum(), repeat), bars=n_bars)
+    record(results, "data/resample_M5_to_H1", *measure(lambda: resample_arrays(arrays, 60), repeat), bars=n_bars)
+
+
+def bench_indicators(results, df, repeat):
+    cases = {
+        "sma_50": lambda: indicators.moving_average(df, "Close", 50, "SMA"),
+        "ema_50": lambda: indicators.moving_average(df, "Close", 50, "EMA"),
+        "rolling_max_200": lambda: indicators.rolling_stat(df, "High", 200, "max"),
+        "rci_14": lambda: indicators.rci_values(df, "Close", 14),
+        "pivot_flags_3_3": lambda: indicators.pivot_flags(df, 3, 3, high="High", low="Low"),
+        "last_pivot_levels_3_3": lambda: indicators.last_pivot_levels(df, 3, 3, high="High", low="Low"),
+    }
+    for name, fn in cases.items():
+        record(results, f"indicator/{name}", *measure(fn, repeat), bars=len(df))
+
+
+def bench_strategies(results, df_m5, df_m30, repeat):
+    for name in sorted(STRATEGY_REGISTRY):
+        config = get_strategy_config(name)
+        keys, values = zip(*config["params"].items())
+        params = dict(zip(keys, [v[0] for v in values]))
+        record(results, f"strategy/{name}", *measure(
+            lambda: run_backtest(config["runner"], df_m5, df_m30, params), repeat), bars=len(df_m5), combos=1)
+
+
+def sweep_combos(config, size, seed=0):
+    # The real grid when it is large enough, otherwise seeded samples from the search space
+    keys, values = zip(*config["params"].items())
+    grid = [dict(zip(keys, v)) for v in product(*values)]
+    if len(grid) >= size:
+        return grid[:size]
+    rng = np.random.default_rng(seed)
+    return grid + [sample_params(search_space(config), rng) for _ in range(size - len(grid))]
+
+
+def bench_sweeps(results, df_m5, df_m30, strategies, sizes, workers_list, repeat):
+    def ignore(*_):
+        pass
+
+    for name in strategies:
+        config = get_strategy_config(name)
+        for size in sizes:
+            combos = sweep_combos(config, size)
+            pending = list(range(len(combos)))
+            for workers in workers_list:
+                if workers > 1:
+                    run = lambda: _sweep_parallel(name, config, df_m5, df_m30, combos, pending, ignore, workers)
+                else:
+                    run = lambda: _sweep_serial(config, df_m5, df_m30, combos, pending, ignore)
+                # Sweep progress lines would drown the report
+                stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+                try:
+                    seconds, peak = measure(run, repeat)
+                finally:
+                    sys.stdout.close()
+                    sys.stdout = stdout
+                record(results, f"sweep/{name}/{size}_combos/{workers}_workers", seconds, peak,
+                       bars=len(df_m5) * len(combos), combos=len(combos))
+
+
+def compare(results, baseline, threshold):
+    # A case regresses when it is more than `threshold` slower than the baseline
+    regressions = []
+    for name, entry in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = entry["seconds"] / base["seconds"] if base["seconds"] else 1.0
+        flag = "❌ REGRESSION" if ratio > 1 + threshold else ("🚀 faster" if ratio < 1 - threshold else "")
+        print(f"{name:<50} {base['seconds'] * 1000:9.1f} -> {entry['seconds'] * 1000:9.1f} ms  x{ratio:5.2f}  {flag}")
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
+
+
+def run_benchmarks(bars=50000, repeat=3, sizes=(8, 32, 128), workers_list=(1, 2), strategies=None):
+    df_m5 = synthetic_candles(bars, seed=1, timeframe="M5")
+    df_m30 = synthetic_candles(bars // 6, seed=2, timeframe="M30")
+    results = {}
+    bench_data(results, bars, repeat)
+    bench_indicators(results, df_m5, repeat)
+    bench_strategies(results, df_m5, df_m30, repeat)
+    bench_sweeps(results, df_m5, df_m30, strategies or sorted(STRATEGY_REGISTRY), sizes, workers_list, repeat)
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "bars": bars,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark data loading, indicators, strategies and sweeps")
+    parser.add_argument("--bars", type=int, default=50000, help="Synthetic M5 bars per case")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (best is kept)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 32, 128], help="Sweep grid sizes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2], help="Sweep worker counts")
+    parser.add_argument("--strategies", nargs="+", help="Strategies to sweep (default: all registered)")
+    parser.add_argument("--output", default="output/benchmark.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Slowdown ratio counted as a regression")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.bars, args.repeat, args.sizes, args.workers, args.strategies)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[DEBUG] Saving benchmark results to: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(report["results"], baseline, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regressions over {args.threshold:.0%}")
+            sys.exit(1)
+        print("✅ No regressions")
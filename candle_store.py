@@ -0,0 +1,239 @@
+# candle_store.py
+# Columnar binary store for Dukascopy candle exports.
+#
+# Each CSV is ingested once into data/store/{symbol}/{timeframe}/ as one .npy
+# file per column (int64 UTC nanoseconds + float64 OHLCV). Loading memory-maps
+# the arrays, so a two-year M5 history opens instantly and the pages are shared
+# between every process that reads the same symbol.
+#
+# A timeframe without its own export is derived from the finest data available
+# for the symbol (tick export, M1, M5, ...) by a vectorized OHLCV resampler and
+# stored like an ingested one, so any timeframe can be requested by name.
+
+import os
+import re
+import json
+import glob
+import argparse
+import numpy as np
+import pandas as pd
+
+STORE_DIRNAME = "store"
+PRICE_COLUMNS = ["open", "high", "low", "close", "volume"]
+STORE_COLUMNS = ["timestamp"] + PRICE_COLUMNS
+
+CSV_PATTERN = re.compile(r"^(?P<symbol>[A-Z0-9]+)_Candlestick_(?P<size>\d+)_(?P<unit>[A-Z])_(?P<side>[A-Z]+)_.*\.csv$")
+TICK_PATTERN = re.compile(r"^(?P<symbol>[A-Z0-9]+)_Ticks_.*\.csv$")
+
+# Minutes per timeframe unit; tick exports count as 0-minute bars
+UNIT_MINUTES = {"M": 1, "H": 60, "D": 1440}
+TICKS = "T0"
+
+
+def timeframe_minutes(timeframe):
+    if timeframe == TICKS:
+        return 0
+    return int(timeframe[1:]) * UNIT_MINUTES[timeframe[0].upper()]
+
+
+def timeframe_from_filename(filename):
+    tick_match = TICK_PATTERN.match(os.path.basename(filename))
+    if tick_match:
+        return tick_match.group("symbol"), TICKS
+    match = CSV_PATTERN.match(os.path.basename(filename))
+    if not match:
+        raise ValueError(f"Not a Dukascopy candlestick export: {filename}")
+    return match.group("symbol"), f"{match.group('unit')}{match.group('size')}"
+
+
+def find_csv(symbol, timeframe, data_path="data"):
+    unit, size = timeframe[0], timeframe[1:]
+    candidates = sorted(glob.glob(os.path.join(data_path, f"{symbol}_Candlestick_{size}_{unit}_BID_*.csv")))
+    if not candidates:
+        raise FileNotFoundError(f"Data file not found: {symbol} {timeframe} in {data_path}")
+    return candidates[-1]
+
+
+def find_source(symbol, timeframe, data_path="data"):
+    # The export for this timeframe, else the finest export it can be resampled from
+    try:
+        return find_csv(symbol, timeframe, data_path)
+    except FileNotFoundError:
+        pass
+    target = timeframe_minutes(timeframe)
+    sources = []
+    for path in glob.glob(os.path.join(data_path, f"{symbol}_*.csv")):
+        try:
+            minutes = timeframe_minutes(timeframe_from_filename(path)[1])
+        except ValueError:
+            continue
+        if minutes < target and (minutes == 0 or target % minutes == 0):
+            sources.append((minutes, path))
+    if not sources:
+        raise FileNotFoundError(f"Data file not found: {symbol} {timeframe} (or finer) in {data_path}")
+    return sorted(sources)[0][1]
+
+
+def _read_csv(filepath):
+    df = pd.read_csv(filepath)
+    df.columns = [col.strip().lower() for col in df.columns]
+
+    time_col = next((c for c in df.columns if "time" in c), None)
+    if not time_col:
+        raise KeyError("No timestamp column found in data.")
+
+    # "26.04.2023 00:00:00.000 GMT-0600" -> local time + per-row UTC offset
+    raw = df[time_col].astype(str)
+    offset = raw.str.extract(r"GMT([-+])(\d{2})(\d{2})")
+    sign = np.where(offset[0] == "-", -1, 1)
+    offset_minutes = sign * (offset[1].astype(float).fillna(0) * 60 + offset[2].astype(float).fillna(0))
+    local = pd.to_datetime(raw.str.replace(r" GMT[-+]\d+", "", regex=True), format="%d.%m.%Y %H:%M:%S.%f", errors="coerce")
+    utc = local - pd.to_timedelta(offset_minutes, unit="m")
+    return df, utc, ~local.isna().to_numpy()
+
+
+def parse_dukascopy_ticks(filepath):
+    # Bid ticks as zero-length bars (open = high = low = close), ready for resample_arrays
+    df, utc, valid = _read_csv(filepath)
+    bid = df["bid"].to_numpy(dtype="float64")
+    volume = df["bidvolume"].to_numpy(dtype="float64") if "bidvolume" in df.columns else np.ones(len(df))
+    arrays = {"timestamp": utc.to_numpy(dtype="datetime64[ns]").view("int64"), "volume": volume}
+    arrays.update({name: bid for name in ("open", "high", "low", "close")})
+    order = np.argsort(arrays["timestamp"][valid], kind="stable")
+    return {name: np.ascontiguousarray(values[valid][order]) for name, values in arrays.items()}
+
+
+def parse_dukascopy_csv(filepath):
+    df, utc, valid = _read_csv(filepath)
+
+    arrays = {"timestamp": utc.to_numpy(dtype="datetime64[ns]").view("int64")}
+    for target in PRICE_COLUMNS:
+        match = next((col for col in df.columns if target in col), None)
+        if not match:
+            raise KeyError(f"Missing required column in CSV: {target}")
+        arrays[target] = df[match].to_numpy(dtype="float64")
+
+    return {name: np.ascontiguousarray(values[valid]) for name, values in arrays.items()}
+
+
+def resample_arrays(arrays, minutes):
+    # OHLCV bars of `minutes` (UTC-aligned buckets) from finer, time-sorted bars or ticks
+    timestamps = np.asarray(arrays["timestamp"], dtype="int64")
+    if not len(timestamps):
+        return {name: np.asarray(arrays[name])[:0] for name in STORE_COLUMNS}
+    width = minutes * 60_000_000_000
+    buckets = timestamps // width
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.append(starts[1:], len(timestamps)) - 1
+    return {
+        "timestamp": buckets[starts] * width,
+        "open": np.asarray(arrays["open"], dtype="float64")[starts],
+        "high": np.maximum.reduceat(np.asarray(arrays["high"], dtype="float64"), starts),
+        "low": np.minimum.reduceat(np.asarray(arrays["low"], dtype="float64"), starts),
+        "close": np.asarray(arrays["close"], dtype="float64")[ends],
+        "volume": np.add.reduceat(np.asarray(arrays["volume"], dtype="float64"), starts),
+    }
+
+
+def store_dir(symbol, timeframe, data_path="data"):
+    return os.path.join(data_path, STORE_DIRNAME, symbol, timeframe)
+
+
+def write_arrays(arrays, symbol, timeframe, data_path="data", source=None):
+    target = store_dir(symbol, timeframe, data_path)
+    os.makedirs(target, exist_ok=True)
+    for name in STORE_COLUMNS:
+        tmp_path = os.path.join(target, f".{name}.npy.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(arrays[name]))
+        os.replace(tmp_path, os.path.join(target, f"{name}.npy"))
+
+    meta = {
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "rows": int(len(arrays["timestamp"])),
+        "source": os.path.basename(source) if source else None,
+        "source_mtime": os.path.getmtime(source) if source else None,
+    }
+    with open(os.path.join(target, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return target
+
+
+def ingest_csv(filepath, data_path=None, timeframe=None):
+    # Tick exports have no timeframe of their own and are stored resampled to `timeframe`
+    data_path = data_path or os.path.dirname(filepath) or "."
+    symbol, source_timeframe = timeframe_from_filename(filepath)
+    if source_timeframe == TICKS:
+        timeframe = timeframe or "M1"
+        arrays = resample_arrays(parse_dukascopy_ticks(filepath), timeframe_minutes(timeframe))
+    else:
+        timeframe = source_timeframe
+        arrays = parse_dukascopy_csv(filepath)
+    target = write_arrays(arrays, symbol, timeframe, data_path, source=filepath)
+    print(f"📦 Ingested {os.path.basename(filepath)} -> {target} ({len(arrays['timestamp'])} bars)")
+    return target
+
+
+def derive_timeframe(symbol, timeframe, data_path="data"):
+    # Resample the finest stored (or ingestible) data into `timeframe` and store it
+    source = find_source(symbol, timeframe, data_path)
+    source_timeframe = timeframe_from_filename(source)[1]
+    if source_timeframe == TICKS:
+        return ingest_csv(source, data_path, timeframe)
+    arrays = resample_arrays(load_arrays(symbol, source_timeframe, data_path), timeframe_minutes(timeframe))
+    target = write_arrays(arrays, symbol, timeframe, data_path, source=source)
+    print(f"🧱 Resampled {symbol} {source_timeframe} -> {timeframe} ({len(arrays['timestamp'])} bars)")
+    return target
+
+
+def ingest_all(data_path="data", symbol=None):
+    pattern = f"{symbol or '*'}_Candlestick_*.csv"
+    return [ingest_csv(path, data_path) for path in sorted(glob.glob(os.path.join(data_path, pattern)))]
+
+
+def is_stale(symbol, timeframe, data_path="data"):
+    meta_path = os.path.join(store_dir(symbol, timeframe, data_path), "meta.json")
+    if not os.path.exists(meta_path):
+        return True
+    with open(meta_path) as f:
+        meta = json.load(f)
+    source = os.path.join(data_path, meta["source"]) if meta.get("source") else None
+    return bool(source and os.path.exists(source) and os.path.getmtime(source) != meta["source_mtime"])
+
+
+def load_arrays(symbol, timeframe="M5", data_path="data"):
+    # Ingest on first use so callers never have to run the CLI by hand
+    if is_stale(symbol, timeframe, data_path):
+        try:
+            ingest_csv(find_csv(symbol, timeframe, data_path), data_path)
+        except FileNotFoundError:
+            derive_timeframe(symbol, timeframe, data_path)
+    target = store_dir(symbol, timeframe, data_path)
+    return {name: np.load(os.path.join(target, f"{name}.npy"), mmap_mode="r") for name in STORE_COLUMNS}
+
+
+def candles_frame(arrays, symbol=None, timeframe=None):
+    index = pd.DatetimeIndex(np.asarray(arrays["timestamp"]).view("datetime64[ns]"), name="timestamp")
+    df = pd.DataFrame({name.capitalize(): arrays[name] for name in PRICE_COLUMNS}, index=index, copy=False)
+    df.attrs["symbol"] = symbol
+    df.attrs["timeframe"] = timeframe
+    return df
+
+
+def load_candles(symbol, timeframe="M5", data_path="data"):
+    return candles_frame(load_arrays(symbol, timeframe, data_path), symbol, timeframe)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert Dukascopy CSV exports into the binary candle store")
+    parser.add_argument("--data-path", default="data", help="Folder holding the *_Candlestick_*.csv exports")
+    parser.add_argument("--symbol", required=False, help="Only ingest this symbol (e.g., USDJPY)")
+    parser.add_argument("--derive", nargs="+", default=[], help="Timeframes to resample for --symbol (e.g., M15 H1 H4)")
+    args = parser.parse_args()
+    if args.derive and not args.symbol:
+        parser.error("--derive needs --symbol")
+
+    ingest_all(args.data_path, args.symbol)
+    for timeframe in args.derive:
+        load_arrays(args.symbol, timeframe, args.data_path)
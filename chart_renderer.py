@@ -0,0 +1,94 @@
+# chart_renderer.py
+# Equity-curve persistence and deferred chart rendering for sweeps.
+#
+# A sweep saves every combo's equity curve into one compressed {label}_equity.npz
+# (all curves concatenated + offsets), then renders PNGs as a separate stage in a
+# process pool. Charts can be regenerated later from the .npz without rerunning:
+#
+#     python chart_renderer.py output/USDJPY_rci_strategy_M5_equity.npz --charts top-k --top-k 10
+
+import os
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from tuner_options import CHART_MODES
+
+
+def equity_path(output_path, label):
+    return os.path.join(output_path, f"{label}_equity.npz")
+
+
+def save_equity_curves(path, curves):
+    # curves: {combo number: equity sequence}
+    combo_ids = np.array(sorted(curves), dtype="int64")
+    arrays = [np.asarray(curves[c], dtype="float64") for c in combo_ids]
+    offsets = np.cumsum([0] + [len(a) for a in arrays]).astype("int64")
+    values = np.concatenate(arrays) if arrays else np.zeros(0)
+    np.savez_compressed(path, combo_ids=combo_ids, offsets=offsets, values=values)
+    return path
+
+
+def load_equity_curves(path):
+    with np.load(path) as data:
+        combo_ids, offsets, values = data["combo_ids"], data["offsets"], data["values"]
+    return {int(c): values[offsets[k]:offsets[k + 1]] for k, c in enumerate(combo_ids)}
+
+
+def select_combos(curves, mode="all", top_k=5):
+    if mode == "none":
+        return []
+    if mode == "top-k":
+        net = {c: (eq[-1] - eq[0]) if len(eq) else float("-inf") for c, eq in curves.items()}
+        return sorted(net, key=lambda c: (-net[c], c))[:top_k]
+    return sorted(curves)
+
+
+def _render_batch(jobs):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    for chart_path, title, equity in jobs:
+        plt.figure(figsize=(10, 4))
+        plt.plot(np.arange(len(equity)), equity)
+        plt.title(title)
+        plt.xlabel("Bar")
+        plt.ylabel("Equity ($)")
+        plt.grid(True)
+        plt.tight_layout()
+        plt.savefig(chart_path)
+        plt.close()
+    return len(jobs)
+
+
+def render_charts(curves, label, output_path="output", mode="all", top_k=5, workers=None):
+    selected = select_combos(curves, mode, top_k)
+    if not selected:
+        return []
+
+    jobs = [(os.path.join(output_path, f"{label}_combo_{c}_equity.png"),
+             f"Equity Curve - {label} - Combo {c}", curves[c]) for c in selected]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    batches = [jobs[k::workers] for k in range(workers)]
+
+    print(f"🖼️ Rendering {len(jobs)} equity charts with {workers} workers")
+    if workers == 1:
+        _render_batch(jobs)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_render_batch, batches))
+    return [path for path, _, _ in jobs]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render equity charts from a saved sweep")
+    parser.add_argument("equity_file", help="Path to a {label}_equity.npz written by the sweep")
+    parser.add_argument("--charts", choices=CHART_MODES, default="all", help="Which combos to chart")
+    parser.add_argument("--top-k", type=int, default=5, help="Number of charts for --charts top-k")
+    parser.add_argument("--workers", type=int, default=None, help="Rendering processes (default: CPU count)")
+    args = parser.parse_args()
+
+    # Everything before _equity.npz (symbol, strategy, timeframe) names the charts
+    label = os.path.basename(args.equity_file).removesuffix(".npz").removesuffix("_equity")
+    output_path = os.path.dirname(args.equity_file) or "."
+    render_charts(load_equity_curves(args.equity_file), label, output_path, args.charts, args.top_k, args.workers)
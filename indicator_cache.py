@@ -0,0 +1,124 @@
+# indicator_cache.py
+# Memoizes indicator arrays across the combos (and strategies) of a sweep.
+#
+# Entries are keyed on (symbol, timeframe, data fingerprint, indicator name, params)
+# and evicted least-recently-used once the cache exceeds its memory budget.
+# Cached arrays are returned read-only because every combo shares them.
+
+import hashlib
+import weakref
+import numpy as np
+from collections import OrderedDict
+from stage_timer import stage
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# id(frame) -> (weakref to frame, fingerprint); frames are treated as immutable
+_fingerprints = {}
+
+
+def fingerprint(df):
+    entry = _fingerprints.get(id(df))
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(df.index.to_numpy(dtype="datetime64[ns]")).view("int64").tobytes())
+    for col in df.columns:
+        digest.update(str(col).encode())
+        digest.update(np.ascontiguousarray(df[col].to_numpy(dtype="float64")).tobytes())
+    value = digest.hexdigest()
+
+    key = id(df)
+    _fingerprints[key] = (weakref.ref(df, lambda _ref: _fingerprints.pop(key, None)), value)
+    return value
+
+
+def _nbytes(value):
+    if isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    return value.nbytes
+
+
+def _freeze(value):
+    if isinstance(value, tuple):
+        return tuple(_freeze(v) for v in value)
+    value = np.asarray(value)
+    value.setflags(write=False)
+    return value
+
+
+class IndicatorCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        self.misses += 1
+        value = _freeze(compute())
+        size = _nbytes(value)
+        if size <= self.max_bytes:
+            self.entries[key] = value
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.nbytes -= _nbytes(evicted)
+                self.evictions += 1
+        return value
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.nbytes,
+        }
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+        self.reset_stats()
+
+
+def merge_stats(stats_list):
+    merged = {"hits": 0, "misses": 0, "evictions": 0, "entries": 0, "bytes": 0}
+    for stats in stats_list:
+        for name in merged:
+            merged[name] += stats.get(name, 0)
+    return merged
+
+
+def format_stats(stats):
+    lookups = stats["hits"] + stats["misses"]
+    hit_rate = 100 * stats["hits"] / lookups if lookups else 0
+    return (f"{stats['hits']} hits / {stats['misses']} misses ({hit_rate:.0f}% hit rate), "
+            f"{stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB, {stats['evictions']} evictions")
+
+
+default_cache = IndicatorCache()
+
+
+def cached(df, name, params, compute, cache=None):
+    cache = cache or default_cache
+    with stage("indicators"):
+        key = (
+            df.attrs.get("symbol"),
+            df.attrs.get("timeframe"),
+            fingerprint(df),
+            name,
+            tuple(sorted(params.items())),
+        )
+        return cache.get_or_compute(key, compute)
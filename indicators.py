@@ -0,0 +1,96 @@
+# indicators.py
+# Vectorized indicator functions shared by the strategies.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from indicator_cache import cached
+
+
+def ma(series, length, ma_type="SMA"):
+    if ma_type == "SMA":
+        return series.rolling(window=length).mean()
+    elif ma_type == "EMA":
+        return series.ewm(span=length, adjust=False).mean()
+    return series
+
+
+def rolling_rci(values, length):
+    # RCI (Spearman rank correlation of price vs. time) over a trailing window.
+    # out[i] covers values[i - length + 1 : i + 1]; the first length - 1 entries are NaN.
+    # Ties rank in order of appearance, matching pandas rank(method="first").
+    values = np.asarray(values, dtype="float64")
+    n = length
+    out = np.full(len(values), np.nan)
+    if n < 2 or len(values) < n:
+        return out
+
+    windows = sliding_window_view(values, n)
+    order = np.argsort(windows, axis=1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, n + 1), axis=1)
+
+    d = ((ranks - np.arange(1, n + 1)) ** 2).sum(axis=1).astype("float64")
+    rci_values = 100 * (1 - (6 * d) / (n * (n ** 2 - 1)))
+    rci_values[np.isnan(windows).any(axis=1)] = np.nan
+    out[n - 1:] = rci_values
+    return out
+
+
+def crossover(fast, slow):
+    # True where fast crosses above slow on this bar (NaNs never cross).
+    # Works along the last axis, so a (combos x bars) matrix broadcasts against a series.
+    fast, slow = np.broadcast_arrays(np.asarray(fast), np.asarray(slow))
+    cross = np.zeros(fast.shape, dtype=bool)
+    cross[..., 1:] = (fast[..., :-1] < slow[..., :-1]) & (fast[..., 1:] > slow[..., 1:])
+    return cross
+
+
+def crossunder(fast, slow):
+    return crossover(slow, fast)
+
+
+# Cached variants: computed once per (symbol, timeframe, data, params) and shared
+# by every combo in a sweep. They return read-only NumPy arrays.
+
+def moving_average(df, column, length, ma_type="SMA"):
+    return cached(df, f"ma_{ma_type}", {"column": column, "length": length},
+                  lambda: ma(df[column], length, ma_type).to_numpy(dtype="float64"))
+
+
+def rolling_stat(df, column, window, how="mean", center=False):
+    return cached(df, f"rolling_{how}", {"column": column, "window": window, "center": center},
+                  lambda: getattr(df[column].rolling(window=window, center=center), how)().to_numpy(dtype="float64"))
+
+
+def rci_values(df, column, length):
+    return cached(df, "rci", {"column": column, "length": length},
+                  lambda: rolling_rci(df[column].to_numpy(), length))
+
+
+def pivot_flags(df, left, right, high="high", low="low"):
+    # pivot_high[j] is True when bar j has the highest high of bars j-left..j+right
+    # (likewise pivot_low); it is only known `right` bars later, so read it at i - right
+    def compute():
+        window = left + right + 1
+        flags = []
+        for column, how in ((high, "max"), (low, "min")):
+            extreme = np.full(len(df), np.nan)
+            extreme[:len(df) - right] = rolling_stat(df, column, window, how)[right:]
+            flags.append(df[column].to_numpy() == extreme)
+        return tuple(flags)
+    return cached(df, "pivots", {"left": left, "right": right, "high": high, "low": low}, compute)
+
+
+def last_pivot_levels(df, left, right, high="high", low="low"):
+    # (resistance, support): price of the most recent pivot high/low that has
+    # been confirmed by bar i, i.e. pivots at or before i - right; NaN before the first
+    def compute():
+        levels = []
+        for flags, column in zip(pivot_flags(df, left, right, high, low), (high, low)):
+            confirmed = np.zeros(len(df), dtype=bool)
+            confirmed[right:] = flags[:len(df) - right]
+            last = np.maximum.accumulate(np.where(confirmed, np.arange(len(df)), -1))
+            pivot_bar = np.maximum(last - right, 0)
+            levels.append(np.where(last >= 0, df[column].to_numpy()[pivot_bar], np.nan))
+        return tuple(levels)
+    return cached(df, "pivot_levels", {"left": left, "right": right, "high": high, "low": low}, compute)
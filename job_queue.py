@@ -0,0 +1,172 @@
+# job_queue.py
+# Local queue of sweep jobs for the dashboards.
+#
+# Each job runs tuner_runner.py in its own process; a small thread pool caps how
+# many run at once and the rest wait queued. Output is streamed line by line
+# into the job (and output/jobs/{id}.log), [PROGRESS] lines from the sweep give
+# combos done/total, and a running job can be cancelled. The manager lives for
+# the whole server process, so jobs outlive the Streamlit session that started them.
+# With more than one job at a time the runners skip the sweep daemon (--local): it
+# runs commands one by one, so jobs handed to it would show as running while they wait:
+#
+#     manager = JobManager(project_dir, max_concurrent=2)
+#     job_id = manager.submit("rci_strategy", "USDJPY", ["--charts", "top-k"])
+#     manager.get(job_id).progress, manager.get(job_id).eta, manager.cancel(job_id)
+
+import os
+import re
+import sys
+import time
+import uuid
+import signal
+import threading
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+PROGRESS_LINE = re.compile(r"^\[PROGRESS\] (\d+)/(\d+)")
+FINISHED = ("done", "failed", "cancelled")
+
+
+class Job:
+    def __init__(self, strategy, symbol, command, log_path, max_log_lines=2000):
+        self.id = uuid.uuid4().hex[:8]
+        self.strategy = strategy
+        self.symbol = symbol
+        self.command = command
+        self.log_path = log_path
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = 0
+        self.total = 0
+        self.returncode = None
+        self.lines = deque(maxlen=max_log_lines)
+        self.process = None
+        self.cancel_requested = False
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 0.0
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def eta(self):
+        # Seconds left at the average pace so far (None until a combo finished)
+        if self.status != "running" or not self.done or not self.total:
+            return None
+        return self.elapsed / self.done * (self.total - self.done)
+
+    def log(self, tail=None):
+        lines = list(self.lines)
+        return "\n".join(lines[-tail:] if tail else lines)
+
+    def summary(self):
+        return {
+            "Job": self.id,
+            "Strategy": self.strategy,
+            "Symbol": self.symbol,
+            "Status": self.status,
+            "Done": self.done,
+            "Total": self.total,
+            "Elapsed s": round(self.elapsed, 1),
+            "ETA s": None if self.eta is None else round(self.eta, 1),
+        }
+
+
+class JobManager:
+    def __init__(self, project_dir=".", max_concurrent=2, python=sys.executable):
+        self.project_dir = project_dir
+        self.python = python
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.max_concurrent = max_concurrent
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="sweep-job")
+        self.log_dir = os.path.join(project_dir, "output", "jobs")
+        os.makedirs(self.log_dir, exist_ok=True)
+
+    def submit(self, strategy, symbol, extra_args=()):
+        command = [self.python, "-u", "tuner_runner.py", "--strategy", strategy]
+        if symbol:
+            command += ["--symbol", symbol]
+        command += list(extra_args)
+        if self.max_concurrent > 1:
+            command.append("--local")
+        job = Job(strategy, symbol, command, None)
+        job.log_path = os.path.join(self.log_dir, f"{job.id}.log")
+        with self.lock:
+            self.jobs[job.id] = job
+        self.pool.submit(self._run, job)
+        return job.id
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            return sorted(self.jobs.values(), key=lambda job: job.created, reverse=True)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return False
+        # Under the lock so a job starting right now either sees the request or is killed here
+        with self.lock:
+            job.cancel_requested = True
+            process = job.process
+        if process is not None:
+            self._kill(process)
+        return True
+
+    def _kill(self, process):
+        if process.poll() is None:
+            # The runner and any sweep workers share the job's process group
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+            except (ProcessLookupError, PermissionError):
+                process.terminate()
+
+    def clear_finished(self):
+        with self.lock:
+            for job_id in [j.id for j in self.jobs.values() if j.status in FINISHED]:
+                del self.jobs[job_id]
+
+    def _run(self, job):
+        if job.cancel_requested:
+            job.status, job.finished = "cancelled", time.time()
+            return
+        job.status, job.started = "running", time.time()
+        try:
+            with open(job.log_path, "w") as log_file:
+                process = subprocess.Popen(job.command, cwd=self.project_dir, stdout=subprocess.PIPE,
+                                           stderr=subprocess.STDOUT, text=True, bufsize=1,
+                                           start_new_session=True)
+                with self.lock:
+                    job.process = process
+                    cancelled = job.cancel_requested
+                if cancelled:
+                    # Cancelled between the check above and the start
+                    self._kill(process)
+                for line in job.process.stdout:
+                    line = line.rstrip("\n")
+                    log_file.write(line + "\n")
+                    match = PROGRESS_LINE.match(line)
+                    if match:
+                        job.done, job.total = int(match.group(1)), int(match.group(2))
+                    else:
+                        job.lines.append(line)
+                job.returncode = job.process.wait()
+        except Exception as e:
+            job.lines.append(f"❌ Could not run job: {e}")
+            job.returncode = -1
+        job.finished = time.time()
+        if job.cancel_requested:
+            job.status = "cancelled"
+        else:
+            job.status = "done" if job.returncode == 0 else "failed"
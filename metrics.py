@@ -0,0 +1,136 @@
+# metrics.py
+# Vectorized performance metrics.
+#
+# Everything works along the last axis of an equity array, so one call scores a
+# single curve (bars,) or a whole (combos x bars) matrix. Trade metrics take a
+# (trades x combos) profit matrix plus a `closed` mask, as the batch kernel
+# produces. Returns are bar-to-bar P&L: with fixed lots the P&L does not
+# compound, so Sharpe/Sortino are computed on P&L increments (they are scale
+# free) rather than on percentage returns of a balance that may go negative.
+
+import numpy as np
+
+# FX trades ~260 days a year, around the clock
+TRADING_DAYS = 260
+
+
+def bars_per_year(index=None, minutes=5):
+    # From the bar spacing of a DatetimeIndex (or int64 ns timestamps) when given
+    if index is not None and len(index) > 1:
+        stamps = np.asarray(index, dtype="datetime64[ns]").view("int64")
+        minutes = max(np.median(np.diff(stamps)) / 60e9, 1e-9)
+    return TRADING_DAYS * 1440 / minutes
+
+
+def drawdowns(equity):
+    equity = np.asarray(equity, dtype="float64")
+    return equity - np.maximum.accumulate(equity, axis=-1)
+
+
+def max_drawdown(equity):
+    # Largest peak-to-trough fall in currency (<= 0)
+    equity = np.asarray(equity, dtype="float64")
+    if equity.shape[-1] == 0:
+        return np.zeros(equity.shape[:-1])
+    return drawdowns(equity).min(axis=-1)
+
+
+def max_drawdown_pct(equity):
+    # Largest fall relative to the running peak, as a fraction (<= 0)
+    equity = np.asarray(equity, dtype="float64")
+    if equity.shape[-1] == 0:
+        return np.zeros(equity.shape[:-1])
+    peak = np.maximum.accumulate(equity, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(peak > 0, equity / peak - 1, 0.0).min(axis=-1)
+
+
+def _increments(equity, valid=None):
+    # Bar-to-bar P&L; bars outside `valid` (same shape as equity) become NaN
+    equity = np.asarray(equity, dtype="float64")
+    pnl = np.diff(equity, axis=-1)
+    if valid is not None:
+        pnl = np.where(np.asarray(valid)[..., 1:], pnl, np.nan)
+    return pnl
+
+
+def sharpe(equity, periods_per_year=None, valid=None):
+    pnl = _increments(equity, valid)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.nanmean(pnl, axis=-1) if pnl.shape[-1] else np.zeros(pnl.shape[:-1])
+        std = np.nanstd(pnl, axis=-1) if pnl.shape[-1] else np.zeros(pnl.shape[:-1])
+        ratio = np.where(std > 0, mean / std, 0.0)
+    return np.nan_to_num(ratio) * np.sqrt(periods_per_year or bars_per_year())
+
+
+def sortino(equity, periods_per_year=None, valid=None):
+    pnl = _increments(equity, valid)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.nanmean(pnl, axis=-1) if pnl.shape[-1] else np.zeros(pnl.shape[:-1])
+        downside = np.sqrt(np.nanmean(np.minimum(pnl, 0.0) ** 2, axis=-1)) if pnl.shape[-1] else np.zeros(pnl.shape[:-1])
+        ratio = np.where(downside > 0, mean / downside, 0.0)
+    return np.nan_to_num(ratio) * np.sqrt(periods_per_year or bars_per_year())
+
+
+def profit_factor(profits, closed=None, axis=0):
+    # Gross profit / gross loss (inf with wins and no losses, 0 without wins)
+    profits = np.asarray(profits, dtype="float64")
+    if closed is not None:
+        profits = np.where(closed, profits, 0.0)
+    gross_win = np.where(profits > 0, profits, 0.0).sum(axis=axis)
+    gross_loss = -np.where(profits < 0, profits, 0.0).sum(axis=axis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(gross_loss > 0, gross_win / gross_loss, np.where(gross_win > 0, np.inf, 0.0))
+
+
+def expectancy(profits, closed=None, axis=0):
+    # Average P&L per trade
+    profits = np.asarray(profits, dtype="float64")
+    closed = np.ones(profits.shape, dtype=bool) if closed is None else closed
+    count = closed.sum(axis=axis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(count > 0, np.where(closed, profits, 0.0).sum(axis=axis) / count, 0.0)
+
+
+def score_equity(equity, periods_per_year=None, valid=None):
+    # Curve metrics for (bars,) or (combos x bars) equity in one pass
+    return {
+        "max_drawdown": max_drawdown(equity),
+        "max_drawdown_pct": max_drawdown_pct(equity),
+        "sharpe": sharpe(equity, periods_per_year, valid),
+        "sortino": sortino(equity, periods_per_year, valid),
+    }
+
+
+def score_trades(profits, closed, durations=None):
+    # Trade metrics for a (trades x combos) matrix; durations in bars, same shape
+    metrics = {
+        "profit_factor": profit_factor(profits, closed),
+        "expectancy": expectancy(profits, closed),
+    }
+    if durations is not None:
+        count = closed.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            metrics["avg_trade_bars"] = np.where(count > 0, np.where(closed, durations, 0).sum(axis=0) / count, 0.0)
+        metrics["max_trade_bars"] = np.where(closed, durations, 0).max(axis=0, initial=0)
+    return metrics
+
+
+def stats_dicts(profits, closed, equity, periods_per_year=None, valid=None, durations=None):
+    # One stats dict per combo: counts, net, win rate plus the curve and trade metrics
+    profits = np.asarray(profits, dtype="float64")
+    closed = np.asarray(closed, dtype=bool)
+    total = closed.sum(axis=0)
+    # cumsum adds in trade order, like summing the trade log
+    net = np.cumsum(np.where(closed, profits, 0.0), axis=0)[-1] if len(profits) else np.zeros(closed.shape[1])
+    wins = (closed & (profits > 0)).sum(axis=0)
+    columns = {**score_equity(equity, periods_per_year, valid), **score_trades(profits, closed, durations)}
+    return [
+        {
+            "total_trades": int(total[c]),
+            "net_profit": float(net[c]) if total[c] else 0,
+            "win_rate": float(wins[c] / total[c]) if total[c] else 0,
+            **{name: float(values[c]) for name, values in columns.items()},
+        }
+        for c in range(closed.shape[1])
+    ]
@@ -0,0 +1,151 @@
+# monte_carlo.py
+# Monte Carlo robustness of sweep results.
+#
+# For each combo's trade P&L list, thousands of alternative histories are
+# simulated as (simulations x trades) matrices at once:
+#
+#   shuffle     the same trades in random order (drawdown/ruin depend on order)
+#   bootstrap   trades resampled with replacement
+#   slippage    each trade skipped with probability `skip` and charged a random
+#               cost with mean `slippage` x the combo's mean absolute trade P&L
+#
+# and summarized as net profit / max drawdown quantiles plus the probability of
+# ruin (balance ever at or below `ruin_level`). The cost is about 30 ns per simulated
+# trade per scenario: the default 2000 simulations of a 300-trade combo take ~50 ms,
+# so ranking a 100-combo sweep takes ~5 s on one core (10000 simulations: ~0.3 s per
+# combo). Simulations run in blocks of about `max_elements` values, small enough to
+# stay in cache across the cumsum and running-max passes, so memory stays flat for
+# long trade lists; combos can be spread over worker processes:
+#
+#     python monte_carlo.py --strategy rci_strategy --symbol USDJPY --top 20 --workers 4
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import metrics
+from backtest_kernel import INITIAL_BALANCE
+from tuner_options import DEFAULT_SIMULATIONS
+
+SCENARIOS = ["shuffle", "bootstrap", "slippage"]
+MAX_ELEMENTS = 2 ** 16
+
+
+def simulate(profits, scenario, n_sims, rng, slippage=0.1, skip=0.05):
+    # (n_sims x trades) matrix of simulated trade P&L
+    profits = np.asarray(profits, dtype="float64")
+    if scenario == "shuffle":
+        return rng.permuted(np.broadcast_to(profits, (n_sims, len(profits))), axis=1)
+    if scenario == "bootstrap":
+        return profits[rng.integers(0, len(profits), (n_sims, len(profits)))]
+    if scenario == "slippage":
+        # One uniform draw per trade: below `skip` the trade is skipped, above it is rescaled into the cost
+        draw = rng.random((n_sims, len(profits)))
+        cost = (draw - skip) * (2 * slippage * np.abs(profits).mean() / (1 - skip))
+        return np.where(draw < skip, 0.0, profits - cost)
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+def path_stats(pnl, initial_balance, ruin_level=0.0):
+    # Net profit, max drawdown and ruin flag of every row of a (simulations x trades) P&L matrix.
+    # Works on cumulative P&L from 0 (drawdowns do not depend on the starting balance)
+    cumulative = np.zeros((len(pnl), pnl.shape[1] + 1))
+    np.cumsum(pnl, axis=1, out=cumulative[:, 1:])
+    return (cumulative[:, -1], metrics.max_drawdown(cumulative),
+            cumulative.min(axis=1) <= ruin_level - initial_balance)
+
+
+def robustness(profits, n_sims=DEFAULT_SIMULATIONS, scenarios=SCENARIOS, initial_balance=INITIAL_BALANCE, ruin_level=0.0,
+               seed=0, slippage=0.1, skip=0.05, max_elements=MAX_ELEMENTS):
+    # {scenario: (net, max_drawdown, ruined)} arrays of n_sims values for one trade list
+    rng = np.random.default_rng(seed)
+    profits = np.asarray(profits, dtype="float64")
+    results = {}
+    for scenario in scenarios:
+        if not len(profits):
+            results[scenario] = (np.zeros(n_sims), np.zeros(n_sims), np.full(n_sims, initial_balance <= ruin_level))
+            continue
+        block = max(1, max_elements // len(profits))
+        parts = [path_stats(simulate(profits, scenario, min(block, n_sims - done), rng, slippage, skip),
+                            initial_balance, ruin_level)
+                 for done in range(0, n_sims, block)]
+        results[scenario] = tuple(np.concatenate(values) for values in zip(*parts))
+    return results
+
+
+def summarize(results):
+    # Flat row of quantiles per scenario
+    row = {}
+    for scenario, (net, drawdown, ruined) in results.items():
+        name = scenario.capitalize()
+        row[f"{name} Net p5"] = float(np.percentile(net, 5))
+        row[f"{name} Net p50"] = float(np.percentile(net, 50))
+        row[f"{name} Loss %"] = float(100 * (net < 0).mean())
+        row[f"{name} Max DD p50"] = float(np.percentile(drawdown, 50))
+        # Drawdowns are negative: the 95th percentile drawdown is the 5th percentile value
+        row[f"{name} Max DD p95"] = float(np.percentile(drawdown, 5))
+        row[f"{name} Ruin %"] = float(100 * ruined.mean())
+    return row
+
+
+def _combo_row(combo, params, profits, n_sims, initial_balance, seed, options):
+    row = {"Combo": combo, "Parameters": params, "Trades": len(profits), "Net Profit": float(np.sum(profits))}
+    row.update(summarize(robustness(profits, n_sims, initial_balance=initial_balance, seed=seed, **options)))
+    return row
+
+
+def robustness_report(combo_profits, combos, n_sims=DEFAULT_SIMULATIONS, initial_balance=INITIAL_BALANCE, seed=0,
+                      workers=1, **options):
+    # combo_profits: {combo number: trade P&L}; one summary row per combo (each combo has its own seed)
+    tasks = [(combo, combos[combo], np.asarray(profits, dtype="float64"), n_sims, initial_balance, seed + k, options)
+             for k, (combo, profits) in enumerate(combo_profits.items())]
+    if workers and workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            rows = list(pool.map(_combo_row, *zip(*tasks)))
+    else:
+        rows = [_combo_row(*task) for task in tasks]
+    report = pd.DataFrame(rows)
+    # Worst-case-ish bootstrap profit ranks combos less optimistically than in-sample net
+    return report.sort_values("Bootstrap Net p5", ascending=False) if rows else report
+
+
+def top_combos(summary_rows, top_n, key="Net Profit"):
+    # Indices of the top_n summary rows by `key`
+    values = np.array([row.get(key, 0) for row in summary_rows], dtype="float64")
+    return [int(i) for i in np.argsort(-values, kind="stable")[:top_n]]
+
+
+if __name__ == "__main__":
+    import result_views
+
+    parser = argparse.ArgumentParser(description="Monte Carlo robustness of stored sweep results")
+    parser.add_argument("--strategy", required=True, help="Name of strategy module")
+    parser.add_argument("--symbol", default="USDJPY", help="Symbol the sweep ran on")
+    parser.add_argument("--top", type=int, default=20, help="Number of combos (best net profit first)")
+    parser.add_argument("--simulations", type=int, default=DEFAULT_SIMULATIONS, help="Simulations per scenario and combo")
+    parser.add_argument("--timeframe", default="M5", help="Timeframe the sweep ran on")
+    parser.add_argument("--data-hash", help="Stored data version to rank (default: the most recently written)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (combos are split between them)")
+    parser.add_argument("--output", default="output", help="Folder holding results.sqlite")
+    args = parser.parse_args()
+
+    store = result_views.store_path(args.output)
+    stored = result_views.load_results(store, args.strategy, args.symbol, args.timeframe, args.data_hash)
+    # Rank combos of one data version only (sweep slice, full history and timeframes differ)
+    stored = stored if args.data_hash else result_views.latest_data(stored)
+    versions = result_views.data_versions(stored)
+    if len(versions):
+        print(f"📂 Ranking {result_views.describe_version(versions.iloc[0])}")
+    results = result_views.query(stored, top_n=args.top)
+    # The store keeps per-bar realized equity; its non-zero steps stand in for the trade list
+    combo_profits, combos = {}, {}
+    for row in results.itertuples():
+        steps = np.diff(result_views.equity_curve(store, row.id))
+        combo_profits[row.id], combos[row.id] = steps[steps != 0], row.params
+    report = robustness_report(combo_profits, combos, args.simulations, seed=args.seed, workers=args.workers)
+    report_csv = os.path.join(args.output, f"{args.symbol}_{args.strategy}_robustness.csv")
+    report.to_csv(report_csv, index=False)
+    print(report.head(10).to_string(index=False))
+    print(f"[DEBUG] Saving robustness report to: {report_csv}")
@@ -1,12 +1,19 @@
 
 import os
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+import numpy as np
 import pandas as pd
-import importlib
-from strategies import breaker_pivot_ma_strategy
+from strategies import get_strategy_config
+from candle_store import load_arrays, candles_frame, find_source, store_dir, STORE_COLUMNS
+from indicator_cache import default_cache
+from tuner_engine import run_batch_backtest, group_combos
+from result_store import ResultStore, DEFAULT_STORE, strategy_hash, data_hash
 
-strategy_module = breaker_pivot_ma_strategy
-strategy_config = strategy_module.strategy_config
-parameters = strategy_config["parameters"]
+default_strategy = "breaker_pivot_ma_strategy"
 
 output_dir = "output"
 os.makedirs(output_dir, exist_ok=True)
@@ -17,55 +24,153 @@ pairs = [
     "AUDUSD", "NZDUSD", "USDCAD"
 ]
 
-def load_pair_data(pair):
-    m5_path = f"data/{pair}_Candlestick_5_M_BID_26.04.2023-26.04.2025.csv"
-    m30_path = f"data/{pair}_Candlestick_30_M_BID_26.04.2023-26.04.2025.csv"
-    if not os.path.exists(m5_path) or not os.path.exists(m30_path):
+# Pairs are streamed: loader threads read upcoming pairs while the current one
+# is backtested, as long as the data held in memory stays under the ceiling.
+# Summary rows are appended after every chunk of combos.
+default_memory_mb = 1024
+default_loaders = 2
+default_chunk_size = 32
+
+def load_pair_data(pair, data_path="data"):
+    # Reads the pair fully into memory (off the memory-mapped store)
+    try:
+        frames = []
+        for timeframe in ("M5", "M30"):
+            arrays = {name: np.array(values) for name, values in load_arrays(pair, timeframe, data_path).items()}
+            frames.append(candles_frame(arrays, pair, timeframe))
+    except FileNotFoundError:
         return None, None
-    m5_df = pd.read_csv(m5_path).rename(columns=lambda x: x.strip().lower())
-    m30_df = pd.read_csv(m30_path).rename(columns=lambda x: x.strip().lower())
-    m5_df = m5_df.rename(columns={"local time": "timestamp"})
-    m30_df = m30_df.rename(columns={"local time": "timestamp"})
-    return m5_df, m30_df
-
-def run_strategy_for_all_pairs():
-    import itertools
-    param_names = list(parameters.keys())
-    param_values = list(parameters.values())
-    all_combos = list(itertools.product(*param_values))
-
-    summary = []
-
-    for pair in pairs:
-        m5_df, m30_df = load_pair_data(pair)
-        if m5_df is None:
-            print(f"⚠️ Missing data for {pair}")
+    return tuple(frames)
+
+def estimate_pair_bytes(pair, data_path="data"):
+    # In-memory size of a pair from the store metadata, or the CSV size before ingestion
+    total = 0
+    for timeframe in ("M5", "M30"):
+        meta_path = os.path.join(store_dir(pair, timeframe, data_path), "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                total += json.load(f)["rows"] * len(STORE_COLUMNS) * 8
             continue
-        print(f"📈 Testing {pair} with {len(all_combos)} combinations")
-
-        for i, combo in enumerate(all_combos, 1):
-            print(f"   ⏳ Combo {i}/{len(all_combos)}: {combo}")
-            kwargs = dict(zip(param_names, combo))
-            kwargs["initial_balance"] = 400
-            kwargs["lot_size"] = 0.01
-
-            try:
-                trades, equity = strategy_module.run(m5_df.copy(), m30_df.copy(), **kwargs)
-                profit = equity - 400
-                drawdown = min([t["profit"] for t in trades], default=0)
-                summary.append({
-                    "pair": pair,
-                    **kwargs,
-                    "profit": round(profit, 2),
-                    "drawdown": round(abs(drawdown), 2),
-                    "trades": len(trades)
-                })
-            except Exception as e:
-                print(f"❌ Failed on {pair} combo {combo}: {e}")
-
-    df = pd.DataFrame(summary)
-    df.to_csv(os.path.join(output_dir, "summary_all_pairs.csv"), index=False)
-    print("✅ All pair backtests complete. Saved to output/summary_all_pairs.csv")
+        try:
+            total += os.path.getsize(find_source(pair, timeframe, data_path))
+        except FileNotFoundError:
+            pass
+    return total
+
+def stream_pairs(pair_list, memory_mb=default_memory_mb, loaders=default_loaders, data_path="data"):
+    # Yields (pair, m5_df, m30_df) in order. A pair is only prefetched when it fits
+    # next to the pairs already loaded, including the one handed out last, which
+    # counts until the next pair replaces it (drop its frames before asking for the
+    # next one). A pair too large to fit next to anything is loaded on its own.
+    ceiling = memory_mb * 2 ** 20
+    in_flight = max(1, loaders)
+    upcoming = deque((pair, estimate_pair_bytes(pair, data_path)) for pair in pair_list)
+    loading = deque()
+    resident = 0
+    held = 0
+    with ThreadPoolExecutor(max_workers=in_flight) as pool:
+        while upcoming or loading:
+            while upcoming and len(loading) < in_flight and (resident + upcoming[0][1] <= ceiling or not (loading or held)):
+                pair, size = upcoming.popleft()
+                loading.append((pair, size, pool.submit(load_pair_data, pair, data_path)))
+                resident += size
+            if not loading:
+                # The next pair only fits once the last one is released
+                resident -= held
+                held = 0
+                continue
+            pair, size, future = loading.popleft()
+            frames = future.result()
+            del future
+            resident -= held
+            held = size
+            yield (pair, *frames)
+            del frames
+
+def append_summary(path, rows):
+    if rows:
+        pd.DataFrame(rows).to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+def run_strategy_for_all_pairs(strategy_name=default_strategy, resume=True, memory_mb=default_memory_mb,
+                               loaders=default_loaders, chunk_size=default_chunk_size, pair_list=None):
+    strategy_config = get_strategy_config(strategy_name)
+    keys, values = zip(*strategy_config["params"].items())
+    all_combos = [dict(zip(keys, v)) for v in product(*values)]
+
+    # Every finished combo is stored right away; reruns skip what is already there
+    store = ResultStore(os.path.join(output_dir, DEFAULT_STORE))
+    strategy_key = strategy_hash(strategy_config["module"])
+    summary_csv = os.path.join(output_dir, "summary_all_pairs.csv")
+    if os.path.exists(summary_csv):
+        os.remove(summary_csv)
+
+    def summary_row(pair, params, stats):
+        return {
+            "pair": pair,
+            **params,
+            "profit": round(stats["net_profit"], 2),
+            "drawdown": round(abs(stats["max_drawdown"]), 2),
+            "profit_factor": round(stats.get("profit_factor", 0), 2),
+            "sharpe": round(stats.get("sharpe", 0), 2),
+            "trades": stats["total_trades"]
+        }
+
+    started = time.time()
+    try:
+        for pair, m5_df, m30_df in stream_pairs(pair_list or pairs, memory_mb, loaders):
+            if m5_df is None:
+                print(f"⚠️ Missing data for {pair}")
+                continue
+            print(f"📈 Testing {pair} with {len(all_combos)} combinations")
+            data_key = data_hash(m5_df, m30_df)
+
+            rows = []
+            pending = []
+            for i, params in enumerate(all_combos):
+                stored = store.get(strategy_key, pair, data_key, params) if resume else None
+                if stored is None:
+                    pending.append(i)
+                else:
+                    rows.append(summary_row(pair, params, stored[0]))
+            if rows:
+                print(f"   ♻️ {len(rows)} combos already stored")
+                append_summary(summary_csv, rows)
+
+            done = len(rows)
+            for chunk in group_combos(all_combos, strategy_config.get("vectorized_params", []),
+                                      max_size=chunk_size, indices=pending):
+                batch = [all_combos[i] for i in chunk]
+                try:
+                    outputs = run_batch_backtest(strategy_config, m5_df, m30_df, batch)
+                except Exception as e:
+                    print(f"❌ Failed on {pair} combos {batch}: {e}")
+                    continue
+                rows = []
+                for params, (trades, equity, stats) in zip(batch, outputs):
+                    store.put(strategy_name, strategy_key, pair, data_key, params, stats, equity)
+                    rows.append(summary_row(pair, params, stats))
+                append_summary(summary_csv, rows)
+                done += len(chunk)
+                print(f"   ⏳ {pair}: {done}/{len(all_combos)} combos")
+
+            # Indicators of a finished pair are never hit again
+            default_cache.clear()
+            del m5_df, m30_df
+    finally:
+        store.close()
+
+    print(f"✅ All pair backtests complete in {time.time() - started:.1f}s. Saved to {summary_csv}")
 
 if __name__ == "__main__":
-    run_strategy_for_all_pairs()
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--strategy", default=default_strategy, help="Name of a registered strategy")
+    parser.add_argument("--rerun", action="store_true", help="Ignore stored results and recompute every combo")
+    parser.add_argument("--memory-mb", type=int, default=default_memory_mb, help="Ceiling for pair data held in memory at once")
+    parser.add_argument("--loaders", type=int, default=default_loaders, help="Threads loading upcoming pairs during compute")
+    parser.add_argument("--chunk-size", type=int, default=default_chunk_size, help="Combos per batch between summary appends")
+    parser.add_argument("--pairs", nargs="+", help="Pairs to test (default: the seven majors)")
+    args = parser.parse_args()
+
+    run_strategy_for_all_pairs(args.strategy, resume=not args.rerun, memory_mb=args.memory_mb,
+                               loaders=args.loaders, chunk_size=args.chunk_size, pair_list=args.pairs)
@@ -0,0 +1,284 @@
+# optimizer.py
+# Budgeted parameter search as an alternative to the exhaustive grid sweep.
+#
+# Search space: every key of a strategy's parameter_grid (lists are categorical),
+# overridden by its optional parameter_space where a range can be given as
+#   (low, high)          uniform float
+#   (low, high, "int")   uniform integer
+# Methods:
+#   random     independent samples from the space
+#   halving    successive halving: many configs on a short slice of history,
+#              the best 1/eta promoted to longer slices, up to the full history
+#   hyperband  several halving brackets trading breadth for history length
+#   tpe        tree-structured Parzen estimator over the completed trials
+
+import os
+import time
+import math
+import numpy as np
+import pandas as pd
+from strategies import get_strategy_config
+from candle_store import load_candles
+from timeframe_align import same_span
+from tuner_engine import run_batch_backtest, group_combos
+from result_store import params_hash
+from tuner_options import METHODS
+
+
+def search_space(config):
+    space = {name: list(values) for name, values in config["params"].items()}
+    space.update(config.get("space") or {})
+    return space
+
+
+def is_range(spec):
+    return isinstance(spec, tuple)
+
+
+def sample_params(space, rng):
+    params = {}
+    for name, spec in space.items():
+        if is_range(spec):
+            low, high = spec[0], spec[1]
+            if len(spec) > 2 and spec[2] == "int":
+                params[name] = int(rng.integers(low, high + 1))
+            else:
+                params[name] = float(rng.uniform(low, high))
+        else:
+            params[name] = spec[int(rng.integers(len(spec)))]
+    return params
+
+
+class Budget:
+    def __init__(self, max_trials=None, max_seconds=None):
+        self.max_trials = max_trials
+        self.max_seconds = max_seconds
+        self.started = time.time()
+        self.trials = 0
+
+    def exhausted(self):
+        if self.max_trials is not None and self.trials >= self.max_trials:
+            return True
+        return self.max_seconds is not None and time.time() - self.started >= self.max_seconds
+
+    def remaining_trials(self, default):
+        if self.max_trials is None:
+            return default
+        return max(0, self.max_trials - self.trials)
+
+
+class Evaluator:
+    # Scores params on the first `fraction` of the history; slices and scores are reused
+
+    def __init__(self, config, m5_df, m30_df, metric="net_profit"):
+        self.config = config
+        self.m5_df = m5_df
+        self.m30_df = m30_df
+        self.metric = metric
+        self.slices = {}
+        self.scores = {}
+        self.trials = []
+
+    def data(self, fraction):
+        if fraction not in self.slices:
+            end = max(1, int(len(self.m5_df) * fraction))
+            m5 = self.m5_df.iloc[:end]
+            m30 = same_span(m5, self.m30_df)
+            self.slices[fraction] = (m5, m30)
+        return self.slices[fraction]
+
+    def evaluate(self, params_list, fraction=1.0, budget=None):
+        # Returns one score per params (NaN on failure). Every proposal costs one trial,
+        # repeats included, so a search over a small categorical space still terminates
+        todo = [p for p in params_list if (params_hash(p), fraction) not in self.scores]
+        unique = list({params_hash(p): p for p in todo}.values())
+        if budget is not None:
+            budget.trials += len(params_list) - len(unique)
+        m5, m30 = self.data(fraction)
+        for group in group_combos(unique, self.config.get("vectorized_params", [])):
+            batch = [unique[i] for i in group]
+            try:
+                outputs = run_batch_backtest(self.config, m5, m30, batch)
+                scores = [float(stats.get(self.metric, np.nan)) for _, _, stats in outputs]
+            except Exception as e:
+                print(f"❌ Failed on {batch}: {e}")
+                scores = [np.nan] * len(batch)
+            for params, score in zip(batch, scores):
+                self.scores[(params_hash(params), fraction)] = score
+                self.trials.append({"params": params, "fraction": fraction, "bars": len(m5), self.metric: score})
+                if budget is not None:
+                    budget.trials += 1
+        return [self.scores[(params_hash(p), fraction)] for p in params_list]
+
+
+def _rank(scores):
+    # Indices best-first; failed (NaN) trials last
+    scores = np.asarray(scores, dtype="float64")
+    return np.argsort(np.where(np.isnan(scores), -np.inf, scores), kind="stable")[::-1]
+
+
+def random_search(evaluator, space, budget, rng, batch_size=16):
+    while not budget.exhausted():
+        candidates = [sample_params(space, rng) for _ in range(min(batch_size, budget.remaining_trials(batch_size)))]
+        if not candidates:
+            break
+        evaluator.evaluate(candidates, budget=budget)
+
+
+def halving_rungs(n_configs, eta):
+    return int(round(math.log(n_configs, eta))) if n_configs > 1 else 0
+
+
+def halving_cost(n_configs, eta, rungs):
+    # Trials a bracket spends: every rung evaluates all of its configs
+    cost, configs = 0, n_configs
+    for _ in range(rungs + 1):
+        cost += configs
+        configs = max(1, configs // eta)
+    return cost
+
+
+def fit_bracket(n_configs, eta, rungs, remaining):
+    # Largest bracket up to n_configs (and rungs) whose every rung, the full-history
+    # one included, fits the remaining trials; (0, 0) when none does
+    for n in range(n_configs, 0, -1):
+        fitted = halving_rungs(n, eta) if rungs is None else min(rungs, halving_rungs(n, eta))
+        if halving_cost(n, eta, fitted) <= remaining:
+            return n, fitted
+    return 0, 0
+
+
+def successive_halving(evaluator, space, budget, rng, n_configs=27, eta=3, rungs=None):
+    # Rung k runs on eta**(k - rungs) of the history; the last rung is the full history.
+    # Returns False when not even one config fits the remaining trials
+    n_configs, rungs = fit_bracket(n_configs, eta, rungs, budget.remaining_trials(math.inf))
+    if n_configs == 0:
+        return False
+    configs = [sample_params(space, rng) for _ in range(n_configs)]
+    for k in range(rungs + 1):
+        if budget.exhausted():
+            break
+        fraction = 1.0 if k == rungs else float(eta) ** (k - rungs)
+        configs = configs[:budget.remaining_trials(len(configs))]
+        scores = evaluator.evaluate(configs, fraction, budget)
+        print(f"🪜 Rung {fraction:.3f} of history: {len(configs)} configs, best {np.nanmax(scores):.2f}")
+        keep = max(1, len(configs) // eta)
+        configs = [configs[i] for i in _rank(scores)[:keep]]
+    return True
+
+
+def halving_search(evaluator, space, budget, rng, n_configs=27, eta=3):
+    while not budget.exhausted():
+        if not successive_halving(evaluator, space, budget, rng, n_configs, eta):
+            break
+
+
+def hyperband(evaluator, space, budget, rng, max_rungs=3, eta=3):
+    # Brackets from many configs on short slices down to a few on the full history
+    while not budget.exhausted():
+        started = False
+        for rungs in range(max_rungs, -1, -1):
+            if budget.exhausted():
+                return
+            n_configs = int(math.ceil((max_rungs + 1) / (rungs + 1) * eta ** rungs))
+            started |= successive_halving(evaluator, space, budget, rng, n_configs, eta, rungs)
+        if not started:
+            return
+
+
+def _parzen_logpdf(values, centers, low, high):
+    # Gaussian mixture around observed values plus a uniform prior component
+    centers = np.asarray(centers, dtype="float64")
+    width = (high - low) or 1.0
+    bandwidth = max(width / max(len(centers), 1) ** 0.8, width * 1e-3)
+    z = (values[:, None] - centers[None, :]) / bandwidth
+    kernel = np.exp(-0.5 * z ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    density = (kernel.sum(axis=1) + 1.0 / width) / (len(centers) + 1)
+    return np.log(density)
+
+
+def tpe_search(evaluator, space, budget, rng, n_startup=10, n_candidates=24, gamma=0.25):
+    history = []
+    while not budget.exhausted():
+        if len(history) < n_startup:
+            params = sample_params(space, rng)
+        else:
+            scores = np.array([score for _, score in history])
+            order = _rank(scores)
+            n_good = max(1, int(math.ceil(gamma * len(history))))
+            good = [history[i][0] for i in order[:n_good]]
+            bad = [history[i][0] for i in order[n_good:]]
+
+            candidates = [{} for _ in range(n_candidates)]
+            log_ratio = np.zeros(n_candidates)
+            for name, spec in space.items():
+                if is_range(spec):
+                    low, high = float(spec[0]), float(spec[1])
+                    good_values = np.array([p[name] for p in good], dtype="float64")
+                    bandwidth = max((high - low) / len(good_values) ** 0.8, (high - low) * 1e-3)
+                    draws = np.clip(rng.choice(good_values, n_candidates) + rng.normal(0, bandwidth, n_candidates), low, high)
+                    if len(spec) > 2 and spec[2] == "int":
+                        draws = np.round(draws)
+                    log_ratio += _parzen_logpdf(draws, good_values, low, high)
+                    log_ratio -= _parzen_logpdf(draws, [p[name] for p in bad] or [0.5 * (low + high)], low, high)
+                    for candidate, value in zip(candidates, draws):
+                        candidate[name] = int(value) if len(spec) > 2 and spec[2] == "int" else float(value)
+                else:
+                    # Laplace-smoothed category frequencies
+                    keys = [repr(v) for v in spec]
+                    good_freq = np.array([sum(repr(p[name]) == k for p in good) for k in keys]) + 1.0
+                    bad_freq = np.array([sum(repr(p[name]) == k for p in bad) for k in keys]) + 1.0
+                    good_freq /= good_freq.sum()
+                    bad_freq /= bad_freq.sum()
+                    picks = rng.choice(len(spec), n_candidates, p=good_freq)
+                    log_ratio += np.log(good_freq[picks]) - np.log(bad_freq[picks])
+                    for candidate, pick in zip(candidates, picks):
+                        candidate[name] = spec[pick]
+            params = candidates[int(np.argmax(log_ratio))]
+
+        score = evaluator.evaluate([params], budget=budget)[0]
+        history.append((params, score))
+
+
+def run_optimization(strategy_name, symbol, method="random", max_trials=None, max_seconds=None,
+                     data_path="data", output_path="output", metric="net_profit", seed=0, fixed_params=None):
+    if method not in METHODS:
+        raise ValueError(f"Unknown optimizer: {method}")
+    if max_trials is None and max_seconds is None:
+        max_trials = 50
+
+    config = get_strategy_config(strategy_name)
+    space = search_space(config)
+    space.update({k: [v] for k, v in (fixed_params or {}).items()})
+    m5_df = load_candles(symbol, "M5", data_path)
+    m30_df = load_candles(symbol, "M30", data_path)
+
+    evaluator = Evaluator(config, m5_df, m30_df, metric)
+    budget = Budget(max_trials, max_seconds)
+    rng = np.random.default_rng(seed)
+    print(f"🎯 {method} search for {strategy_name} on {symbol} ({len(m5_df)} M5 bars), "
+          f"budget: {max_trials or '∞'} trials / {max_seconds or '∞'} s")
+
+    searches = {
+        "random": random_search,
+        "halving": halving_search,
+        "hyperband": hyperband,
+        "tpe": tpe_search,
+    }
+    searches[method](evaluator, space, budget, rng)
+
+    trials = pd.DataFrame(evaluator.trials)
+    os.makedirs(output_path, exist_ok=True)
+    trials_csv = os.path.join(output_path, f"{symbol}_{strategy_name}_{method}_trials.csv")
+    trials.to_csv(trials_csv, index=False)
+
+    # Only full-history scores are comparable across methods
+    full = trials[trials["fraction"] >= 1.0] if len(trials) else trials
+    if full.empty:
+        print(f"⚠️ No full-history evaluations within budget; trials saved to {trials_csv}")
+        return None
+    best = full.loc[full[metric].idxmax()] if full[metric].notna().any() else full.iloc[0]
+    print(f"🏆 Best {metric}: {best[metric]:.2f} with {best['params']} "
+          f"({len(trials)} backtests in {time.time() - budget.started:.1f}s)")
+    print(f"[DEBUG] Saving trials to: {trials_csv}")
+    return best["params"], best[metric]
@@ -0,0 +1,164 @@
+# paper_trading.py
+# Bar-replay paper trading.
+#
+# A simulated feed pushes stored candles one bar at a time (as fast as possible,
+# or paced at `speed` x real time) through a strategy's live_strategy twin, which
+# updates its streaming indicators and paper positions per bar. The replay
+# records trades, the equity curve, stats and the time each bar took:
+#
+#     python paper_trading.py --strategy rci_strategy --symbol USDJPY --check
+#     python paper_trading.py --strategy rci_strategy --symbol USDJPY --speed 600 --bars 2000
+
+import os
+import json
+import time
+import argparse
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from candle_store import load_candles
+from strategies import get_strategy_config
+from tuner_engine import run_backtest
+from backtest_kernel import trade_stats
+from metrics import bars_per_year
+
+Bar = namedtuple("Bar", "time open high low close volume")
+
+
+class SimulatedFeed:
+    # Yields stored candles as Bars; speed > 0 paces them at speed x their real spacing
+    def __init__(self, df, speed=0.0):
+        self.df = df
+        self.speed = speed
+
+    def __len__(self):
+        return len(self.df)
+
+    def __iter__(self):
+        columns = [self.df[c].to_numpy(dtype="float64").tolist() for c in ("Open", "High", "Low", "Close", "Volume")]
+        stamps = self.df.index.asi8
+        started = time.perf_counter()
+        for k, (t, *values) in enumerate(zip(self.df.index, *columns)):
+            if self.speed:
+                due = started + (stamps[k] - stamps[0]) / 1e9 / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield Bar(t, *values)
+
+
+def replay(live, feed, on_trade=None):
+    # Runs every bar of the feed through the live strategy
+    trades, durations, equity, times = [], [], [], []
+    latency = np.zeros(len(feed), dtype="int64")
+    cumulative = 0.0
+    for k, bar in enumerate(feed):
+        started = time.perf_counter_ns()
+        closed = live.on_bar(bar)
+        latency[k] = time.perf_counter_ns() - started
+        realized = 0.0
+        for trade, held in closed:
+            trades.append(trade)
+            durations.append(held)
+            realized += trade["profit"]
+            if on_trade:
+                on_trade(trade)
+        # Realized balance per bar from the strategy's first tradable bar, like the kernel's
+        if k >= live.start:
+            cumulative += realized
+            equity.append(live.initial_balance + cumulative)
+        times.append(bar.time)
+
+    equity_curve = np.array([live.initial_balance] + equity)
+    profits = [t["profit"] for t in trades]
+    return {
+        "trades": trades,
+        "equity_curve": equity_curve.tolist(),
+        "stats": trade_stats(profits, equity_curve, durations, bars_per_year(pd.DatetimeIndex(times))),
+        "latency_us": latency / 1000,
+    }
+
+
+def latency_report(latency_us):
+    if not len(latency_us):
+        return "no bars"
+    p50, p99 = np.percentile(latency_us, [50, 99])
+    return (f"{len(latency_us)} bars, mean {latency_us.mean():.1f} µs, p50 {p50:.1f} µs, "
+            f"p99 {p99:.1f} µs, max {latency_us.max():.1f} µs")
+
+
+def compare(batch, live):
+    # Differences between a batch backtest and a replay of the same bars (empty when they match)
+    trades, equity, stats = batch
+    problems = []
+    if len(trades) != len(live["trades"]):
+        problems.append(f"trade count {len(trades)} vs {len(live['trades'])}")
+    for k, (expected, actual) in enumerate(zip(trades, live["trades"])):
+        if expected != actual:
+            problems.append(f"trade {k}: {expected} vs {actual}")
+            break
+    if not np.array_equal(np.asarray(equity, dtype="float64"), np.asarray(live["equity_curve"])):
+        problems.append("equity curves differ")
+    for key, value in stats.items():
+        if not np.isclose(value, live["stats"].get(key, np.nan), rtol=1e-9, equal_nan=True):
+            problems.append(f"{key}: {value} vs {live['stats'].get(key)}")
+    return problems
+
+
+def run_paper_trading(strategy_name, symbol, params=None, timeframe="M5", data_path="data", output_path="output",
+                      bars=None, speed=0.0, check=False):
+    config = get_strategy_config(strategy_name)
+    if config["live"] is None:
+        raise ValueError(f"{strategy_name} has no live_strategy for paper trading")
+    if params is None:
+        params = {k: v[0] for k, v in config["params"].items()}
+
+    df = load_candles(symbol, timeframe, data_path)
+    if bars:
+        df = df.tail(bars)
+    print(f"📡 Replaying {len(df)} {symbol} {timeframe} bars through {strategy_name} {params}"
+          f"{f' at {speed:g}x' if speed else ''}")
+
+    def on_trade(trade):
+        if speed:
+            print(f"💱 {trade['exit_time']} {trade['type']} {trade['entry_price']:.5f} -> "
+                  f"{trade['exit_price']:.5f} | {trade['profit']:+.2f}")
+
+    result = replay(config["live"](params), SimulatedFeed(df, speed), on_trade)
+    print(f"✅ {len(result['trades'])} trades | Net: {result['stats']['net_profit']:.2f}")
+    print(f"⏱️ Per-bar latency: {latency_report(result['latency_us'])}")
+
+    os.makedirs(output_path, exist_ok=True)
+    trades_csv = os.path.join(output_path, f"{symbol}_{strategy_name}_paper_trades.csv")
+    pd.DataFrame(result["trades"]).to_csv(trades_csv, index=False)
+    print(f"[DEBUG] Saving paper trades to: {trades_csv}")
+
+    if check:
+        # The same bars through the batch backtest must give the same trades, equity and stats
+        problems = compare(run_backtest(config["runner"], df, None, params), result)
+        print("✅ Replay matches the batch backtest" if not problems else
+              "❌ Replay differs from the batch backtest:\n  " + "\n  ".join(problems))
+        result["mismatches"] = problems
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay stored bars through a strategy as a paper-trading feed")
+    parser.add_argument("--strategy", required=True, help="Name of strategy module to run")
+    parser.add_argument("--symbol", default="USDJPY", help="Symbol to replay")
+    parser.add_argument("--timeframe", default="M5", help="Timeframe of the replayed bars")
+    parser.add_argument("--params", help='JSON params, e.g. \'{"rci_length": 10}\' (default: first grid combo)')
+    parser.add_argument("--bars", type=int, help="Replay only the last N bars")
+    parser.add_argument("--speed", type=float, default=0.0, help="Pace bars at this multiple of real time (0: as fast as possible)")
+    parser.add_argument("--check", action="store_true", help="Compare the replay with the batch backtest")
+    args = parser.parse_args()
+
+    params = None
+    if args.params:
+        config = get_strategy_config(args.strategy)
+        params = {k: v[0] for k, v in config["params"].items()}
+        params.update(json.loads(args.params))
+    result = run_paper_trading(args.strategy, args.symbol, params, args.timeframe, bars=args.bars,
+                               speed=args.speed, check=args.check)
+    if args.check and result["mismatches"]:
+        raise SystemExit(1)
@@ -0,0 +1,245 @@
+# portfolio_backtest.py
+# Portfolio backtest of several pairs traded from one shared account.
+#
+# Each assignment (pair, strategy, params) is backtested on its own pair as
+# usual, giving a time-ordered trade stream. The streams are then merged onto a
+# single timestamp axis (the union of every pair's bar times) and replayed
+# against one balance: an entry is only taken while the account is under its
+# position limits and has free margin for it, so a pair can lose trades to the
+# others. A rejected trade does not reopen its pair for signals it skipped.
+#
+# Margin is a flat amount per position (notional / leverage, in account units,
+# like the P&L, without currency conversion). Free margin uses the realized
+# balance. Equity is marked to market on every bar of the merged axis from
+# each pair's last close, so overlapping drawdowns show up in the curve:
+#
+#     python portfolio_backtest.py --strategy rci_strategy --pairs USDJPY EURUSD --max-positions 2
+#     python portfolio_backtest.py --assignments portfolio.json --best
+
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from strategies import get_strategy_config
+from tuner_engine import run_batch_backtest
+from multi_pair_backtest import load_pair_data, pairs as default_pairs
+from backtest_kernel import CONTRACT_SIZE, LOT_SIZE, INITIAL_BALANCE, trade_stats
+from metrics import bars_per_year
+import result_views
+
+DEFAULT_LEVERAGE = 30
+
+
+def currencies(pair):
+    return pair[:3], pair[3:6]
+
+
+def merge_timestamps(arrays):
+    # Union of sorted int64 timestamp arrays; the stable sort (timsort) merges the k sorted runs
+    merged = np.sort(np.concatenate(arrays), kind="stable")
+    return merged[np.r_[True, merged[1:] != merged[:-1]]] if len(merged) else merged
+
+
+def trade_stream(pair, trades, units=CONTRACT_SIZE * LOT_SIZE):
+    # Trade dicts of one pair as arrays
+    return {
+        "pair": pair,
+        "entry_ns": np.array([pd.Timestamp(t["entry_time"]).value for t in trades], dtype="int64"),
+        "exit_ns": np.array([pd.Timestamp(t["exit_time"]).value for t in trades], dtype="int64"),
+        "side": np.array([1 if t["type"] == "long" else -1 for t in trades], dtype="int64"),
+        "entry_price": np.array([t["entry_price"] for t in trades], dtype="float64"),
+        "profit": np.array([t["profit"] for t in trades], dtype="float64"),
+        "units": units,
+    }
+
+
+def accept_trades(streams, initial_balance, max_positions=None, margin=0.0, max_per_currency=None):
+    # Walks entries and exits of all streams in time order (exits first at equal times)
+    # and decides which entries the shared account takes
+    sizes = [len(s["profit"]) for s in streams]
+    stream_id = np.repeat(np.arange(len(streams)), sizes)
+    entry_ns = np.concatenate([s["entry_ns"] for s in streams]) if streams else np.zeros(0, dtype="int64")
+    exit_ns = np.concatenate([s["exit_ns"] for s in streams]) if streams else np.zeros(0, dtype="int64")
+    profit = np.concatenate([s["profit"] for s in streams]) if streams else np.zeros(0)
+    trade = np.arange(len(profit))
+    lasting = exit_ns > entry_ns
+
+    times = np.concatenate([exit_ns[lasting], entry_ns])
+    kinds = np.concatenate([np.zeros(lasting.sum(), dtype="int64"), np.ones(len(trade), dtype="int64")])
+    ids = np.concatenate([trade[lasting], trade])
+    order = np.lexsort((ids, kinds, times))
+
+    pair_currencies = [currencies(s["pair"]) for s in streams]
+    accepted = np.zeros(len(profit), dtype=bool)
+    rejected = {"positions": 0, "margin": 0, "currency": 0}
+    balance, used, open_positions = initial_balance, 0.0, 0
+    exposure = {}
+    profit_list, stream_list, lasting_list = profit.tolist(), stream_id.tolist(), lasting.tolist()
+    for kind, k in zip(kinds[order].tolist(), ids[order].tolist()):
+        involved = pair_currencies[stream_list[k]]
+        if kind == 0:
+            if accepted[k]:
+                balance += profit_list[k]
+                used -= margin
+                open_positions -= 1
+                for currency in involved:
+                    exposure[currency] -= 1
+            continue
+        if max_positions is not None and open_positions >= max_positions:
+            rejected["positions"] += 1
+        elif balance - used < margin or balance <= 0:
+            rejected["margin"] += 1
+        elif max_per_currency is not None and any(exposure.get(c, 0) >= max_per_currency for c in involved):
+            rejected["currency"] += 1
+        else:
+            accepted[k] = True
+            if lasting_list[k]:
+                used += margin
+                open_positions += 1
+                for currency in involved:
+                    exposure[currency] = exposure.get(currency, 0) + 1
+            else:
+                balance += profit_list[k]
+    return accepted, stream_id, rejected
+
+
+def portfolio_equity(streams, accepted, axis, closes, initial_balance):
+    # Realized balance, marked-to-market equity and open positions on every bar of `axis`.
+    # closes: {pair: (timestamps, close)}; open P&L of a pair is units(t) * close(t) - cost(t),
+    # with units/cost built from difference arrays over each trade's [entry, exit) bars
+    n = len(axis)
+    offsets = np.cumsum([0] + [len(s["profit"]) for s in streams])
+    realized = np.zeros(n)
+    unrealized = np.zeros(n)
+    positions = np.zeros(n + 1, dtype="int64")
+    for k, stream in enumerate(streams):
+        taken = accepted[offsets[k]:offsets[k + 1]]
+        entry = np.searchsorted(axis, stream["entry_ns"][taken])
+        exit = np.searchsorted(axis, stream["exit_ns"][taken])
+        realized += np.bincount(exit, weights=stream["profit"][taken], minlength=n)[:n]
+        signed = stream["side"][taken] * stream["units"]
+        units = np.bincount(entry, signed, n + 1) - np.bincount(exit, signed, n + 1)
+        cost = np.bincount(entry, signed * stream["entry_price"][taken], n + 1) - \
+            np.bincount(exit, signed * stream["entry_price"][taken], n + 1)
+        stamps, close = closes[stream["pair"]]
+        last = np.searchsorted(stamps, axis, side="right") - 1
+        aligned = np.where(last >= 0, close[np.maximum(last, 0)], np.nan)
+        held = np.cumsum(units)[:n]
+        unrealized += np.where(held != 0, held * aligned - np.cumsum(cost)[:n], 0.0)
+        positions += np.bincount(entry, minlength=n + 1) - np.bincount(exit, minlength=n + 1)
+    balance = initial_balance + np.cumsum(realized)
+    return balance, balance + unrealized, np.cumsum(positions)[:n]
+
+
+def run_portfolio(assignments, data_path="data", initial_balance=None, max_positions=None,
+                  leverage=DEFAULT_LEVERAGE, max_per_currency=None, cache=None):
+    # assignments: [{"pair", "strategy", "params"}]; cache ({(pair, strategy, params json): stream})
+    # lets many assignment sets reuse the per-pair backtests
+    cache = {} if cache is None else cache
+    frames, streams = {}, []
+    for assignment in assignments:
+        pair, strategy = assignment["pair"], assignment["strategy"]
+        config = get_strategy_config(strategy)
+        params = assignment.get("params") or {k: v[0] for k, v in config["params"].items()}
+        if pair not in frames:
+            frames[pair] = load_pair_data(pair, data_path)
+            if frames[pair][0] is None:
+                raise FileNotFoundError(f"Missing data for {pair}")
+        key = (pair, strategy, json.dumps(params, sort_keys=True, default=str))
+        if key not in cache:
+            m5_df, m30_df = frames[pair]
+            trades = run_batch_backtest(config, m5_df, m30_df, [params])[0][0]
+            cache[key] = trade_stream(pair, trades)
+        streams.append({**cache[key], "strategy": strategy, "params": params})
+
+    initial_balance = INITIAL_BALANCE * len(assignments) if initial_balance is None else initial_balance
+    margin = CONTRACT_SIZE * LOT_SIZE / leverage
+    accepted, stream_id, rejected = accept_trades(streams, initial_balance, max_positions, margin, max_per_currency)
+
+    axis = merge_timestamps([frames[p][0].index.asi8 for p in frames])
+    closes = {p: (frames[p][0].index.asi8, frames[p][0]["Close"].to_numpy()) for p in frames}
+    balance, equity, positions = portfolio_equity(streams, accepted, axis, closes, initial_balance)
+
+    # Accepted trades in exit order, as the account realized them
+    exit_ns = np.concatenate([s["exit_ns"] for s in streams]) if streams else np.zeros(0, dtype="int64")
+    entry_ns = np.concatenate([s["entry_ns"] for s in streams]) if streams else np.zeros(0, dtype="int64")
+    profit = np.concatenate([s["profit"] for s in streams]) if streams else np.zeros(0)
+    taken = np.flatnonzero(accepted)
+    taken = taken[np.argsort(exit_ns[taken], kind="stable")]
+    durations = np.searchsorted(axis, exit_ns[taken]) - np.searchsorted(axis, entry_ns[taken])
+    stats = trade_stats(profit[taken], np.r_[initial_balance, equity], durations, bars_per_year(axis.view("datetime64[ns]")))
+
+    per_stream = []
+    for k, stream in enumerate(streams):
+        mine = stream_id == k
+        per_stream.append({
+            "pair": stream["pair"],
+            "strategy": stream["strategy"],
+            "params": stream["params"],
+            "signals": int(mine.sum()),
+            "taken": int((mine & accepted).sum()),
+            "isolated_net": float(stream["profit"].sum()),
+            "portfolio_net": float(stream["profit"][accepted[mine]].sum()),
+        })
+    return {
+        "equity": pd.DataFrame({"balance": balance, "equity": equity, "open_positions": positions},
+                               index=pd.DatetimeIndex(axis.view("datetime64[ns]"), name="time")),
+        "stats": stats,
+        "pairs": pd.DataFrame(per_stream),
+        "rejected": rejected,
+    }
+
+
+def best_assignments(strategy, pair_list, output_path="output", timeframe="M5"):
+    # Highest net-profit stored combo of the strategy for each pair (first grid combo when none is stored),
+    # ranked within the pair's most recently written data version of `timeframe`
+    store = result_views.store_path(output_path)
+    assignments = []
+    for pair in pair_list:
+        stored = result_views.latest_data(result_views.load_results(store, strategy, pair, timeframe))
+        top = result_views.query(stored, top_n=1)
+        assignments.append({"pair": pair, "strategy": strategy,
+                            "params": json.loads(top["params"].iloc[0]) if len(top) else None})
+    return assignments
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest several pairs from one shared account")
+    parser.add_argument("--strategy", default="breaker_pivot_ma_strategy", help="Strategy for every pair (without --assignments)")
+    parser.add_argument("--pairs", nargs="+", default=default_pairs, help="Pairs to trade (without --assignments)")
+    parser.add_argument("--params", help="JSON params for every pair (default: first grid combo)")
+    parser.add_argument("--assignments", help='JSON file: [{"pair": ..., "strategy": ..., "params": {...}}, ...]')
+    parser.add_argument("--best", action="store_true", help="Use each pair's best stored combo as its params")
+    parser.add_argument("--balance", type=float, help="Shared starting balance (default: 400 per assignment)")
+    parser.add_argument("--max-positions", type=int, help="Open positions allowed at once across all pairs")
+    parser.add_argument("--max-per-currency", type=int, help="Open positions allowed per currency (USD in EURUSD and USDJPY counts twice)")
+    parser.add_argument("--leverage", type=float, default=DEFAULT_LEVERAGE, help="Leverage for the margin of each position")
+    parser.add_argument("--output", default="output", help="Output folder")
+    args = parser.parse_args()
+
+    if args.assignments:
+        with open(args.assignments) as f:
+            assignments = json.load(f)
+    elif args.best:
+        assignments = best_assignments(args.strategy, args.pairs, args.output)
+    else:
+        params = json.loads(args.params) if args.params else None
+        assignments = [{"pair": pair, "strategy": args.strategy, "params": params} for pair in args.pairs]
+
+    result = run_portfolio(assignments, initial_balance=args.balance, max_positions=args.max_positions,
+                           leverage=args.leverage, max_per_currency=args.max_per_currency)
+    stats = result["stats"]
+    print(result["pairs"].to_string(index=False))
+    print(f"🚫 Rejected entries: {result['rejected']}")
+    print(f"💼 Portfolio: {stats['total_trades']} trades | Net: {stats['net_profit']:.2f} | "
+          f"Max DD: {stats['max_drawdown']:.2f} ({stats['max_drawdown_pct']:.1%}) | Sharpe: {stats['sharpe']:.2f} | "
+          f"Max open positions: {int(result['equity']['open_positions'].max())}")
+
+    os.makedirs(args.output, exist_ok=True)
+    equity_csv = os.path.join(args.output, "portfolio_equity.csv")
+    result["equity"].to_csv(equity_csv)
+    print(f"[DEBUG] Saving portfolio equity to: {equity_csv}")
+    pairs_csv = os.path.join(args.output, "portfolio_pairs.csv")
+    result["pairs"].to_csv(pairs_csv, index=False)
+    print(f"[DEBUG] Saving portfolio pairs to: {pairs_csv}")
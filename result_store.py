@@ -0,0 +1,111 @@
+# result_store.py
+# Persistent SQLite store of per-combo sweep results.
+#
+# Rows are keyed on (strategy source hash, symbol, data fingerprint, params hash)
+# and written as soon as each combo finishes, so an interrupted sweep resumes
+# where it stopped and extending a grid only evaluates the new points. The source
+# hash covers every project module the strategy imports, transitively. Each row
+# also records the timeframe of the data it was run on (M5 unless a sweep resampled).
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import ast
+import inspect
+import numpy as np
+from indicator_cache import fingerprint
+
+DEFAULT_STORE = "results.sqlite"
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Data preparation every sweep runs through, whether or not the strategy imports it
+DATA_MODULES = {"candle_store", "timeframe_align"}
+
+
+def project_imports(source):
+    # Project modules a source file imports anywhere in it (function-level imports included)
+    names = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+    return {name for name in names if os.path.exists(os.path.join(PROJECT_DIR, f"{name}.py"))}
+
+
+def strategy_hash(module):
+    # Source of the strategy and of every project module it depends on, directly or
+    # through other project modules (kernel, indicators, zone book, cache, ...)
+    source = inspect.getsource(module)
+    digest = hashlib.sha1(source.encode())
+    seen, pending = set(), project_imports(source) | DATA_MODULES
+    while pending:
+        name = min(pending)
+        pending.discard(name)
+        seen.add(name)
+        with open(os.path.join(PROJECT_DIR, f"{name}.py"), encoding="utf-8") as f:
+            dependency = f.read()
+        digest.update(name.encode())
+        digest.update(dependency.encode())
+        pending |= project_imports(dependency) - seen
+    return digest.hexdigest()
+
+
+def params_hash(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def data_hash(*frames):
+    return hashlib.sha1("".join(fingerprint(df) for df in frames).encode()).hexdigest()
+
+
+class ResultStore:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                strategy TEXT,
+                strategy_hash TEXT,
+                symbol TEXT,
+                data_hash TEXT,
+                params_hash TEXT,
+                params TEXT,
+                stats TEXT,
+                equity BLOB,
+                created REAL,
+                timeframe TEXT,
+                PRIMARY KEY (strategy_hash, symbol, data_hash, params_hash)
+            )
+        """)
+        # Stores created before results were tagged with their timeframe
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(results)")]
+        if "timeframe" not in columns:
+            self.conn.execute("ALTER TABLE results ADD COLUMN timeframe TEXT")
+        self.conn.commit()
+
+    def get(self, strategy_key, symbol, data_key, params):
+        row = self.conn.execute(
+            "SELECT stats, equity FROM results WHERE strategy_hash=? AND symbol=? AND data_hash=? AND params_hash=?",
+            (strategy_key, symbol, data_key, params_hash(params)),
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), np.frombuffer(row[1], dtype="float64")
+
+    def put(self, strategy, strategy_key, symbol, data_key, params, stats, equity, timeframe="M5"):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results (strategy, strategy_hash, symbol, data_hash, params_hash, params, stats, "
+            "equity, created, timeframe) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (strategy, strategy_key, symbol, data_key, params_hash(params),
+             json.dumps(params, sort_keys=True, default=str), json.dumps(stats, default=float),
+             np.asarray(equity, dtype="float64").tobytes(), time.time(), timeframe),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,178 @@
+# result_views.py
+# Read side of the sweep results for the dashboards.
+#
+# Results come from the sweep's result store (output/results.sqlite), which every
+# sweep and multi-pair run fills, rather than from per-run CSVs. Loads are
+# memoized on the files' mtime and size, so a dashboard rerun reuses the parsed
+# frame until a sweep writes new rows. Rows are kept per data version (timeframe
+# and data fingerprint), since a sweep slice, a full-history multi-pair run and a
+# resampled sweep of the same combo are different results; latest_data or a
+# data_hash filter picks one. Filtering, sorting and top-N run here on
+# the full frame, and equity curves are fetched one combo at a time and
+# downsampled before plotting:
+#
+#     results = load_results("output/results.sqlite", strategy="rci_strategy", symbol="USDJPY", timeframe="M5")
+#     results = latest_data(results)
+#     top = query(results, sort_by="sharpe", top_n=50, filters={"total_trades": (20, None)})
+#     x, y = downsample(equity_curve("output/results.sqlite", top["id"].iloc[0]))
+
+import os
+import json
+import sqlite3
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from result_store import DEFAULT_STORE
+
+# Stats columns, in the order the dashboards show them
+STAT_COLUMNS = ["net_profit", "total_trades", "win_rate", "max_drawdown", "max_drawdown_pct", "profit_factor",
+                "expectancy", "sharpe", "sortino", "avg_trade_bars", "max_trade_bars"]
+
+
+def store_path(output_path):
+    return os.path.join(output_path, DEFAULT_STORE)
+
+
+def file_version(path):
+    # (mtime, size) of the file and its SQLite write-ahead log; changes whenever rows are written
+    version = []
+    for name in (path, path + "-wal"):
+        if os.path.exists(name):
+            info = os.stat(name)
+            version.append((info.st_mtime_ns, info.st_size))
+    return tuple(version)
+
+
+def _connect(path):
+    # Read-only, so a dashboard never blocks or creates a store
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+@lru_cache(maxsize=8)
+def _load_results(path, version):
+    with _connect(path) as conn:
+        rows = conn.execute("SELECT rowid, strategy, strategy_hash, symbol, timeframe, data_hash, "
+                            "length(equity) / 8 - 1, params_hash, params, stats, created FROM results").fetchall()
+    frame = pd.DataFrame(rows, columns=["id", "strategy", "strategy_hash", "symbol", "timeframe", "data_hash", "bars",
+                                        "params_hash", "params", "stats", "created"])
+    # Rows stored before results recorded their timeframe
+    frame["timeframe"] = frame["timeframe"].fillna("unknown")
+    # Several code versions of a combo can be stored per data version; keep the newest one
+    frame = frame.sort_values("created").drop_duplicates(["strategy", "symbol", "timeframe", "data_hash", "params_hash"],
+                                                         keep="last")
+    stats = pd.DataFrame([json.loads(s) for s in frame["stats"]], index=frame.index)
+    params = pd.DataFrame([json.loads(p) for p in frame["params"]], index=frame.index)
+    params = params[[c for c in params.columns if c not in stats.columns and c not in frame.columns]]
+    columns = [c for c in STAT_COLUMNS if c in stats.columns] + [c for c in stats.columns if c not in STAT_COLUMNS]
+    frame = pd.concat([frame.drop(columns=["stats", "strategy_hash", "params_hash"]), stats[columns], params], axis=1)
+    return frame.sort_values(["strategy", "symbol", "id"]).reset_index(drop=True)
+
+
+def load_results(path, strategy=None, symbol=None, timeframe=None, data_hash=None):
+    # One row per stored combo and data version: id, strategy, symbol, timeframe, data_hash, bars (traded span),
+    # params, created, the stats and one column per parameter (the frame is shared between reruns; treat it as read-only)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["id", "strategy", "symbol", "timeframe", "data_hash", "bars", "params", "created"]
+                            + STAT_COLUMNS)
+    frame = _load_results(path, file_version(path))
+    for column, value in (("strategy", strategy), ("symbol", symbol), ("timeframe", timeframe), ("data_hash", data_hash)):
+        if value is not None:
+            frame = frame[frame[column] == value]
+    # Parameters of other strategies are all NaN here
+    return frame.dropna(axis=1, how="all") if strategy is not None else frame
+
+
+def available(path):
+    # {strategy: [symbols]} present in the store
+    frame = load_results(path)
+    return {s: sorted(group["symbol"].unique()) for s, group in frame.groupby("strategy")}
+
+
+def data_versions(frame):
+    # The data versions in a results frame, most recently written first: timeframe, data_hash, bars, combos
+    if frame.empty:
+        return pd.DataFrame(columns=["timeframe", "data_hash", "bars", "combos", "created"])
+    versions = frame.groupby(["timeframe", "data_hash"], as_index=False).agg(
+        bars=("bars", "max"), combos=("id", "size"), created=("created", "max"))
+    return versions.sort_values("created", ascending=False).reset_index(drop=True)
+
+
+def describe_version(version):
+    return f"{version['timeframe']} · {version['bars']} bars · data {version['data_hash'][:8]} ({version['combos']} combos)"
+
+
+def latest_data(frame):
+    # Rows of the most recently written data version of each strategy and symbol, so rankings
+    # never mix a short sweep slice with a full-history or other-timeframe run
+    if frame.empty:
+        return frame
+    newest = frame.sort_values("created").groupby(["strategy", "symbol"])["data_hash"].transform("last")
+    return frame[frame["data_hash"] == newest.loc[frame.index]]
+
+
+def query(frame, filters=None, sort_by="net_profit", ascending=False, top_n=None):
+    # filters: {column: (low, high)} for numeric ranges (either end may be None) or {column: [allowed values]}
+    mask = np.ones(len(frame), dtype=bool)
+    for column, condition in (filters or {}).items():
+        values = frame[column]
+        if isinstance(condition, tuple):
+            low, high = condition
+            if low is not None:
+                mask &= (values >= low).to_numpy()
+            if high is not None:
+                mask &= (values <= high).to_numpy()
+        else:
+            mask &= values.isin(condition).to_numpy()
+    frame = frame[mask]
+    if top_n is not None and sort_by in frame.columns and pd.api.types.is_numeric_dtype(frame[sort_by]):
+        # Partial selection instead of a full sort
+        return frame.nsmallest(top_n, sort_by) if ascending else frame.nlargest(top_n, sort_by)
+    frame = frame.sort_values(sort_by, ascending=ascending) if sort_by in frame.columns else frame
+    return frame.head(top_n) if top_n is not None else frame
+
+
+@lru_cache(maxsize=64)
+def _equity_curve(path, result_id, version):
+    with _connect(path) as conn:
+        row = conn.execute("SELECT equity FROM results WHERE rowid=?", (int(result_id),)).fetchone()
+    return np.frombuffer(row[0], dtype="float64") if row else np.zeros(0)
+
+
+def equity_curve(path, result_id):
+    return _equity_curve(path, int(result_id), file_version(path))
+
+
+def downsample(values, max_points=2000):
+    # Min/max of each bucket in time order, so peaks and drawdowns survive; returns (x, y)
+    values = np.asarray(values, dtype="float64")
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n), values
+    # First and last points plus a min and a max per bucket; the last bucket is padded
+    # with its final value, which keeps its extremes on a real bar
+    buckets = max(max_points // 2 - 1, 1)
+    size = -(-(n - 2) // buckets)
+    count = -(-(n - 2) // size)
+    body = np.pad(values[1:n - 1], (0, count * size - (n - 2)), mode="edge").reshape(count, size)
+    starts = 1 + size * np.arange(count)
+    low = np.minimum(starts + body.argmin(axis=1), n - 2)
+    high = np.minimum(starts + body.argmax(axis=1), n - 2)
+    index = np.concatenate([[0], low, high, [n - 1]])
+    index = np.unique(index)
+    return index, values[index]
+
+
+@lru_cache(maxsize=16)
+def _read_csv(path, version):
+    return pd.read_csv(path)
+
+
+def summary_files(output_path):
+    # CSV summaries written next to the store ({label}_summary.csv, summary_all_pairs.csv)
+    if not os.path.isdir(output_path):
+        return []
+    return sorted(f for f in os.listdir(output_path) if f.endswith("summary.csv") or f == "summary_all_pairs.csv")
+
+
+def load_csv(path):
+    return _read_csv(path, file_version(path))
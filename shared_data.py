@@ -0,0 +1,50 @@
+# shared_data.py
+# Places candle frames in POSIX shared memory so sweep workers can attach to
+# the same M5/M30 arrays instead of receiving pickled copies.
+
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+
+
+def share_frame(df):
+    rows = len(df)
+    columns = list(df.columns)
+    # One block per frame: int64 timestamps followed by a (columns x rows) float64 matrix
+    shm = shared_memory.SharedMemory(create=True, size=max(8, 8 * rows * (len(columns) + 1)))
+    timestamps = np.ndarray((rows,), dtype="int64", buffer=shm.buf)
+    values = np.ndarray((len(columns), rows), dtype="float64", buffer=shm.buf, offset=8 * rows)
+    timestamps[:] = df.index.to_numpy(dtype="datetime64[ns]").view("int64")
+    for i, col in enumerate(columns):
+        values[i] = df[col].to_numpy(dtype="float64")
+
+    spec = {
+        "name": shm.name,
+        "rows": rows,
+        "columns": columns,
+        "index_name": df.index.name,
+        "attrs": dict(df.attrs),
+    }
+    return spec, shm
+
+
+def attach_frame(spec):
+    # The caller must keep the returned SharedMemory handle alive while the frame is in use
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    rows, columns = spec["rows"], spec["columns"]
+    timestamps = np.ndarray((rows,), dtype="int64", buffer=shm.buf)
+    values = np.ndarray((len(columns), rows), dtype="float64", buffer=shm.buf, offset=8 * rows)
+    values.setflags(write=False)
+
+    index = pd.DatetimeIndex(timestamps.view("datetime64[ns]"), name=spec["index_name"])
+    df = pd.DataFrame({col: values[i] for i, col in enumerate(columns)}, index=index, copy=False)
+    df.attrs.update(spec["attrs"])
+    return df, shm
+
+
+def release(shm):
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,116 @@
+# stage_timer.py
+# Per-stage wall-time accounting for sweeps.
+#
+# Code marks its stages with `with stage("indicators"):`. Stages nest, and time
+# is exclusive: while a nested stage runs, its parent's clock is paused, so the
+# totals add up to the wall time spent inside stages. The stages used by the
+# engine are:
+#
+#   data_load   reading candles from the store
+#   signals     strategy code outside the stages below
+#   indicators  cached indicator lookups and computations
+#   bar_loop    exit search and position chaining (or a strategy's own bar loop)
+#   stats       trade stats and result building
+#   chart_io    result store, summary/equity files and chart rendering
+#   robustness  Monte Carlo simulations of the top combos
+#   workers     waiting on a parallel sweep's worker processes
+#
+# Worker processes time their own stages; a parallel sweep reports those totals
+# (CPU time summed over workers) apart from the wall-clock stages above.
+
+import time
+import cProfile
+import pstats
+import io
+from collections import defaultdict
+from contextlib import contextmanager
+
+STAGES = ["data_load", "signals", "indicators", "bar_loop", "stats", "chart_io", "robustness", "workers"]
+
+
+class StageTimer:
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.stack = []
+
+    @contextmanager
+    def stage(self, name):
+        now = time.perf_counter()
+        if self.stack:
+            self.totals[self.stack[-1][0]] += now - self.stack[-1][1]
+        self.stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, started = self.stack.pop()
+            self.totals[name] += now - started
+            self.counts[name] += 1
+            if self.stack:
+                self.stack[-1][1] = now
+
+    def snapshot(self):
+        return dict(self.totals)
+
+    def reset(self):
+        self.totals.clear()
+        self.counts.clear()
+        self.stack.clear()
+
+
+default_timer = StageTimer()
+
+
+def stage(name):
+    return default_timer.stage(name)
+
+
+def elapsed_since(before, after=None):
+    after = default_timer.snapshot() if after is None else after
+    return {name: after.get(name, 0.0) - before.get(name, 0.0) for name in after if after.get(name, 0.0) > before.get(name, 0.0)}
+
+
+def merge_timings(timings_list):
+    merged = defaultdict(float)
+    for timings in timings_list:
+        for name, seconds in timings.items():
+            merged[name] += seconds
+    return dict(merged)
+
+
+def _stage_table(totals, n_combos, heading):
+    names = [s for s in STAGES if s in totals] + sorted(s for s in totals if s not in STAGES)
+    overall = sum(totals.values()) or 1.0
+    lines = [f"{heading:<12} {'Total s':>9} {'Share':>7} {'Per combo ms':>13}"]
+    for name in names:
+        lines.append(f"{name:<12} {totals[name]:9.3f} {100 * totals[name] / overall:6.1f}% "
+                     f"{1000 * totals[name] / n_combos:13.2f}")
+    return lines
+
+
+def format_report(totals, combo_timings, slowest=5, worker_totals=None):
+    # totals: {stage: seconds}; combo_timings: {combo number: {stage: seconds}};
+    # worker_totals: worker CPU seconds by stage, shown as their own table
+    n_combos = max(len(combo_timings), 1)
+    lines = _stage_table(totals, n_combos, "Stage")
+    if worker_totals:
+        lines.append("Worker CPU time (summed over workers):")
+        lines += _stage_table(worker_totals, n_combos, "Worker stage")
+    ranked = sorted(combo_timings, key=lambda c: -sum(combo_timings[c].values()))[:slowest]
+    if ranked:
+        lines.append("Slowest combos:")
+        for combo in ranked:
+            parts = ", ".join(f"{k} {1000 * v:.1f}" for k, v in sorted(combo_timings[combo].items(), key=lambda kv: -kv[1]))
+            lines.append(f"  #{combo}: {1000 * sum(combo_timings[combo].values()):.1f} ms ({parts})")
+    return "\n".join(lines)
+
+
+def profile_call(fn, path, top=15):
+    # Runs fn under cProfile, saves the raw stats to `path` and returns the top functions by cumulative time
+    profiler = cProfile.Profile()
+    profiler.runcall(fn)
+    profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
@@ -1,15 +1,51 @@
-from . import breaker_pivot_ma_strategy
+import importlib
+import pkgutil
 
-STRATEGY_REGISTRY = {
-    "breaker_pivot_ma_strategy": breaker_pivot_ma_strategy,
-}
+# Strategy modules are discovered automatically. A strategy module defines:
+#   strategy_name     registry key
+#   parameter_grid    {param: [values]} swept by the tuner
+#   run_strategy(data_m5, data_m30, params) -> {"trades", "equity_curve", "stats"}
+# data_m30 covers the same span as data_m5; timeframe_align.htf_indicator puts
+# M30 indicator values on the M5 grid without look-ahead.
+# and optionally vectorized_params + run_batch(data_m5, data_m30, params_list)
+# to evaluate several combos in one pass, and parameter_space {param: (low, high[, "int"])}
+# ranges the optimizer samples instead of the grid values.
+# Kernel-based strategies resolve TP/SL on high/low; their params also accept
+# "fill": "close", "spread" and "ambiguous" (backtest_kernel.exit_options).
+# live_strategy(params) optionally returns a bar-by-bar twin of run_strategy for
+# paper trading: an object with start, initial_balance and on_bar(bar) -> [(trade, bars held)]
+# built on streaming_indicators (see paper_trading.py).
+REQUIRED_ATTRS = ("strategy_name", "parameter_grid", "run_strategy")
+
+STRATEGY_REGISTRY = {}
+
+def register(module):
+    STRATEGY_REGISTRY[module.strategy_name] = module
+    return module
+
+def discover():
+    for info in pkgutil.iter_modules(__path__):
+        try:
+            module = importlib.import_module(f"{__name__}.{info.name}")
+        except Exception as e:
+            print(f"⚠️ Skipping strategy module {info.name}: {e}")
+            continue
+        if all(hasattr(module, attr) for attr in REQUIRED_ATTRS):
+            register(module)
+    return STRATEGY_REGISTRY
+
+discover()
 
 def get_strategy_config(name):
     if name not in STRATEGY_REGISTRY:
         raise ValueError(f"Unknown strategy config: {name}")
     return {
         "name": STRATEGY_REGISTRY[name].strategy_name,
+        "module": STRATEGY_REGISTRY[name],
         "params": STRATEGY_REGISTRY[name].parameter_grid,
         "runner": STRATEGY_REGISTRY[name].run_strategy,
+        "batch_runner": getattr(STRATEGY_REGISTRY[name], "run_batch", None),
+        "vectorized_params": getattr(STRATEGY_REGISTRY[name], "vectorized_params", []),
+        "space": getattr(STRATEGY_REGISTRY[name], "parameter_space", {}),
+        "live": getattr(STRATEGY_REGISTRY[name], "live_strategy", None),
     }
-
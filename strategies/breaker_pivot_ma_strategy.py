@@ -1,3 +1,11 @@
+import numpy as np
+import pandas as pd
+from indicators import moving_average, rolling_stat, last_pivot_levels
+from indicator_cache import cached
+from backtest_kernel import run_signals_batch, trading_window, PaperBroker, fill_options, exit_options
+from streaming_indicators import moving_average as streaming_ma, RollingExtreme, SMA, Pivots, NAN
+from collections import deque
+
 strategy_name = "breaker_pivot_ma_strategy"
 
 parameter_grid = {
@@ -12,42 +20,121 @@ parameter_grid = {
     "retest_enabled": [True]
 }
 
+# Ranges searched by the optimizer (see optimizer.py)
+parameter_space = {
+    "ma_length": (10, 200, "int"),
+    "osc_threshold": (0.1, 0.6),
+    "volatility_threshold": (1.0, 4.0),
+}
+
+# Params that run_batch takes as a whole axis; combos that differ only in
+# these share one batched pass over the data
+vectorized_params = ["ma_type", "ma_length", "osc_threshold", "volatility_threshold", "entry_mode"]
+
+take_profit = 0.002
+stop_loss = 0.001
+
 def run_strategy(data_m5, data_m30, params):
-    # Example logic (simplified; replace with full logic if needed)
-    trades = []
-    equity_curve = []
-    balance = 400  # Start with $400
-    equity_curve.append(balance)
-
-    for i in range(50, len(data_m5)):
-        close = data_m5['Close'].iloc[i]
-        open_price = close - 0.001
-        tp = close + 0.002
-        sl = close - 0.001
-
-        # Example: trigger on every 100th bar
-        if i % 100 == 0:
-            trades.append({
-                "entry_time": data_m5.index[i],
-                "entry_price": open_price,
-                "exit_time": data_m5.index[i+5] if i+5 < len(data_m5) else data_m5.index[-1],
-                "exit_price": tp,
-                "pnl": tp - open_price,
-                "direction": "long"
-            })
-            balance += tp - open_price
-        equity_curve.append(balance)
-
-    stats = {
-        "total_trades": len(trades),
-        "net_profit": balance - 400,
-        "win_rate": 100 if trades else 0,
-        "max_drawdown": 0
-    }
-
-    return {
-        "trades": trades,
-        "equity_curve": equity_curve,
-        "stats": stats
-    }
+    return run_batch(data_m5, data_m30, [params])[0]
+
+def run_batch(data_m5, data_m30, params_list):
+    # All combos must share the non-vectorized params
+    params = params_list[0]
+    close = data_m5["Close"].to_numpy()
+    high = data_m5["High"].to_numpy()
+    low = data_m5["Low"].to_numpy()
+    prev_close = np.r_[np.nan, close[:-1]]
+
+    left, right = params["pivot_left"], params["pivot_right"]
+    osc_len = params["osc_length"]
+
+    # Trend filter, one row per combo
+    trend = np.vstack([moving_average(data_m5, "Close", p["ma_length"], p["ma_type"]) for p in params_list])
+
+    # Last confirmed pivot high/low act as the breaker levels
+    resistance, support = last_pivot_levels(data_m5, left, right, high="High", low="Low")
+
+    # Momentum oscillator in [-1, 1]: osc_length change relative to the osc_length range
+    span = rolling_stat(data_m5, "High", osc_len, "max") - rolling_stat(data_m5, "Low", osc_len, "min")
+    change = close - np.r_[np.full(osc_len, np.nan), close[:-osc_len]]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        osc = np.where(span > 0, change / span, 0.0)
+
+    # Skip bars whose range is an outlier vs. the recent average range
+    avg_range = cached(data_m5, "avg_range", {"length": osc_len},
+                       lambda: pd.Series(high - low).rolling(osc_len).mean().to_numpy())
+    vol_limit = np.array([[p["volatility_threshold"]] for p in params_list]) * avg_range
+    calm = (high - low) <= vol_limit
+
+    if params["retest_enabled"]:
+        # Broken level retested: bar dips back to the level and closes beyond it
+        long_break = (prev_close > resistance) & (low <= resistance) & (close > resistance)
+        short_break = (prev_close < support) & (high >= support) & (close < support)
+    else:
+        long_break = (prev_close <= resistance) & (close > resistance)
+        short_break = (prev_close >= support) & (close < support)
+
+    osc_threshold = np.array([[p["osc_threshold"]] for p in params_list])
+    modes = np.array([p["entry_mode"] for p in params_list])[:, None]
+    long_entries = long_break & (close > trend) & (osc > osc_threshold) & calm & (modes != "short")
+    short_entries = short_break & (close < trend) & (osc < -osc_threshold) & calm & (modes != "long")
+
+    first, end = trading_window(data_m5)
+    starts = [max(first, 50, p["ma_length"], osc_len, left + right + 1) for p in params_list]
+    results = run_signals_batch(close, long_entries, short_entries, tp=take_profit, sl=stop_loss,
+                                start=starts, index=data_m5.index, end=end, **fill_options(data_m5, params))
+
+    return [
+        {
+            "trades": result["trades"],
+            "equity_curve": result["equity_curve"].tolist(),
+            "stats": result["stats"]
+        }
+        for result in results
+    ]
+
+class LiveStrategy:
+    # Bar-by-bar run_strategy for paper trading; same signals, one bar at a time
+    def __init__(self, params):
+        self.params = params
+        osc_len = params["osc_length"]
+        self.trend = streaming_ma(params["ma_length"], params["ma_type"])
+        self.pivots = Pivots(params["pivot_left"], params["pivot_right"])
+        self.osc_high = RollingExtreme(osc_len, "max")
+        self.osc_low = RollingExtreme(osc_len, "min")
+        self.avg_range = SMA(osc_len)
+        self.closes = deque(maxlen=osc_len + 1)
+        self.start = max(50, params["ma_length"], osc_len, params["pivot_left"] + params["pivot_right"] + 1)
+        self.initial_balance = 400
+        self.broker = PaperBroker(take_profit, stop_loss, start=self.start, **exit_options(params))
+        self.bar = -1
+
+    def on_bar(self, bar):
+        self.bar += 1
+        p = self.params
+        close, high, low = bar.close, bar.high, bar.low
+        prev_close = self.closes[-1] if self.closes else NAN
+        self.closes.append(close)
+
+        trend = self.trend.update(close)
+        self.pivots.update(high, low)
+        resistance, support = self.pivots.resistance, self.pivots.support
+
+        span = self.osc_high.update(high) - self.osc_low.update(low)
+        change = close - self.closes[0] if len(self.closes) > p["osc_length"] else NAN
+        osc = change / span if span > 0 else 0.0
+        calm = (high - low) <= p["volatility_threshold"] * self.avg_range.update(high - low)
+
+        if p["retest_enabled"]:
+            long_break = prev_close > resistance and low <= resistance and close > resistance
+            short_break = prev_close < support and high >= support and close < support
+        else:
+            long_break = prev_close <= resistance and close > resistance
+            short_break = prev_close >= support and close < support
+
+        long_entry = long_break and close > trend and osc > p["osc_threshold"] and calm and p["entry_mode"] != "short"
+        short_entry = short_break and close < trend and osc < -p["osc_threshold"] and calm and p["entry_mode"] != "long"
+        return self.broker.on_bar(self.bar, bar.time, close, long_entry, short_entry, bar.open, high, low)
 
+def live_strategy(params):
+    return LiveStrategy(params)
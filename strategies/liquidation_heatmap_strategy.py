@@ -8,37 +8,21 @@ parameter_grid = {
     "volume_window": [200],
 }
 
-def run_strategy(symbol, params):
-    import pandas as pd
-    import numpy as np
-    import os
-
-    filepath = f"data/{symbol}_Candlestick_5_M_BID_26.04.2023-26.04.2025.csv"
-    if not os.path.exists(filepath):
-        raise FileNotFoundError(f"Data file not found: {filepath}")
-
-    df = pd.read_csv(filepath).head(5000)
-
-    # Detect and rename timestamp
-    time_col = next((c for c in df.columns if "time" in c.lower()), None)
-    if not time_col:
-        raise KeyError("No timestamp column found in data.")
-
-    df[time_col] = df[time_col].astype(str).str.replace(r" GMT[-+]\d+", "", regex=True)
-    df["timestamp"] = pd.to_datetime(df[time_col], format="%d.%m.%Y %H:%M:%S.%f", errors="coerce")
-    df.dropna(subset=["timestamp"], inplace=True)
-    df.set_index("timestamp", inplace=True)
+# Ranges searched by the optimizer (see optimizer.py)
+parameter_space = {
+    "atr_multiplier": (0.1, 1.0),
+    "volume_window": (50, 400, "int"),
+}
 
-    # Rename OHLCV columns
-    rename_map = {}
-    for target in ["open", "high", "low", "close", "volume"]:
-        match = next((col for col in df.columns if target in col.lower()), None)
-        if match:
-            rename_map[match] = target
-        else:
-            raise KeyError(f"Missing required column in CSV: {target}")
+def run_strategy(data_m5, data_m30, params):
+    import numpy as np
+    from indicators import rolling_stat, pivot_flags
+    from zone_engine import ZoneBook
+    from backtest_kernel import trading_window, trade_stats
+    from metrics import bars_per_year
+    from stage_timer import stage
 
-    df.rename(columns=rename_map, inplace=True)
+    df = data_m5
 
     # Extract parameters
     left = params["pivot_left"]
@@ -47,50 +31,40 @@ def run_strategy(symbol, params):
     atr_mult = params["atr_multiplier"]
     vol_window = params["volume_window"]
 
-    # Indicators
-    df["atr"] = df["high"].rolling(atr_len).max() - df["low"].rolling(atr_len).min()
-    df["atr"] *= atr_mult
-    df["vol_avg"] = df["volume"].rolling(vol_window).mean()
-    df["vol_max"] = df["volume"].rolling(vol_window).max()
+    # Indicators (shared across combos through the indicator cache)
+    rolling_high = rolling_stat(df, "High", atr_len, "max")
+    rolling_low = rolling_stat(df, "Low", atr_len, "min")
+    vol_max = rolling_stat(df, "Volume", vol_window, "max")
+    pivot_high, pivot_low = pivot_flags(df, left, right, high="High", low="Low")
 
-    # Pivot detection
-    df["pivot_high"] = df["high"].shift(left) > df["high"].rolling(window=left+right+1, center=True).max()
-    df["pivot_low"] = df["low"].shift(left) < df["low"].rolling(window=left+right+1, center=True).min()
+    atr_values = (rolling_high - rolling_low) * atr_mult
+    high = df["High"].to_numpy()
+    low = df["Low"].to_numpy()
+    close = df["Close"].to_numpy()
+    volume = df["Volume"].to_numpy()
 
-    zones = []
+    book = ZoneBook()
     balance = 400
     lot_size = 0.01
     trades = []
+    exit_bars = []
 
-    for i in range(max(atr_len, vol_window) + right + 1, len(df)):
-        row = df.iloc[i]
-        price = row["close"]
-        atr = row["atr"]
-        vol = row["volume"]
-        vol_max = row["vol_max"]
-
-        # Create zone
-        if df["pivot_high"].iloc[i - right]:
-            zones.append({
-                "top": row["high"] + atr,
-                "bot": row["high"],
-                "type": "short",
-                "active": True,
-                "strength": min(1, vol / vol_max if vol_max else 0),
-            })
-
-        if df["pivot_low"].iloc[i - right]:
-            zones.append({
-                "top": row["low"],
-                "bot": row["low"] - atr,
-                "type": "long",
-                "active": True,
-                "strength": min(1, vol / vol_max if vol_max else 0),
-            })
-
-        # Check zone interactions
-        for zone in zones:
-            if zone["active"] and zone["bot"] < price < zone["top"]:
+    with stage("bar_loop"):
+        first, end = trading_window(df)
+        for i in range(max(first, max(atr_len, vol_window) + right + 1), end):
+            price = close[i]
+            atr = atr_values[i]
+            strength = min(1, volume[i] / vol_max[i] if vol_max[i] else 0)
+
+            # Create zone
+            if pivot_high[i - right]:
+                book.add(high[i], high[i] + atr, "short", strength)
+
+            if pivot_low[i - right]:
+                book.add(low[i] - atr, low[i], "long", strength)
+
+            # Check zone interactions (only zones whose range contains the price)
+            for zone in book.trigger(price):
                 if zone["type"] == "long":
                     entry, exit = zone["bot"], zone["top"]
                     profit = (exit - entry) * 100000 * lot_size
@@ -98,21 +72,86 @@ def run_strategy(symbol, params):
                     entry, exit = zone["top"], zone["bot"]
                     profit = (entry - exit) * 100000 * lot_size
 
-                trades.append(profit)
+                trades.append({
+                    "type": zone["type"],
+                    "entry_price": entry,
+                    "entry_time": df.index[i],
+                    "exit_time": df.index[i],
+                    "exit_price": exit,
+                    "profit": profit,
+                })
+                exit_bars.append(i)
                 balance += profit
-                zone["active"] = False
 
     # Metrics
-    total_trades = len(trades)
-    net_profit = sum(trades)
-    win_rate = len([p for p in trades if p > 0]) / total_trades if total_trades else 0
-    max_drawdown = min(trades) if trades else 0
+    with stage("stats"):
+        profits = [t["profit"] for t in trades]
+
+        # Realized balance per bar, like the backtest kernel's equity curve
+        realized = np.bincount(np.asarray(exit_bars, dtype="int64"), weights=profits, minlength=len(df))
+        equity_curve = 400 + np.cumsum(np.concatenate(([0.0], realized)))
+
+        # Zone trades open and close on the same bar
+        stats = trade_stats(profits, equity_curve, np.zeros(len(profits)), bars_per_year(df.index))
 
     return {
-        "total_trades": total_trades,
-        "net_profit": net_profit,
-        "win_rate": win_rate,
-        "max_drawdown": max_drawdown,
-        "symbol": symbol
+        "trades": trades,
+        "equity_curve": equity_curve.tolist(),
+        "stats": stats,
     }
 
+
+class LiveStrategy:
+    # Bar-by-bar run_strategy for paper trading; zones are opened and triggered
+    # as each bar arrives. Its equity curve starts at bar 0, like run_strategy's.
+    def __init__(self, params):
+        from streaming_indicators import RollingExtreme, Pivots
+        from zone_engine import ZoneBook
+
+        self.atr_mult = params["atr_multiplier"]
+        self.rolling_high = RollingExtreme(params["atr_length"], "max")
+        self.rolling_low = RollingExtreme(params["atr_length"], "min")
+        self.vol_max = RollingExtreme(params["volume_window"], "max")
+        self.pivots = Pivots(params["pivot_left"], params["pivot_right"])
+        self.warmup = max(params["atr_length"], params["volume_window"]) + params["pivot_right"] + 1
+        self.book = ZoneBook()
+        self.lot_size = 0.01
+        self.initial_balance = 400
+        self.start = 0
+        self.bar = -1
+
+    def on_bar(self, bar):
+        self.bar += 1
+        atr = (self.rolling_high.update(bar.high) - self.rolling_low.update(bar.low)) * self.atr_mult
+        vol_max = self.vol_max.update(bar.volume)
+        pivot_high, pivot_low = self.pivots.update(bar.high, bar.low)
+        if self.bar < self.warmup:
+            return []
+
+        strength = min(1, bar.volume / vol_max if vol_max else 0)
+        if pivot_high:
+            self.book.add(bar.high, bar.high + atr, "short", strength)
+        if pivot_low:
+            self.book.add(bar.low - atr, bar.low, "long", strength)
+
+        closed = []
+        for zone in self.book.trigger(bar.close):
+            if zone["type"] == "long":
+                entry, exit = zone["bot"], zone["top"]
+                profit = (exit - entry) * 100000 * self.lot_size
+            else:
+                entry, exit = zone["top"], zone["bot"]
+                profit = (entry - exit) * 100000 * self.lot_size
+            closed.append(({
+                "type": zone["type"],
+                "entry_price": entry,
+                "entry_time": bar.time,
+                "exit_time": bar.time,
+                "exit_price": exit,
+                "profit": profit,
+            }, 0))
+        return closed
+
+
+def live_strategy(params):
+    return LiveStrategy(params)
@@ -3,95 +3,92 @@
 
 import pandas as pd
 import numpy as np
-import os
-
-def rci(series, length):
-    n = length
-    rank_price = series.rank(method='first')
-    rank_time = pd.Series(np.arange(1, n + 1), index=series.index[-n:])
-    d = ((rank_price[-n:].values - rank_time.values) ** 2).sum()
-    return 100 * (1 - (6 * d) / (n * (n ** 2 - 1)))
-
-def ma(series, length, ma_type="SMA"):
-    if ma_type == "SMA":
-        return series.rolling(window=length).mean()
-    elif ma_type == "EMA":
-        return series.ewm(span=length, adjust=False).mean()
-    return series
-
-def run_strategy(symbol, params):
-    filepath = f"data/{symbol}_Candlestick_5_M_BID_26.04.2023-26.04.2025.csv"
-    if not os.path.exists(filepath):
-        raise FileNotFoundError(f"Data file not found: {filepath}")
-    
-    m5_df = pd.read_csv(filepath).head(5000)
-    m5_df.columns = [col.lower().strip() for col in m5_df.columns]
-
-    if 'close' not in m5_df.columns:
-        candidates = [c for c in m5_df.columns if 'close' in c]
-        if not candidates:
-            raise KeyError("No 'close' column found in data.")
-        m5_df['close'] = m5_df[candidates[0]]
-
-    if 'timestamp' in m5_df.columns:
-        m5_df['timestamp'] = m5_df['timestamp'].str.replace(r" GMT[-+]\d+", "", regex=True)
-        m5_df.index = pd.to_datetime(m5_df['timestamp'], format='%d.%m.%Y %H:%M:%S.%f', errors='coerce')
-        m5_df = m5_df.dropna(subset=['timestamp'])
-
-    rci_len = params.get("rci_length", 10)
-    ma_len = params.get("ma_length", 14)
-    ma_type_value = params.get("ma_type", "SMA")
-    initial_balance = 400
-    lot_size = 0.01
-
-    rci_series = [rci(m5_df['close'].iloc[i - rci_len:i], rci_len) for i in range(rci_len, len(m5_df))]
-    m5_df = m5_df.iloc[rci_len:].copy()
-    m5_df["RCI"] = rci_series
-    m5_df["RCI_MA"] = ma(m5_df["RCI"], ma_len, ma_type_value)
-
-    trades = []
-    position = None
-    equity = initial_balance
-
-    for i in range(ma_len, len(m5_df)):
-        price = m5_df['close'].iloc[i]
-        time = m5_df.index[i]
-        rci_now, rci_ma_now = m5_df['RCI'].iloc[i], m5_df['RCI_MA'].iloc[i]
-        rci_prev, rci_ma_prev = m5_df['RCI'].iloc[i - 1], m5_df['RCI_MA'].iloc[i - 1]
-
-        long_entry = rci_prev < rci_ma_prev and rci_now > rci_ma_now
-        short_entry = rci_prev > rci_ma_prev and rci_now < rci_ma_now
-
-        if position is None:
-            if long_entry:
-                position = {"type": "long", "entry_price": price, "entry_time": time}
-            elif short_entry:
-                position = {"type": "short", "entry_price": price, "entry_time": time}
-        elif position:
-            if position['type'] == "long" and (price >= position['entry_price'] + 0.004 or price <= position['entry_price'] - 0.002):
-                profit = (price - position['entry_price']) * 100000 * lot_size
-                trades.append({**position, "exit_time": time, "exit_price": price, "profit": profit})
-                equity += profit
-                position = None
-            elif position['type'] == "short" and (price <= position['entry_price'] - 0.004 or price >= position['entry_price'] + 0.002):
-                profit = (position['entry_price'] - price) * 100000 * lot_size
-                trades.append({**position, "exit_time": time, "exit_price": price, "profit": profit})
-                equity += profit
-                position = None
-
-    total_trades = len(trades)
-    net_profit = sum(t['profit'] for t in trades)
-    wins = [t for t in trades if t['profit'] > 0]
-    win_rate = len(wins) / total_trades if total_trades else 0
-    drawdowns = [t['profit'] for t in trades if t['profit'] < 0]
-    max_drawdown = min(drawdowns) if drawdowns else 0
-
-    return {
-        "total_trades": total_trades,
-        "net_profit": net_profit,
-        "win_rate": win_rate,
-        "max_drawdown": max_drawdown,
-        "symbol": symbol,
-        "trade_log": trades
-    }
+from indicators import ma, rci_values, crossover, crossunder
+from indicator_cache import cached
+from backtest_kernel import run_signals_batch, trading_window, PaperBroker, fill_options, exit_options
+from streaming_indicators import RCI, moving_average, NAN
 
+strategy_name = "rci_strategy"
+
+parameter_grid = {
+    "rci_length": [10, 14],
+    "ma_length": [9, 14],
+    "ma_type": ["SMA", "EMA"],
+}
+
+# Ranges searched by the optimizer (see optimizer.py)
+parameter_space = {
+    "rci_length": (5, 30, "int"),
+    "ma_length": (5, 30, "int"),
+}
+
+# Combos that differ only in these share one batched pass
+vectorized_params = ["ma_length", "ma_type"]
+
+take_profit = 0.004
+stop_loss = 0.002
+initial_balance = 400
+lot_size = 0.01
+
+def run_strategy(data_m5, data_m30, params):
+    return run_batch(data_m5, data_m30, [params])[0]
+
+def run_batch(data_m5, data_m30, params_list):
+    # All combos must share rci_length
+    rci_len = params_list[0].get("rci_length", 10)
+    close = data_m5['Close'].to_numpy()
+
+    # RCI at each bar covers the rci_len closes before it
+    rci_series = np.full(len(close), np.nan)
+    rci_series[rci_len:] = rci_values(data_m5, 'Close', rci_len)[rci_len - 1:-1]
+
+    rci_ma = np.full((len(params_list), len(close)), np.nan)
+    for row, params in enumerate(params_list):
+        ma_len = params.get("ma_length", 14)
+        ma_type_value = params.get("ma_type", "SMA")
+        rci_ma[row, rci_len:] = cached(data_m5, "rci_ma", {"rci_length": rci_len, "ma_length": ma_len, "ma_type": ma_type_value},
+                                       lambda: ma(pd.Series(rci_series[rci_len:]), ma_len, ma_type_value).to_numpy())
+
+    long_entries = crossover(rci_series, rci_ma)
+    short_entries = crossunder(rci_series, rci_ma)
+
+    first, end = trading_window(data_m5)
+    starts = [max(first, rci_len + params.get("ma_length", 14)) for params in params_list]
+    results = run_signals_batch(close, long_entries, short_entries, tp=take_profit, sl=stop_loss,
+                                lot_size=lot_size, initial_balance=initial_balance, start=starts,
+                                index=data_m5.index, end=end, **fill_options(data_m5, params_list[0]))
+
+    return [
+        {
+            "trades": result["trades"],
+            "equity_curve": result["equity_curve"].tolist(),
+            "stats": result["stats"]
+        }
+        for result in results
+    ]
+
+class LiveStrategy:
+    # Bar-by-bar run_strategy for paper trading; same signals, one bar at a time
+    def __init__(self, params):
+        self.rci_len = params.get("rci_length", 10)
+        self.rci = RCI(self.rci_len)
+        self.rci_ma = moving_average(params.get("ma_length", 14), params.get("ma_type", "SMA"))
+        self.start = self.rci_len + params.get("ma_length", 14)
+        self.initial_balance = initial_balance
+        self.broker = PaperBroker(take_profit, stop_loss, lot_size, start=self.start, **exit_options(params))
+        self.bar = -1
+        self.previous = (NAN, NAN)
+
+    def on_bar(self, bar):
+        self.bar += 1
+        # RCI of the rci_len closes before this bar, and its moving average
+        rci_value = self.rci.value
+        rci_ma = self.rci_ma.update(rci_value) if self.bar >= self.rci_len else NAN
+        long_entry = self.previous[0] < self.previous[1] and rci_value > rci_ma
+        short_entry = self.previous[0] > self.previous[1] and rci_value < rci_ma
+        self.previous = (rci_value, rci_ma)
+        self.rci.update(bar.close)
+        return self.broker.on_bar(self.bar, bar.time, bar.close, long_entry, short_entry, bar.open, bar.high, bar.low)
+
+def live_strategy(params):
+    return LiveStrategy(params)
@@ -0,0 +1,142 @@
+# streaming_indicators.py
+# Incremental counterparts of the indicators in indicators.py.
+#
+# Each indicator takes one value per bar through update() and returns its
+# current value, in constant time per bar (RCI: time proportional to its window,
+# independent of history). Fed the same series, they reproduce the batch
+# versions bar for bar, NaN warm-up included, so a strategy can run on a live
+# feed and still match its backtest.
+
+import math
+from collections import deque
+
+NAN = float("nan")
+
+
+class SMA:
+    # Running sum with Kahan compensation, like pandas' rolling mean
+    def __init__(self, length):
+        self.length = length
+        self.window = deque()
+        self.total = 0.0
+        self.add_error = 0.0
+        self.remove_error = 0.0
+        self.same_run = 0
+        self.last = NAN
+        self.value = NAN
+
+    def _add(self, x, sign):
+        # Compensated sum += sign * x (separate compensation terms for adds and removes)
+        if sign > 0:
+            y = x - self.add_error
+            t = self.total + y
+            self.add_error = t - self.total - y
+        else:
+            y = -x - self.remove_error
+            t = self.total + y
+            self.remove_error = t - self.total - y
+        self.total = t
+
+    def update(self, x):
+        if len(self.window) == self.length:
+            self._add(self.window.popleft(), -1)
+        self.window.append(x)
+        self._add(x, 1)
+        # A run of equal values averages to exactly that value
+        self.same_run = self.same_run + 1 if x == self.last else 1
+        self.last = x
+        if len(self.window) < self.length:
+            self.value = NAN
+        elif self.same_run >= self.length:
+            self.value = x
+        else:
+            self.value = self.total / self.length
+        return self.value
+
+
+class EMA:
+    # ewm(span=length, adjust=False): seeded with the first value
+    def __init__(self, length):
+        self.alpha = 2.0 / (length + 1)
+        self.keep = 1.0 - self.alpha
+        self.value = NAN
+
+    def update(self, x):
+        if self.value != self.value:
+            self.value = x
+        else:
+            self.value = (self.keep * self.value + self.alpha * x) / (self.keep + self.alpha)
+        return self.value
+
+
+def moving_average(length, ma_type="SMA"):
+    return EMA(length) if ma_type == "EMA" else SMA(length)
+
+
+class RollingExtreme:
+    # Rolling max ("max") or min ("min") over `window` bars with a monotonic deque
+    def __init__(self, window, how="max"):
+        self.window = window
+        self.better = (lambda a, b: a >= b) if how == "max" else (lambda a, b: a <= b)
+        self.candidates = deque()   # (bar, value), values strictly worse towards the right
+        self.bar = -1
+        self.value = NAN
+
+    def update(self, x):
+        self.bar += 1
+        while self.candidates and self.better(x, self.candidates[-1][1]):
+            self.candidates.pop()
+        self.candidates.append((self.bar, x))
+        if self.candidates[0][0] <= self.bar - self.window:
+            self.candidates.popleft()
+        self.value = self.candidates[0][1] if self.bar >= self.window - 1 else NAN
+        return self.value
+
+
+class RCI:
+    # Rank correlation of the last `length` values vs. time (ties in order of appearance)
+    def __init__(self, length):
+        self.length = length
+        self.window = deque(maxlen=length)
+        self.denominator = length * (length ** 2 - 1)
+        self.value = NAN
+
+    def update(self, x):
+        self.window.append(x)
+        n = self.length
+        if n < 2 or len(self.window) < n or any(math.isnan(v) for v in self.window):
+            self.value = NAN
+            return self.value
+        order = sorted(range(n), key=self.window.__getitem__)
+        d = sum((time - rank) ** 2 for rank, time in enumerate(order))
+        self.value = 100 * (1 - (6 * d) / self.denominator)
+        return self.value
+
+
+class Pivots:
+    # Pivot highs/lows of a left/right window, confirmed `right` bars after the pivot bar.
+    # After update(), high_pivot/low_pivot say whether bar i - right was a pivot
+    # (pivot_flags read at i - right) and resistance/support hold the last confirmed
+    # levels (last_pivot_levels at i).
+    def __init__(self, left, right):
+        self.right = right
+        self.highest = RollingExtreme(left + right + 1, "max")
+        self.lowest = RollingExtreme(left + right + 1, "min")
+        self.recent = deque(maxlen=right + 1)
+        self.high_pivot = self.low_pivot = False
+        self.resistance = self.support = NAN
+
+    def update(self, high, low):
+        self.recent.append((high, low))
+        highest = self.highest.update(high)
+        lowest = self.lowest.update(low)
+        self.high_pivot = self.low_pivot = False
+        if len(self.recent) > self.right:
+            pivot_high, pivot_low = self.recent[0]
+            self.high_pivot = pivot_high == highest
+            self.low_pivot = pivot_low == lowest
+            if self.high_pivot:
+                self.resistance = pivot_high
+            if self.low_pivot:
+                self.support = pivot_low
+        return self.high_pivot, self.low_pivot
@@ -1,14 +1,26 @@
 import os
-import subprocess
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
+from job_queue import JobManager
+import result_views
 
 STRATEGY_DIR = os.path.expanduser("~/manual_autogpt/forex_tuner/strategies")
 OUTPUT_DIR = os.path.expanduser("~/manual_autogpt/forex_tuner/output")
 DATA_DIR = os.path.expanduser("~/manual_autogpt/forex_tuner/data")
+PROJECT_DIR = os.path.dirname(STRATEGY_DIR)
+STORE_PATH = result_views.store_path(OUTPUT_DIR)
 
 st.set_page_config(page_title="Forex Strategy Tuner", layout="wide")
+
+
+@st.cache_resource
+def job_manager():
+    # One queue per server process, shared by every browser session
+    return JobManager(PROJECT_DIR, max_concurrent=2)
+
+
+jobs = job_manager()
 st.title("📊 Forex Strategy Tuner Dashboard")
 
 st.sidebar.header("📤 Upload Market Data")
@@ -42,49 +54,74 @@ if selected_strategy:
             f.write(edited_code)
         st.success("✅ Changes saved.")
 
-if selected_strategy and selected_symbol and st.button("🚀 Run Backtest"):
-    strat_name = selected_strategy.replace(".py", "")
-    command = f"python3 tuner_runner.py --strategy {strat_name} --symbol {selected_symbol}"
-    with st.spinner(f"Running `{strat_name}` on `{selected_symbol}`..."):
-        try:
-            result = subprocess.check_output(command, shell=True, cwd=os.path.dirname(STRATEGY_DIR), stderr=subprocess.STDOUT)
-            st.session_state["last_log"] = result.decode()
-            st.success("✅ Backtest complete")
-        except subprocess.CalledProcessError as e:
-            st.session_state["last_log"] = e.output.decode()
-            st.error("❌ Backtest failed")
-
-if st.session_state.get("last_log"):
-    st.subheader("📋 Backtest Log Output")
-    st.text_area("Execution Log", st.session_state["last_log"], height=300)
-
 if selected_strategy and selected_symbol:
-    result_file = os.path.join(OUTPUT_DIR, selected_strategy.replace(".py", "") + "_results.csv")
-    if os.path.exists(result_file):
-        if os.path.getsize(result_file) == 0:
-            st.warning("⚠️ Results file is empty. No trades or output found.")
-            st.stop()
-
-        df = pd.read_csv(result_file)
-
-        # ✅ Fixed filter to avoid KeyError
-        df_filtered = df[df["symbol"] == selected_symbol] if "symbol" in df.columns else df.copy()
+    # Sweeps run as background jobs; several can run at once across strategies/symbols
+    run_workers = st.sidebar.number_input("Workers per job", min_value=1, max_value=os.cpu_count() or 1, value=1)
+    if st.button("🚀 Run Backtest"):
+        strat_name = selected_strategy.replace(".py", "")
+        job_id = jobs.submit(strat_name, selected_symbol, ["--workers", str(run_workers)])
+        st.success(f"✅ Queued job `{job_id}`: `{strat_name}` on `{selected_symbol}`")
+
+
+def show_jobs():
+    job_list = jobs.list()
+    if not job_list:
+        return
+    st.subheader("🧵 Backtest Jobs")
+    if st.button("🧹 Clear Finished Jobs"):
+        jobs.clear_finished()
+        st.rerun()
+    for job in job_list:
+        eta = f", ETA {job.eta:.0f}s" if job.eta is not None else ""
+        title = f"`{job.id}` {job.strategy} / {job.symbol}: {job.status} ({job.done}/{job.total} combos, {job.elapsed:.0f}s{eta})"
+        with st.expander(title, expanded=job.status == "running"):
+            st.progress(job.progress)
+            if job.status in ("queued", "running") and st.button("⛔ Cancel", key=f"cancel_{job.id}"):
+                jobs.cancel(job.id)
+            st.text_area("Execution Log", job.log(tail=200), height=300, key=f"log_{job.id}")
+
+
+# Re-run only the jobs panel every few seconds when the installed Streamlit supports fragments
+if hasattr(st, "fragment"):
+    st.fragment(run_every="2s")(show_jobs)()
+else:
+    show_jobs()
+    st.button("🔄 Refresh Jobs")
 
+if selected_strategy and selected_symbol:
+    # Results come from the sweep's result store; loads are memoized until a sweep writes new rows
+    results = result_views.load_results(STORE_PATH, selected_strategy.replace(".py", ""), selected_symbol)
+    if not results.empty:
         st.subheader("📈 Results Table")
+        # One data version at a time (sweep slice, full history and timeframes are different results)
+        versions = result_views.data_versions(results)
+        version = st.selectbox("Data", versions.index, format_func=lambda k: result_views.describe_version(versions.loc[k]))
+        results = results[results["data_hash"] == versions.loc[version, "data_hash"]]
+        metric_columns = [c for c in result_views.STAT_COLUMNS if c in results.columns]
+        col1, col2, col3 = st.columns(3)
+        sort_by = col1.selectbox("Sort by", metric_columns)
+        top_n = col2.number_input("Top N", min_value=1, max_value=max(len(results), 1), value=min(50, len(results)))
+        min_trades = col3.number_input("Min trades", min_value=0, value=0)
+        df_filtered = result_views.query(results, {"total_trades": (min_trades, None)}, sort_by, top_n=top_n)
+        st.caption(f"{len(df_filtered)} of {len(results)} stored combos")
         st.dataframe(df_filtered, use_container_width=True)
 
-        if "profit" in df_filtered.columns and not df_filtered.empty:
+        if not df_filtered.empty:
             st.subheader("📊 Profit Bar Chart")
             fig, ax = plt.subplots(figsize=(10, 4))
-            df_sorted = df_filtered.sort_values("profit", ascending=False)
-            ax.bar(df_sorted.index.astype(str), df_sorted["profit"], color="green")
+            ax.bar(df_filtered["id"].astype(str), df_filtered["net_profit"], color="green")
             ax.set_ylabel("Profit")
             ax.set_xlabel("Parameter Set")
             ax.set_title("Profit by Strategy Variation")
             st.pyplot(fig)
+            plt.close(fig)
 
-        with open(result_file, "rb") as f:
-            st.download_button("📥 Download Results CSV", f, file_name=os.path.basename(result_file), mime="text/csv")
+            labels = dict(zip(df_filtered["id"], df_filtered["params"]))
+            selected_id = st.selectbox("📉 Equity curve of", list(labels), format_func=labels.get)
+            x, y = result_views.downsample(result_views.equity_curve(STORE_PATH, selected_id))
+            st.line_chart(pd.DataFrame({"Equity": y}, index=x))
+
+        st.download_button("📥 Download Results CSV", df_filtered.to_csv(index=False),
+                           file_name=f"{selected_symbol}_{selected_strategy.replace('.py', '')}_results.csv", mime="text/csv")
     else:
         st.info("ℹ️ Run a backtest to view results.")
-
@@ -1,12 +1,12 @@
 import streamlit as st
-import pandas as pd
 import matplotlib.pyplot as plt
-import numpy as np
 import os
+import result_views
 
 # Full path to output folder
 output_dir = os.path.expanduser("~/manual_autogpt/forex_tuner/output")
-available_files = [f for f in os.listdir(output_dir) if f.endswith("_results.csv")]
+store_path = result_views.store_path(output_dir)
+available = result_views.available(store_path)
 
 # Streamlit setup
 st.set_page_config(layout="wide", page_title="MT4 Strategy Dashboard")
@@ -37,65 +37,72 @@ tbody tr td {
 
 st.title("📊 MT4-Style Strategy Performance Dashboard")
 
-# File selector
-if not available_files:
-    st.error("No result files found in /output.")
+# Strategy / symbol selector
+if not available:
+    st.error("No stored results found in /output. Run a sweep first.")
     st.stop()
 
-selected_file = st.selectbox("Select Strategy Results", available_files)
-file_path = os.path.join(output_dir, selected_file)
+col_a, col_b, col_c, col_d = st.columns(4)
+selected_strategy = col_a.selectbox("Select Strategy Results", sorted(available))
+selected_symbol = col_b.selectbox("Symbol", available[selected_strategy])
+sort_by = col_c.selectbox("Rank by", ["net_profit", "sharpe", "sortino", "profit_factor", "win_rate", "max_drawdown"])
+top_n = col_d.number_input("Top N", min_value=1, value=100)
 
 try:
-    df = pd.read_csv(file_path)
-    if df.empty or not all(col in df.columns for col in ["net_profit", "win_rate", "max_drawdown", "total_trades"]):
-        st.warning(f"`{selected_file}` is empty or missing required columns.")
+    results = result_views.load_results(store_path, selected_strategy, selected_symbol)
+    # Rank within one data version (sweep slice, full history and timeframes are different results)
+    versions = result_views.data_versions(results)
+    if len(versions) > 1:
+        version = st.selectbox("Data", versions.index, format_func=lambda k: result_views.describe_version(versions.loc[k]))
+        results = results[results["data_hash"] == versions.loc[version, "data_hash"]]
+    df = result_views.query(results, sort_by=sort_by, top_n=top_n)
+    if df.empty:
+        st.warning(f"No stored results for `{selected_strategy}` on `{selected_symbol}`.")
         st.stop()
 
-    # Metrics
-    total_trades = int(df["total_trades"].sum())
-    net_profit = df["net_profit"].sum()
-    win_rate = df["win_rate"].mean() * 100
-    drawdown = df["max_drawdown"].min()
-    profit_factor = df["net_profit"].sum() / abs(drawdown) if drawdown < 0 else 0
-
-    # Metric layout
+    # Metrics of the best combo
+    best = df.iloc[0]
     col1, col2, col3, col4, col5 = st.columns(5)
-    col1.metric("🧾 Total Trades", f"{total_trades}")
-    col2.metric("💰 Net Profit", f"${net_profit:,.2f}")
-    col3.metric("🎯 Win Rate", f"{win_rate:.1f}%")
-    col4.metric("📉 Max Drawdown", f"${drawdown:,.2f}")
-    col5.metric("📈 Profit Factor", f"{profit_factor:.2f}")
+    col1.metric("🧾 Total Trades", f"{int(best['total_trades'])}")
+    col2.metric("💰 Net Profit", f"${best['net_profit']:,.2f}")
+    col3.metric("🎯 Win Rate", f"{best['win_rate'] * 100:.1f}%")
+    col4.metric("📉 Max Drawdown", f"${best['max_drawdown']:,.2f}")
+    col5.metric("📈 Profit Factor", f"{best['profit_factor']:.2f}")
+    st.caption(f"Best of {len(results)} stored combos by {sort_by}: {best['params']}")
 
-    # Equity curve
+    # Equity curve of the best combo, downsampled for plotting
     st.subheader("📈 Equity Curve")
-    equity = np.cumsum(df["net_profit"].fillna(0))
+    x, y = result_views.downsample(result_views.equity_curve(store_path, best["id"]))
     fig, ax = plt.subplots()
-    ax.plot(equity, color="#00e6e6", linewidth=2)
-    ax.set_title("Simulated Equity Curve")
+    ax.plot(x, y, color="#00e6e6", linewidth=2)
+    ax.set_title("Equity Curve")
     ax.set_ylabel("Balance")
     ax.grid(True, linestyle="--", alpha=0.3)
     st.pyplot(fig)
+    plt.close(fig)
 
     # Win vs Loss chart
-    st.subheader("🔍 Win vs Loss Distribution")
-    wins = df[df["net_profit"] > 0].shape[0]
-    losses = df[df["net_profit"] < 0].shape[0]
+    st.subheader("🔍 Profitable vs Losing Combos")
+    wins = int((results["net_profit"] > 0).sum())
+    losses = int((results["net_profit"] < 0).sum())
     fig2, ax2 = plt.subplots()
     ax2.bar(["Wins", "Losses"], [wins, losses], color=["#00ffcc", "#ff4d4d"])
-    ax2.set_title("Trades Outcome")
+    ax2.set_title("Combo Outcome")
     st.pyplot(fig2)
+    plt.close(fig2)
 
-    # Full results table
+    # Top results table
     st.subheader("📋 Detailed Results")
-    styled_df = df[["net_profit", "win_rate", "max_drawdown", "total_trades"]].copy()
+    styled_df = df[["params", "net_profit", "win_rate", "max_drawdown", "total_trades", "profit_factor", "sharpe"]].copy()
     styled_df = styled_df.style.format({
         "net_profit": "${:,.2f}",
         "win_rate": "{:.2%}",
         "max_drawdown": "${:,.2f}",
-        "total_trades": "{:.0f}"
+        "total_trades": "{:.0f}",
+        "profit_factor": "{:.2f}",
+        "sharpe": "{:.2f}"
     })
     st.dataframe(styled_df, use_container_width=True)
 
 except Exception as e:
     st.error(f"Failed to load results: {e}")
-
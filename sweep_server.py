@@ -0,0 +1,184 @@
+# sweep_server.py
+# Warm sweep daemon.
+#
+# A fresh tuner_runner.py spends most of a small sweep importing pandas/numpy and
+# loading candles. The daemon pays for that once and stays up with the engine and
+# matplotlib imported and the sweep frames and indicator cache in memory. It runs
+# tuner_runner commands sent over a Unix socket in the project's output folder
+# and streams their output back; sweep workers are forked from it, so they start
+# warm as well. tuner_runner.py hands its command to the daemon whenever one is
+# listening (dashboard jobs only when the job queue runs one at a time):
+#
+#     python sweep_server.py --preload USDJPY EURUSD &
+#     python tuner_runner.py --strategy rci_strategy --symbol USDJPY
+#     python sweep_server.py --stop
+#
+# Commands run one at a time, since they share the process's stage timer and
+# caches. When a project .py file changes, the daemon turns the next command
+# away (the client then runs it itself) and restarts on the new code.
+#
+# Only stdlib modules are imported at the top: the client side runs in every
+# tuner_runner.py start.
+
+import os
+import sys
+import glob
+import json
+import socket
+import argparse
+import traceback
+import socketserver
+from contextlib import redirect_stdout, redirect_stderr
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+SOCKET_PATH = os.path.join("output", "sweep.sock")
+EXIT_MARK = "[EXIT]"
+RELOAD_MARK = "[RELOAD]"
+
+
+def _connect(path):
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+    except OSError:
+        conn.close()
+        return None
+    return conn
+
+
+def _send(conn, request):
+    conn.sendall((json.dumps(request) + "\n").encode())
+
+
+def forward(argv, path=SOCKET_PATH):
+    # Runs a tuner_runner command on the daemon and relays its output; returns its
+    # exit code, or None when no daemon takes the command
+    conn = _connect(path)
+    if conn is None:
+        return None
+    with conn, conn.makefile("r", encoding="utf-8") as replies:
+        _send(conn, {"argv": argv})
+        for line in replies:
+            if line.startswith(RELOAD_MARK):
+                return None
+            if line.startswith(EXIT_MARK):
+                return int(line[len(EXIT_MARK):])
+            sys.stdout.write(line)
+            sys.stdout.flush()
+    print("❌ Sweep daemon closed the connection before the command finished")
+    return 1
+
+
+def source_versions():
+    # mtime of every project module, strategies included
+    paths = glob.glob(os.path.join(PROJECT_DIR, "*.py")) + glob.glob(os.path.join(PROJECT_DIR, "strategies", "*.py"))
+    return {path: os.path.getmtime(path) for path in paths}
+
+
+class SweepHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline() or "{}")
+        if request.get("command") == "stop":
+            self.server.stopping = True
+            self.wfile.write(f"{EXIT_MARK} 0\n".encode())
+            return
+        if source_versions() != self.server.sources:
+            self.server.restarting = True
+            self.wfile.write(f"{RELOAD_MARK}\n".encode())
+            return
+
+        import tuner_runner
+        output = self.connection.makefile("w", encoding="utf-8", buffering=1)
+        try:
+            with redirect_stdout(output), redirect_stderr(output):
+                try:
+                    tuner_runner.main(request.get("argv", []))
+                    returncode = 0
+                except SystemExit as e:
+                    # argparse errors and --help
+                    returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                except (BrokenPipeError, ConnectionResetError):
+                    raise
+                except Exception:
+                    traceback.print_exc()
+                    returncode = 1
+            output.write(f"{EXIT_MARK} {returncode}\n")
+            output.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away (Ctrl-C, cancelled dashboard job): the command stops here
+            print("⚠️ Client disconnected, command aborted")
+
+
+class SweepServer(socketserver.UnixStreamServer):
+    def __init__(self, path):
+        super().__init__(path, SweepHandler)
+        self.sources = source_versions()
+        self.stopping = False
+        self.restarting = False
+
+
+def warm_up(symbols, timeframe="M5", data_path="data"):
+    # Imports (and data) every command would otherwise load first
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot
+    import tuner_runner
+    import tuner_engine
+    tuner_runner.build_parser()
+    for symbol in symbols:
+        m5_df, m30_df = tuner_engine.load_sweep_data(symbol, timeframe, data_path)
+        print(f"📦 Loaded {symbol} {timeframe}: {len(m5_df)} bars (+{len(m30_df)} M30)")
+
+
+def serve(path=SOCKET_PATH, symbols=(), timeframe="M5", data_path="data"):
+    conn = _connect(path)
+    if conn is not None:
+        conn.close()
+        raise SystemExit(f"❌ A sweep daemon is already listening on {path}")
+    if os.path.exists(path):
+        os.unlink(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    warm_up(symbols, timeframe, data_path)
+    server = SweepServer(path)
+    print(f"🔥 Sweep daemon listening on {path} (pid {os.getpid()})", flush=True)
+    try:
+        while not (server.stopping or server.restarting):
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+    if server.restarting:
+        print("♻️ Project code changed, restarting the sweep daemon", flush=True)
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+    print("🛑 Sweep daemon stopped")
+
+
+def stop(path=SOCKET_PATH):
+    conn = _connect(path)
+    if conn is None:
+        print(f"No sweep daemon listening on {path}")
+        return False
+    with conn:
+        _send(conn, {"command": "stop"})
+        conn.recv(64)
+    print(f"🛑 Stopped the sweep daemon on {path}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep the sweep engine warm and run tuner_runner commands sent over a Unix socket")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Unix socket path (tuner_runner.py looks for the default)")
+    parser.add_argument("--preload", nargs="*", default=[], help="Symbols whose sweep data to load at start (e.g., USDJPY EURUSD)")
+    parser.add_argument("--timeframe", default="M5", help="Timeframe of the preloaded data")
+    parser.add_argument("--stop", action="store_true", help="Stop the running daemon")
+    args = parser.parse_args()
+
+    if args.stop:
+        stop(args.socket)
+    else:
+        serve(args.socket, args.preload, args.timeframe)
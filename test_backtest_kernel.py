@@ -0,0 +1,209 @@
+# test_backtest_kernel.py
+# python -m pytest test_backtest_kernel.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from backtest_kernel import resolve_exits, run_signals, run_signals_batch, PaperBroker
+from strategies import get_strategy_config
+from paper_trading import replay, compare, SimulatedFeed
+from tuner_engine import run_backtest
+from tuner_options import AMBIGUOUS_RULES
+
+
+def gap_bars(open_, high, low, close):
+    # Entry bar closing at 100, then one exit bar
+    return (np.array([100.0, open_]), np.array([100.0, high]), np.array([100.0, low]), np.array([100.0, close]))
+
+
+def broker_exit(side, bars, ambiguous, spread=0.0):
+    open_, high, low, close = bars
+    broker = PaperBroker(tp=1.0, sl=1.0, lot_size=1, contract_size=1, fill="intrabar", spread=spread, ambiguous=ambiguous)
+    broker.on_bar(0, 0, close[0], side > 0, side < 0, open_[0], high[0], low[0])
+    closed = broker.on_bar(1, 1, close[1], False, False, open_[1], high[1], low[1])
+    return closed[0][0]["exit_price"]
+
+
+@pytest.mark.parametrize("ambiguous", AMBIGUOUS_RULES)
+@pytest.mark.parametrize("side, bar, expected", [
+    # Long TP 101 / SL 99: the open gaps above TP, the low later reaches SL
+    (1, (102.0, 102.5, 98.0, 100.0), 102.0),
+    # Long: the open gaps below SL, the high later reaches TP
+    (1, (98.5, 101.5, 98.0, 101.0), 98.5),
+    # Short TP 99 / SL 101: the open gaps below TP, the high later reaches SL
+    (-1, (97.5, 102.0, 97.0, 100.0), 97.5),
+    # Short: the open gaps above SL, the low later reaches TP
+    (-1, (101.5, 102.0, 98.0, 99.0), 101.5),
+])
+def test_gapped_level_fills_at_open_before_ambiguous_rule(ambiguous, side, bar, expected):
+    bars = gap_bars(*bar)
+    exits, _, exit_price = resolve_exits(*bars, [0], [side], 1.0, 1.0, ambiguous=ambiguous)
+    assert exits[0] == 1
+    assert exit_price[0] == expected
+    assert broker_exit(side, bars, ambiguous) == expected
+
+
+# Exit of a long and a short (TP/SL 1.0 from 100) on an up bar touching both levels;
+# a rule added to tuner_options without an entry here fails the test below
+INSIDE_BOTH_EXITS = {"sl": {1: 99.0, -1: 101.0}, "tp": {1: 101.0, -1: 99.0}, "ohlc": {1: 99.0, -1: 99.0}}
+
+
+@pytest.mark.parametrize("ambiguous", AMBIGUOUS_RULES)
+@pytest.mark.parametrize("side", [1, -1])
+def test_ambiguous_rule_when_open_is_inside_both_levels(ambiguous, side):
+    # Up bar (close > open): "ohlc" assumes open -> low -> high -> close
+    expected = INSIDE_BOTH_EXITS[ambiguous][side]
+    bars = gap_bars(100.0, 102.0, 98.0, 100.5)
+    exits, _, exit_price = resolve_exits(*bars, [0], [side], 1.0, 1.0, ambiguous=ambiguous)
+    assert exit_price[0] == expected
+    assert broker_exit(side, bars, ambiguous) == expected
+
+
+# Kernels vs. a naive per-bar loop on a synthetic random walk with gaps
+
+def random_bars(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    # Five ticks per bar; every 50th bar opens with a gap
+    ticks = 100 + np.cumsum(rng.normal(0, 0.03, 5 * n))
+    ticks += np.repeat(np.cumsum(np.where(np.arange(n) % 50 == 0, rng.normal(0, 0.3, n), 0.0)), 5)
+    ticks = ticks.reshape(n, 5)
+    return ticks[:, 0], ticks.max(axis=1), ticks.min(axis=1), ticks[:, -1]
+
+
+def random_signals(n, seed=1, rate=0.03):
+    rng = np.random.default_rng(seed)
+    return rng.random(n) < rate, rng.random(n) < rate
+
+
+def reference_exit_price(side, upper, lower, o, h, l, c, intrabar, spread, ambiguous):
+    # Exit fill on this bar or None, written out case by case
+    if not intrabar:
+        return c if c >= upper or c <= lower else None
+    ask = spread if side < 0 else 0.0
+    if o >= upper or o <= lower:
+        return o + ask
+    up, down = h >= upper, l <= lower
+    if up and down:
+        if ambiguous == "sl":
+            up = side < 0
+        elif ambiguous == "tp":
+            up = side > 0
+        elif ambiguous == "ohlc":
+            up = c < o
+        else:
+            raise ValueError(f"No reference for ambiguous rule {ambiguous}")
+        down = not up
+    if up:
+        return upper + ask
+    if down:
+        return lower + ask
+    return None
+
+
+def reference_backtest(bars, long, short, tp, sl, start=0, end=None, intrabar=False, spread=0.0, ambiguous="sl",
+                       initial_balance=400, lot_size=0.01, contract_size=100000):
+    # One position at a time, entered on a signal bar's close, exited on a later bar;
+    # the next entry needs a bar after the exit bar. With `end`, no entries from
+    # bar end - 1 on and open trades close there.
+    open_, high, low, close = bars
+    n = len(close)
+    end = n if end is None else end
+    spread = spread if intrabar else 0.0
+    trades, realized = [], np.zeros(n)
+    position = None
+    for i in range(end):
+        if position is not None:
+            side, entry_bar, entry_price, upper, lower = position
+            exit_price = reference_exit_price(side, upper, lower, open_[i], high[i], low[i], close[i],
+                                              intrabar, spread, ambiguous)
+            if exit_price is None and end < n and i == end - 1:
+                exit_price = close[i] + (spread if side < 0 else 0.0)
+            if exit_price is not None:
+                profit = (exit_price - entry_price if side > 0 else entry_price - exit_price) * contract_size * lot_size
+                trades.append((entry_bar, i, entry_price, exit_price, profit))
+                realized[i] += profit
+                position = None
+            continue
+        if i >= start and (end == n or i < end - 1) and (long[i] or short[i]):
+            side = 1 if long[i] else -1
+            entry_price = close[i] + (spread if side > 0 else 0.0)
+            if side > 0:
+                upper, lower = entry_price + tp, entry_price - sl
+            else:
+                upper, lower = entry_price + sl - spread, entry_price - tp - spread
+            position = (side, i, entry_price, upper, lower)
+    equity = initial_balance + np.concatenate(([0.0], np.cumsum(realized[start:end])))
+    return trades, equity
+
+
+def kernel_trades(result):
+    return list(zip(result["entry_bars"], result["exit_bars"], [t["entry_price"] for t in result["trades"]],
+                    [t["exit_price"] for t in result["trades"]], result["profits"]))
+
+
+def assert_same_trades(actual, expected):
+    assert len(actual) == len(expected)
+    for got, want in zip(actual, expected):
+        assert got[:2] == want[:2]
+        assert np.allclose(got[2:], want[2:], rtol=0, atol=1e-9)
+
+
+# Close fills, then intrabar fills under every ambiguous rule with and without spread
+EXIT_MODELS = [{"intrabar": False}] + [{"intrabar": True, "spread": spread, "ambiguous": rule}
+                                       for rule in AMBIGUOUS_RULES for spread in (0.0, 0.02)]
+
+
+def kernel_options(bars, model):
+    if not model["intrabar"]:
+        return {}
+    return {"ohlc": bars[:3], "spread": model["spread"], "ambiguous": model["ambiguous"]}
+
+
+@pytest.mark.parametrize("model", EXIT_MODELS)
+@pytest.mark.parametrize("start, end", [(0, None), (100, 2500)])
+def test_kernels_match_per_bar_loop(model, start, end):
+    bars = random_bars()
+    long, short = random_signals(len(bars[0]))
+    expected, equity = reference_backtest(bars, long, short, 0.3, 0.2, start, end, **model)
+    assert len(expected) > 50
+
+    single = run_signals(bars[3], long, short, 0.3, 0.2, start=start, end=end, **kernel_options(bars, model))
+    assert_same_trades(kernel_trades(single), expected)
+    assert np.allclose(single["equity_curve"], equity, rtol=0, atol=1e-6)
+
+    # Batch rows with other signals around them must not change this row's trades
+    other_long, other_short = random_signals(len(bars[0]), seed=2, rate=0.1)
+    batch = run_signals_batch(bars[3], np.stack([other_long, long]), np.stack([other_short, short]), 0.3, 0.2,
+                              start=start, end=end, **kernel_options(bars, model))
+    assert_same_trades(kernel_trades(batch[1]), expected)
+    assert np.allclose(batch[1]["equity_curve"], equity, rtol=0, atol=1e-6)
+
+
+@pytest.mark.parametrize("model", EXIT_MODELS)
+def test_paper_broker_matches_per_bar_loop(model):
+    bars = random_bars()
+    long, short = random_signals(len(bars[0]))
+    expected, _ = reference_backtest(bars, long, short, 0.3, 0.2, start=100, **model)
+    fill = "intrabar" if model["intrabar"] else "close"
+    broker = PaperBroker(0.3, 0.2, start=100, fill=fill, spread=model.get("spread", 0.0),
+                         ambiguous=model.get("ambiguous", "sl"))
+    trades = []
+    for i, (o, h, l, c) in enumerate(zip(*bars)):
+        for trade, held in broker.on_bar(i, i, c, long[i], short[i], o, h, l):
+            trades.append((trade["entry_time"], trade["exit_time"], trade["entry_price"], trade["exit_price"],
+                           trade["profit"]))
+    assert_same_trades(trades, expected)
+
+
+@pytest.mark.parametrize("strategy", ["rci_strategy", "breaker_pivot_ma_strategy", "liquidation_heatmap_strategy"])
+@pytest.mark.parametrize("fill", ["intrabar", "close"])
+def test_paper_replay_matches_batch_backtest(strategy, fill):
+    open_, high, low, close = random_bars(4000, seed=3)
+    index = pd.date_range("2024-01-01", periods=len(close), freq="5min", name="timestamp")
+    df = pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close,
+                       "Volume": np.random.default_rng(4).integers(1, 100, len(close)).astype("float64")}, index=index)
+    config = get_strategy_config(strategy)
+    params = {k: v[0] for k, v in config["params"].items()}
+    params["fill"] = fill
+    live = replay(config["live"](params), SimulatedFeed(df))
+    assert compare(run_backtest(config["runner"], df, None, params), live) == []
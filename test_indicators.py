@@ -0,0 +1,32 @@
+# test_indicators.py
+# python -m pytest test_indicators.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from indicators import rolling_rci
+from streaming_indicators import RCI
+
+
+def rci(series, length):
+    # Single-window reference: the RCI of the last `length` values of a pandas Series
+    n = length
+    rank_price = series.rank(method='first')
+    rank_time = pd.Series(np.arange(1, n + 1), index=series.index[-n:])
+    d = ((rank_price[-n:].values - rank_time.values) ** 2).sum()
+    return 100 * (1 - (6 * d) / (n * (n ** 2 - 1)))
+
+
+@pytest.mark.parametrize("length", [2, 9, 26])
+def test_rolling_rci_matches_single_window_reference(length):
+    rng = np.random.default_rng(length)
+    # Rounded prices, so windows contain ties
+    values = np.round(100 + np.cumsum(rng.normal(0, 0.05, 500)), 1)
+    expected = [rci(pd.Series(values[i - length + 1:i + 1]), length) for i in range(length - 1, len(values))]
+
+    out = rolling_rci(values, length)
+    assert np.isnan(out[:length - 1]).all()
+    assert np.allclose(out[length - 1:], expected, rtol=0, atol=1e-9)
+
+    stream = RCI(length)
+    assert np.allclose([stream.update(v) for v in values][length - 1:], expected, rtol=0, atol=1e-9)
@@ -0,0 +1,97 @@
+# test_metrics.py
+# python -m pytest test_metrics.py
+
+import math
+import numpy as np
+import pytest
+from metrics import stats_dicts, max_drawdown, max_drawdown_pct, profit_factor
+
+PERIODS = 260 * 288
+
+
+def reference_stats(profits, equity, durations):
+    # One combo, written out with plain loops
+    peak, max_dd, max_dd_pct = -math.inf, 0.0, 0.0
+    for value in equity:
+        peak = max(peak, value)
+        max_dd = min(max_dd, value - peak)
+        if peak > 0:
+            max_dd_pct = min(max_dd_pct, value / peak - 1)
+    gross_win = sum(p for p in profits if p > 0)
+    gross_loss = -sum(p for p in profits if p < 0)
+    if gross_loss > 0:
+        pf = gross_win / gross_loss
+    else:
+        pf = math.inf if gross_win > 0 else 0.0
+    pnl = [b - a for a, b in zip(equity, equity[1:])]
+    mean = sum(pnl) / len(pnl)
+    std = math.sqrt(sum((x - mean) ** 2 for x in pnl) / len(pnl))
+    downside = math.sqrt(sum(min(x, 0.0) ** 2 for x in pnl) / len(pnl))
+    n = len(profits)
+    return {
+        "total_trades": n,
+        "net_profit": sum(profits) if n else 0,
+        "win_rate": sum(p > 0 for p in profits) / n if n else 0,
+        "max_drawdown": max_dd,
+        "max_drawdown_pct": max_dd_pct,
+        "sharpe": mean / std * math.sqrt(PERIODS) if std > 0 else 0.0,
+        "sortino": mean / downside * math.sqrt(PERIODS) if downside > 0 else 0.0,
+        "profit_factor": pf,
+        "expectancy": sum(profits) / n if n else 0.0,
+        "avg_trade_bars": sum(durations) / n if n else 0.0,
+        "max_trade_bars": max(durations, default=0),
+    }
+
+
+def combo_matrix(trade_lists, n_bars=200, initial_balance=400.0, seed=0):
+    # (trades x combos) profits/closed/durations plus (combos x bars) equity stepping at random bars
+    rng = np.random.default_rng(seed)
+    width = max([len(t) for t in trade_lists] + [1])
+    profits = np.zeros((width, len(trade_lists)))
+    closed = np.zeros((width, len(trade_lists)), dtype=bool)
+    durations = np.zeros((width, len(trade_lists)), dtype="int64")
+    equity = np.full((len(trade_lists), n_bars), initial_balance)
+    for c, trades in enumerate(trade_lists):
+        profits[:len(trades), c] = trades
+        closed[:len(trades), c] = True
+        durations[:len(trades), c] = rng.integers(1, 30, len(trades))
+        # Padding rows hold junk that `closed` must mask out
+        profits[len(trades):, c] = rng.normal(0, 100, width - len(trades))
+        exit_bars = np.sort(rng.choice(np.arange(1, n_bars), len(trades), replace=False))
+        for bar, profit in zip(exit_bars, trades):
+            equity[c, bar:] += profit
+    return profits, closed, durations, equity
+
+
+CASES = {
+    "random": None,
+    "no trades": [],
+    "all wins": [5.0, 12.5, 0.5, 30.0],
+    "all losses": [-5.0, -12.5, -0.5, -30.0],
+    "breakeven": [0.0, 0.0],
+    "ruin": [-300.0, -250.0, 40.0],
+}
+
+
+@pytest.mark.parametrize("case", list(CASES))
+def test_stats_dicts_match_reference(case):
+    rng = np.random.default_rng(1)
+    trade_lists = [list(rng.normal(1, 20, k)) for k in (0, 1, 7, 40, 120)] if CASES[case] is None else [CASES[case]]
+    profits, closed, durations, equity = combo_matrix(trade_lists)
+    actual = stats_dicts(profits, closed, equity, PERIODS, durations=durations)
+    for c, trades in enumerate(trade_lists):
+        expected = reference_stats(trades, list(equity[c]), list(durations[:len(trades), c]))
+        assert actual[c].keys() == expected.keys()
+        for name, value in expected.items():
+            assert actual[c][name] == pytest.approx(value, rel=1e-9, abs=1e-9), name
+
+
+def test_edge_values():
+    assert profit_factor(np.array([[1.0], [2.0]]))[0] == np.inf
+    assert profit_factor(np.array([[-1.0], [-2.0]]))[0] == 0.0
+    assert profit_factor(np.zeros((0, 1)))[0] == 0.0
+    # Empty and flat curves have no drawdown; a curve below zero measures % only while the peak is positive
+    assert max_drawdown(np.zeros((2, 0))).tolist() == [0.0, 0.0]
+    assert max_drawdown(np.full(5, 400.0)) == 0.0
+    assert max_drawdown_pct(np.array([100.0, 50.0, -20.0, 10.0])) == pytest.approx(-1.2)
+    assert max_drawdown_pct(np.array([-10.0, -20.0])) == 0.0
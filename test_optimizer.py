@@ -0,0 +1,46 @@
+# test_optimizer.py
+# python -m pytest test_optimizer.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from candle_store import write_arrays, resample_arrays
+from optimizer import run_optimization, halving_cost, fit_bracket
+
+
+@pytest.fixture(scope="module")
+def data_path(tmp_path_factory):
+    # Synthetic USDJPY-like M5 random walk plus its M30 resample in a fresh candle store
+    path = str(tmp_path_factory.mktemp("data"))
+    rng = np.random.default_rng(0)
+    n = 3000
+    ticks = (130 + np.cumsum(rng.normal(0, 0.03, 5 * n))).reshape(n, 5)
+    m5 = {
+        "timestamp": np.arange(n, dtype="int64") * 300_000_000_000 + pd.Timestamp("2024-01-01").value,
+        "open": ticks[:, 0], "high": ticks.max(axis=1), "low": ticks.min(axis=1), "close": ticks[:, -1],
+        "volume": rng.integers(1, 100, n).astype("float64"),
+    }
+    write_arrays(m5, "TEST", "M5", path)
+    write_arrays(resample_arrays(m5, 30), "TEST", "M30", path)
+    return path
+
+
+@pytest.mark.parametrize("n_configs, eta, rungs", [(27, 3, 3), (12, 3, 2), (6, 3, 1), (4, 3, 0), (81, 3, 4)])
+@pytest.mark.parametrize("remaining", [0, 1, 2, 5, 10, 30, 100])
+def test_fit_bracket_stays_within_remaining_trials(n_configs, eta, rungs, remaining):
+    n, fitted = fit_bracket(n_configs, eta, rungs, remaining)
+    if remaining == 0:
+        assert n == 0
+    else:
+        assert 1 <= n <= n_configs and fitted <= rungs
+        assert halving_cost(n, eta, fitted) <= remaining
+
+
+@pytest.mark.parametrize("method", ["random", "halving", "hyperband", "tpe"])
+@pytest.mark.parametrize("trials", [1, 7, 30, 45])
+def test_trials_stay_within_budget_and_reach_full_history(data_path, tmp_path, method, trials):
+    result = run_optimization("rci_strategy", "TEST", method, trials, data_path=data_path, output_path=str(tmp_path))
+    assert result is not None
+    log = pd.read_csv(tmp_path / f"TEST_rci_strategy_{method}_trials.csv")
+    assert len(log) <= trials
+    assert (log["fraction"] >= 1.0).any()
@@ -0,0 +1,19 @@
+# test_result_views.py
+# python -m pytest test_result_views.py
+
+import numpy as np
+import pytest
+from result_views import downsample
+
+
+@pytest.mark.parametrize("max_points", [10, 501, 2000])
+@pytest.mark.parametrize("n", [5, 2001, 2003, 4321, 150_000, 1_000_000, 3_000_000])
+def test_downsample_stays_within_max_points(n, max_points):
+    values = 400 + np.cumsum(np.random.default_rng(n).normal(0, 1, n))
+    x, y = downsample(values, max_points)
+    assert len(x) <= max_points
+    assert np.all(np.diff(x) > 0)
+    assert np.array_equal(y, values[x])
+    # Ends, peak and trough survive
+    assert x[0] == 0 and x[-1] == n - 1
+    assert y.max() == values.max() and y.min() == values.min()
@@ -0,0 +1,71 @@
+# test_timeframe_align.py
+# python -m pytest test_timeframe_align.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from candle_store import resample_arrays, candles_frame
+from indicators import moving_average
+from timeframe_align import alignment_index, broadcast, htf_indicator
+
+M5, M30 = 300_000_000_000, 1_800_000_000_000
+
+
+def frames(seed=0, n=4000, attrs=True):
+    # M5 bars with random holes (including whole M30 buckets) and their M30 resample
+    rng = np.random.default_rng(seed)
+    slots = np.flatnonzero(rng.random(n) < 0.8)
+    slots = slots[~np.isin(slots // 6, rng.choice(n // 6, n // 60))]
+    close = 100 + np.cumsum(rng.normal(0, 0.05, len(slots)))
+    m5 = {"timestamp": pd.Timestamp("2024-01-01").value + slots.astype("int64") * M5,
+          "open": close, "high": close + 0.01, "low": close - 0.01, "close": close, "volume": np.ones(len(slots))}
+    m30 = resample_arrays(m5, 30)
+    if attrs:
+        return candles_frame(m5, "TEST", "M5"), candles_frame(m30, "TEST", "M30")
+    return candles_frame(m5), candles_frame(m30)
+
+
+def brute_force_index(data_m5, data_m30):
+    # Last M30 bar whose close (open + 30 min) is at or before the M5 bar's close
+    m5_close = data_m5.index.to_numpy(dtype="datetime64[ns]").view("int64") + M5
+    m30_close = data_m30.index.to_numpy(dtype="datetime64[ns]").view("int64") + M30
+    idx = np.full(len(m5_close), -1)
+    for i, closed_at in enumerate(m5_close):
+        for j in range(len(m30_close)):
+            if m30_close[j] <= closed_at:
+                idx[i] = j
+    return idx
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("attrs", [True, False])
+def test_alignment_index_matches_brute_force(seed, attrs):
+    data_m5, data_m30 = frames(seed, n=1500, attrs=attrs)
+    assert np.array_equal(alignment_index(data_m5, data_m30), brute_force_index(data_m5, data_m30))
+
+
+def test_m30_bar_is_hidden_until_it_closes():
+    # Four hours of gap-free M5 bars whose close is the bar number
+    m5 = {"timestamp": pd.Timestamp("2024-01-01").value + np.arange(48, dtype="int64") * M5}
+    m5.update({name: np.arange(48, dtype="float64") for name in ("open", "high", "low", "close", "volume")})
+    data_m5, data_m30 = candles_frame(m5, "TEST", "M5"), candles_frame(resample_arrays(m5, 30), "TEST", "M30")
+    idx = alignment_index(data_m5, data_m30)
+    # 00:00-00:20 M5 bars close before the 00:00 M30 bar does; 00:25 closes with it at 00:30
+    assert list(idx[:6]) == [-1, -1, -1, -1, -1, 0]
+    assert list(idx[6:12]) == [0, 0, 0, 0, 0, 1]
+    values = broadcast(data_m5, data_m30, data_m30["Close"].to_numpy())
+    assert np.isnan(values[:5]).all()
+    # Every visible M30 close is one the M5 history has already printed
+    m5_close = data_m5["Close"].to_numpy()
+    assert all(values[i] in m5_close[:i + 1] for i in range(5, len(values)))
+
+
+def test_htf_indicator_uses_only_closed_bars():
+    data_m5, data_m30 = frames(seed=4, n=3000)
+    trend = htf_indicator(data_m5, data_m30, moving_average, "Close", 10, "EMA")
+    idx = alignment_index(data_m5, data_m30)
+    for i in np.random.default_rng(5).choice(len(data_m5), 50, replace=False):
+        # Recomputed from only the M30 bars closed by then: the value must not change
+        known = data_m30.iloc[:idx[i] + 1]
+        expected = moving_average(known, "Close", 10, "EMA")[-1] if len(known) else np.nan
+        assert np.allclose(trend[i], expected, equal_nan=True)
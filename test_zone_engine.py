@@ -0,0 +1,34 @@
+# test_zone_engine.py
+# python -m pytest test_zone_engine.py
+
+import numpy as np
+import pytest
+from zone_engine import ZoneBook
+
+
+def linear_trigger(zones, price):
+    # The scan ZoneBook replaced: every zone ever created, in creation order
+    triggered = []
+    for zone in zones:
+        if zone["active"] and zone["bot"] < price < zone["top"]:
+            zone["active"] = False
+            triggered.append(zone["id"])
+    return triggered
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_zone_book_matches_linear_scan(seed):
+    rng = np.random.default_rng(seed)
+    book, zones = ZoneBook(), []
+    # Prices and bounds on a coarse grid so ties, zero-width zones and prices on a bound all occur
+    for _ in range(300):
+        for _ in range(rng.integers(0, 3)):
+            bot = round(float(rng.uniform(95, 105)), 1)
+            top = bot + round(float(rng.choice([0.0, rng.exponential(1.0)])), 1)
+            if rng.random() < 0.02:
+                bot = float("nan")
+            zone = book.add(bot, top, rng.choice(["long", "short"]))
+            zones.append({"id": zone["id"], "bot": bot, "top": top, "active": True})
+        price = round(float(rng.uniform(94, 106)), 1)
+        assert [zone["id"] for zone in book.trigger(price)] == linear_trigger(zones, price)
+    assert len(book) == sum(zone["active"] and zone["top"] > zone["bot"] for zone in zones)
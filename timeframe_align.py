@@ -0,0 +1,56 @@
+# timeframe_align.py
+# Maps every M5 bar to the last M30 bar that had already closed when the M5 bar
+# closed, so higher-timeframe values can be read on the M5 grid without look-ahead.
+#
+# The alignment is one searchsorted over bar close times, computed once per
+# (M5 data, M30 data) pair and kept in the indicator cache; broadcasting a
+# higher-timeframe array is then a single gather:
+#
+#     trend = htf_indicator(data_m5, data_m30, moving_average, "Close", 20, "EMA")
+#     # trend[i] = 20-EMA of the M30 closes known at the close of M5 bar i (NaN before the first one)
+
+import numpy as np
+import pandas as pd
+from indicator_cache import cached, fingerprint
+from candle_store import timeframe_minutes
+
+
+def frame_minutes(df):
+    # "M5" / "H1" / "D1" from the frame attrs, otherwise the most common bar spacing
+    timeframe = df.attrs.get("timeframe")
+    if timeframe:
+        return timeframe_minutes(timeframe)
+    spacing = np.diff(df.index.to_numpy(dtype="datetime64[ns]").view("int64"))
+    return int(pd.Series(spacing).mode().iloc[0] // 60_000_000_000) if len(spacing) else 0
+
+
+def _close_times(df):
+    return df.index.to_numpy(dtype="datetime64[ns]") + np.timedelta64(frame_minutes(df), "m")
+
+
+def alignment_index(data_m5, data_m30):
+    # idx[i]: row of the latest M30 bar closed by the close of M5 bar i, -1 when none has
+    return cached(data_m5, "htf_alignment", {"htf": fingerprint(data_m30), "htf_timeframe": data_m30.attrs.get("timeframe")},
+                  lambda: np.searchsorted(_close_times(data_m30), _close_times(data_m5), side="right") - 1)
+
+
+def broadcast(data_m5, data_m30, values):
+    # Higher-timeframe values (one per M30 row, or rows x M30 bars) on the M5 grid
+    values = np.asarray(values, dtype="float64")
+    idx = alignment_index(data_m5, data_m30)
+    out = values[..., np.maximum(idx, 0)]
+    out[..., idx < 0] = np.nan
+    return out
+
+
+def htf_indicator(data_m5, data_m30, indicator, *args, **kwargs):
+    # Runs a cached indicator (indicators.py signature: df first) on M30, broadcast to M5
+    return broadcast(data_m5, data_m30, indicator(data_m30, *args, **kwargs))
+
+
+def same_span(data_m5, data_m30):
+    # The M30 bars covering the M5 frame's span, e.g. after truncating the M5 history
+    if not len(data_m5):
+        return data_m30.iloc[:0]
+    first = data_m5.index[0] - pd.Timedelta(minutes=frame_minutes(data_m30))
+    return data_m30.loc[(data_m30.index >= first) & (data_m30.index <= data_m5.index[-1])]
@@ -2,8 +2,17 @@ import os
 import pandas as pd
 import numpy as np
 from strategies import get_strategy_config
-import matplotlib.pyplot as plt
+from candle_store import load_candles, store_dir, is_stale
+from timeframe_align import same_span
+from shared_data import share_frame, attach_frame, release
+from indicator_cache import default_cache, merge_stats, format_stats
+from chart_renderer import equity_path, save_equity_curves, render_charts
+from result_store import ResultStore, DEFAULT_STORE, strategy_hash, data_hash
+from stage_timer import stage, default_timer, elapsed_since, merge_timings, format_report, profile_call
+from monte_carlo import robustness_report, top_combos, DEFAULT_SIMULATIONS
 from itertools import product
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 def run_backtest(strategy_runner, data_m5, data_m30, params):
     result = strategy_runner(data_m5, data_m30, params)
@@ -12,74 +21,271 @@ def run_backtest(strategy_runner, data_m5, data_m30, params):
     stats = result["stats"]
     return trades, equity, stats
 
-def run_parameter_sweep(strategy_name, symbol, data_path="data", output_path="output"):
+def run_batch_backtest(config, data_m5, data_m30, params_list):
+    # One batched pass when the strategy supports it, otherwise combo by combo
+    with stage("signals"):
+        if config.get("batch_runner") and len(params_list) > 1:
+            results = config["batch_runner"](data_m5, data_m30, params_list)
+            return [(r["trades"], r["equity_curve"], r["stats"]) for r in results]
+        return [run_backtest(config["runner"], data_m5, data_m30, params) for params in params_list]
+
+def group_combos(combos, vectorized_params, max_size=None, indices=None):
+    # Indices of combos that differ only in vectorized params, chunked to max_size
+    groups = {}
+    for i in (range(len(combos)) if indices is None else indices):
+        key = tuple((k, repr(v)) for k, v in combos[i].items() if k not in vectorized_params)
+        groups.setdefault(key, []).append(i)
+    if not vectorized_params:
+        max_size = 1
+    chunks = []
+    for group in groups.values():
+        size = max_size or len(group)
+        chunks.extend(group[j:j + size] for j in range(0, len(group), size))
+    return chunks
+
+# Per-process state for worker_pool workers, filled in once by _init_worker
+_worker = {}
+
+def _init_worker(strategy_name, m5_spec, m30_spec):
+    # A forked worker starts with the parent's open "workers" stage; time only its own
+    default_timer.reset()
+    m5_df, m5_shm = attach_frame(m5_spec)
+    m30_df, m30_shm = attach_frame(m30_spec)
+    _worker.update({
+        "config": get_strategy_config(strategy_name),
+        "m5": m5_df,
+        "m30": m30_df,
+        "shm": (m5_shm, m30_shm),
+    })
+
+@contextmanager
+def worker_pool(strategy_name, m5_df, m30_df, workers):
+    # Process pool whose workers attach the frames from shared memory once at start;
+    # its tasks read them with worker_data()
+    m5_spec, m5_shm = share_frame(m5_df)
+    m30_spec, m30_shm = share_frame(m30_df)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(strategy_name, m5_spec, m30_spec)) as pool:
+            yield pool
+    finally:
+        release(m5_shm)
+        release(m30_shm)
+
+def worker_data():
+    # (strategy config, M5 frame, M30 frame) inside a worker_pool task
+    return _worker["config"], _worker["m5"], _worker["m30"]
+
+def _run_group(group, params_list):
+    before = default_timer.snapshot()
+    outputs = run_batch_backtest(*worker_data(), params_list)
+    outputs = [(trades, list(equity), stats) for trades, equity, stats in outputs]
+    return group, outputs, (os.getpid(), default_cache.stats()), elapsed_since(before)
+
+def _record_timings(combo_timings, group, timings):
+    # A batch's stage times are split evenly over its combos
+    if combo_timings is not None:
+        for i in group:
+            combo_timings[i] = {name: seconds / len(group) for name, seconds in timings.items()}
+
+def _summary_row(combo, stats):
+    return {
+        "Parameters": combo,
+        "Total Trades": stats.get("total_trades", 0),
+        "Net Profit": stats.get("net_profit", 0),
+        "Win Rate": stats.get("win_rate", 0),
+        "Max Drawdown": stats.get("max_drawdown", 0),
+        "Max Drawdown %": stats.get("max_drawdown_pct", 0),
+        "Profit Factor": stats.get("profit_factor", 0),
+        "Expectancy": stats.get("expectancy", 0),
+        "Sharpe": stats.get("sharpe", 0),
+        "Sortino": stats.get("sortino", 0),
+    }
+
+def _describe_group(group, combos):
+    if len(group) == 1:
+        return f"combo {group[0]+1}/{len(combos)}: {combos[group[0]]}"
+    return f"{len(group)} combos as one batch (#{', #'.join(str(i+1) for i in group)} of {len(combos)})"
+
+def _sweep_serial(config, m5_df, m30_df, combos, pending, on_result, combo_timings=None):
+    for group in group_combos(combos, config.get("vectorized_params", []), indices=pending):
+        print(f"🔁 Running {_describe_group(group, combos)}")
+        try:
+            before = default_timer.snapshot()
+            outputs = run_batch_backtest(config, m5_df, m30_df, [combos[i] for i in group])
+            for i, (trades, equity, stats) in zip(group, outputs):
+                on_result(i, trades, equity, stats)
+            # Taken after on_result so the combos' result store writes count too
+            _record_timings(combo_timings, group, elapsed_since(before))
+        except Exception as e:
+            for i in group:
+                print(f"❌ Failed on combo {combos[i]}: {e}")
+    return default_cache.stats()
+
+def _sweep_parallel(strategy_name, config, m5_df, m30_df, combos, pending, on_result, workers, combo_timings=None,
+                    worker_timings=None):
+    # Worker stage times are CPU time summed over workers; they go to worker_timings,
+    # apart from this process's wall-clock stages
+    cache_stats = {}
+    # Split batches so every worker gets a share of a fully vectorizable grid
+    groups = group_combos(combos, config.get("vectorized_params", []),
+                          max_size=-(-len(pending) // workers), indices=pending)
+    with stage("workers"), worker_pool(strategy_name, m5_df, m30_df, workers) as pool:
+        futures = {pool.submit(_run_group, group, [combos[i] for i in group]): group for group in groups}
+        print(f"🚀 Dispatched {len(pending)} combos in {len(groups)} tasks to {workers} workers")
+        done = 0
+        for future in as_completed(futures):
+            group = futures[future]
+            done += len(group)
+            try:
+                _, outputs, (pid, worker_cache), timings = future.result()
+                cache_stats[pid] = worker_cache
+                if worker_timings is not None:
+                    for name, seconds in timings.items():
+                        worker_timings[name] = worker_timings.get(name, 0.0) + seconds
+                print(f"✅ Finished {_describe_group(group, combos)} ({done}/{len(pending)} done)")
+                before = default_timer.snapshot()
+                for i, (trades, equity, stats) in zip(group, outputs):
+                    on_result(i, trades, equity, stats)
+                # A combo's time: its worker stages plus its result store write here
+                own_io = {k: v for k, v in elapsed_since(before).items() if k != "workers"}
+                _record_timings(combo_timings, group, merge_timings([timings, own_io]))
+            except Exception as e:
+                for i in group:
+                    print(f"❌ Failed on combo {combos[i]}: {e}")
+    return merge_stats(cache_stats.values())
+
+# Sweep frames by (symbol, timeframe, data_path) with the candle store version they
+# were loaded from; a long-lived process (sweep_server.py) reuses them, and the
+# indicator cache entries keyed on them, until the store changes
+_sweep_data = {}
+
+def _store_version(symbol, timeframe, data_path):
+    meta = os.path.join(store_dir(symbol, timeframe, data_path), "meta.json")
+    if not os.path.exists(meta) or is_stale(symbol, timeframe, data_path):
+        return None
+    return os.path.getmtime(meta)
+
+def load_sweep_data(symbol, timeframe="M5", data_path="data"):
+    # M30 is cut to the span of the M5 slice so both cover the same bars
+    # (the base timeframe is a parameter; it is resampled from finer data when there is no export)
+    key = (symbol, timeframe, data_path)
+    version = (_store_version(symbol, timeframe, data_path), _store_version(symbol, "M30", data_path))
+    if key in _sweep_data and None not in version and _sweep_data[key][0] == version:
+        return _sweep_data[key][1]
+    m5_df = load_candles(symbol, timeframe, data_path).head(5000)
+    m30_df = same_span(m5_df, load_candles(symbol, "M30", data_path))
+    version = (_store_version(symbol, timeframe, data_path), _store_version(symbol, "M30", data_path))
+    _sweep_data[key] = (version, (m5_df, m30_df))
+    return m5_df, m30_df
+
+def run_parameter_sweep(strategy_name, symbol, data_path="data", output_path="output", workers=1,
+                        charts="all", top_k=5, resume=True, timeframe="M5", profile=0, robustness=0,
+                        simulations=DEFAULT_SIMULATIONS, fixed_params=None):
     config = get_strategy_config(strategy_name)
-    strategy_runner = config["runner"]
-    param_grid = config["params"]
-
-    # Load data
-    m5_file = f"{symbol}_Candlestick_5_M_BID_26.04.2023-26.04.2025.csv"
-    m30_file = f"{symbol}_Candlestick_30_M_BID_26.04.2023-26.04.2025.csv"
-
-    m5_df = pd.read_csv(
-        os.path.join(data_path, m5_file),
-        parse_dates=["Local time"],
-        index_col="Local time",
-        dayfirst=True
-    ).head(5000)
-
-    m30_df = pd.read_csv(
-        os.path.join(data_path, m30_file),
-        parse_dates=["Local time"],
-        index_col="Local time",
-        dayfirst=True
-    ).head(2000)
+    # fixed_params (e.g. the exit model) join every combo, and so its params hash
+    param_grid = {**config["params"], **{k: [v] for k, v in (fixed_params or {}).items()}}
+    default_timer.reset()
+
+    with stage("data_load"):
+        m5_df, m30_df = load_sweep_data(symbol, timeframe, data_path)
+    # Output files carry strategy and timeframe so concurrent sweeps on one symbol don't collide
+    label = f"{symbol}_{strategy_name}_{timeframe}"
 
     keys, values = zip(*param_grid.items())
     combos = [dict(zip(keys, v)) for v in product(*values)]
 
-    summary = []
     os.makedirs(output_path, exist_ok=True)
+    default_cache.reset_stats()
 
-    for i, combo in enumerate(combos):
-        print(f"🔁 Running combo {i+1}/{len(combos)}: {combo}")
-        try:
-            trades, equity, stats = run_backtest(strategy_runner, m5_df.copy(), m30_df.copy(), combo)
-
-            print(f"[DEBUG] Trades: {len(trades)} | Final Equity: {equity[-1] if equity else 'N/A'} | Net: {stats.get('net_profit', 0)}")
-
-            equity_series = pd.Series(equity)
-            equity_series.index = range(len(equity_series))
-
-            summary.append({
-                "Parameters": combo,
-                "Total Trades": stats.get("total_trades", 0),
-                "Net Profit": stats.get("net_profit", 0),
-                "Win Rate": stats.get("win_rate", 0),
-                "Max Drawdown": stats.get("max_drawdown", 0),
-            })
-
-            # Save equity chart
-            chart_filename = f"{symbol}_combo_{i+1}_equity.png"
-            chart_path = os.path.join(output_path, chart_filename)
-            print(f"[DEBUG] Saving chart to: {chart_path}")
-
-            plt.figure(figsize=(10, 4))
-            plt.plot(equity_series)
-            plt.title(f"Equity Curve - {symbol} - Combo {i+1}")
-            plt.xlabel("Trade #")
-            plt.ylabel("Equity ($)")
-            plt.grid(True)
-            plt.tight_layout()
-            plt.savefig(chart_path)
-            plt.close()
+    # Reuse results stored by earlier (possibly interrupted) runs of the same code and data
+    with stage("chart_io"):
+        store = ResultStore(os.path.join(output_path, DEFAULT_STORE))
+        strategy_key = strategy_hash(config["module"])
+        data_key = data_hash(m5_df, m30_df)
+        results = {}
+        if resume:
+            for i, combo in enumerate(combos):
+                stored = store.get(strategy_key, symbol, data_key, combo)
+                if stored is not None:
+                    stats, equity = stored
+                    results[i] = (_summary_row(combo, stats), equity)
+    pending = [i for i in range(len(combos)) if i not in results]
+    print(f"♻️ Reusing {len(results)} stored results, running {len(pending)} of {len(combos)} combos")
+    # Machine-readable progress for the dashboard's job queue
+    progress = {"done": 0}
+    trade_profits = {}
+    print(f"[PROGRESS] 0/{len(pending)}", flush=True)
 
-        except Exception as e:
-            print(f"❌ Failed on combo {combo}: {e}")
+    def on_result(i, trades, equity, stats):
+        print(f"[DEBUG] Trades: {len(trades)} | Final Equity: {equity[-1] if len(equity) else 'N/A'} | Net: {stats.get('net_profit', 0)}")
+        results[i] = (_summary_row(combos[i], stats), equity)
+        trade_profits[i] = np.array([t["profit"] for t in trades], dtype="float64")
+        progress["done"] += 1
+        print(f"[PROGRESS] {progress['done']}/{len(pending)}", flush=True)
+        with stage("chart_io"):
+            store.put(strategy_name, strategy_key, symbol, data_key, combos[i], stats, equity, timeframe)
+
+    combo_timings = {}
+    worker_timings = {}
+    try:
+        if not pending:
+            cache_stats = default_cache.stats()
+        elif workers and workers > 1:
+            cache_stats = _sweep_parallel(strategy_name, config, m5_df, m30_df, combos, pending, on_result, workers,
+                                          combo_timings, worker_timings)
+        else:
+            cache_stats = _sweep_serial(config, m5_df, m30_df, combos, pending, on_result, combo_timings)
+    finally:
+        store.close()
+
+    # Keep summary rows in grid order regardless of completion order
+    summary = [results[i][0] for i in sorted(results)]
+    print(f"🧮 Indicator cache: {format_stats(cache_stats)}")
+
+    with stage("chart_io"):
+        # Save summary file
+        summary_df = pd.DataFrame(summary)
+        summary_csv = os.path.join(output_path, f"{label}_summary.csv")
+        print(f"[DEBUG] Saving summary to: {summary_csv}")
+        summary_df.to_csv(summary_csv, index=False)
+
+        # Persist raw equity curves, then render charts as a separate stage
+        curves = {i + 1: results[i][1] for i in sorted(results)}
+        equity_file = save_equity_curves(equity_path(output_path, label), curves)
+        print(f"[DEBUG] Saving equity curves to: {equity_file}")
+        render_charts(curves, label, output_path, charts, top_k)
+
+    if robustness and results:
+        # Monte Carlo robustness of the top combos by net profit; stored results
+        # only keep per-bar equity, whose non-zero steps stand in for their trades
+        with stage("robustness"):
+            order = sorted(results)
+            picks = [order[k] for k in top_combos([results[i][0] for i in order], robustness)]
+            combo_profits = {}
+            for i in picks:
+                steps = np.diff(np.asarray(results[i][1], dtype="float64"))
+                combo_profits[i + 1] = trade_profits.get(i, steps[steps != 0])
+            report = robustness_report(combo_profits, {i + 1: combos[i] for i in picks}, simulations, workers=workers)
+            robustness_csv = os.path.join(output_path, f"{label}_robustness.csv")
+            report.to_csv(robustness_csv, index=False)
+        print(f"🎲 Robustness of the top {len(picks)} combos ({simulations} simulations per scenario):\n"
+              f"{report[['Combo', 'Net Profit', 'Bootstrap Net p5', 'Shuffle Max DD p95', 'Bootstrap Ruin %']].head(5).to_string(index=False)}")
+        print(f"[DEBUG] Saving robustness report to: {robustness_csv}")
 
-    # Save summary file
-    summary_df = pd.DataFrame(summary)
-    summary_csv = os.path.join(output_path, f"{symbol}_summary.csv")
-    print(f"[DEBUG] Saving summary to: {summary_csv}")
-    summary_df.to_csv(summary_csv, index=False)
+    # Where the sweep time went, overall and for the slowest combos
+    # The one data load is shared evenly by the combos that ran
+    data_load = default_timer.snapshot().get("data_load", 0.0)
+    numbered = {i + 1: {**t, "data_load": data_load / len(combo_timings)} for i, t in combo_timings.items()}
+    print(f"⏱️ Stage timings:\n{format_report(default_timer.snapshot(), numbered, worker_totals=worker_timings)}")
+    timings_csv = os.path.join(output_path, f"{label}_timings.csv")
+    pd.DataFrame([{"Combo": c, "Parameters": combos[c - 1], **t} for c, t in sorted(numbered.items())]).to_csv(timings_csv, index=False)
+    print(f"[DEBUG] Saving stage timings to: {timings_csv}")
 
+    if profile and numbered:
+        # Profile the slowest combos again, one by one and from a cold indicator cache
+        for c in sorted(numbered, key=lambda c: -sum(numbered[c].values()))[:profile]:
+            default_cache.clear()
+            profile_path = os.path.join(output_path, f"{label}_profile_combo_{c}.prof")
+            report = profile_call(lambda: run_batch_backtest(config, m5_df, m30_df, [combos[c - 1]]), profile_path)
+            print(f"🔬 Profile of combo {c} {combos[c - 1]} saved to {profile_path}\n{report}")
@@ -0,0 +1,17 @@
+# tuner_options.py
+# Choice lists shared by the engine modules and the tuner_runner.py command
+# line, plus CLI defaults. Kept free of numpy/pandas imports so the runner can parse arguments (and
+# print --help) before it imports the engine.
+
+# Which equity charts a sweep renders (chart_renderer.py)
+CHART_MODES = ["none", "top-k", "all"]
+
+# Parameter-space searches (optimizer.py)
+METHODS = ["random", "halving", "hyperband", "tpe"]
+
+# Exit models of kernel strategies (backtest_kernel.py)
+FILL_MODES = ["intrabar", "close"]
+AMBIGUOUS_RULES = ["sl", "tp", "ohlc"]
+
+# Monte Carlo simulations per scenario and combo (monte_carlo.py)
+DEFAULT_SIMULATIONS = 2000
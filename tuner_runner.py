@@ -1,13 +1,59 @@
 # tuner_runner.py
+# When a sweep daemon (sweep_server.py) is listening for this project the command
+# runs there and this process only relays its output; otherwise it runs here,
+# importing the engine only once the arguments are parsed.
+import sys
 import argparse
-from tuner_engine import run_parameter_sweep
+import sweep_server
+from tuner_options import CHART_MODES, METHODS, FILL_MODES, AMBIGUOUS_RULES, DEFAULT_SIMULATIONS
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="tuner_runner.py")
     parser.add_argument("--strategy", required=True, help="Name of strategy module to run")
     parser.add_argument("--symbol", required=False, help="Optional symbol to override default (e.g., USDJPY)")
-    args = parser.parse_args()
+    parser.add_argument("--timeframe", nargs="+", default=["M5"], help="Base timeframe(s) to sweep, e.g. M5 M15 H1 (resampled when no export exists)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes for the sweep (default: 1, serial)")
+    parser.add_argument("--charts", choices=CHART_MODES, default="all", help="Which equity charts to render after the sweep")
+    parser.add_argument("--top-k", type=int, default=5, help="Number of best combos to chart with --charts top-k")
+    parser.add_argument("--profile", type=int, nargs="?", const=3, default=0, help="cProfile the N slowest combos after the sweep (default N: 3)")
+    parser.add_argument("--robustness", type=int, nargs="?", const=20, default=0, help="Monte Carlo robustness of the N best combos after the sweep (default N: 20)")
+    parser.add_argument("--simulations", type=int, default=DEFAULT_SIMULATIONS, help="Monte Carlo simulations per scenario and combo (~50 ms per 300-trade combo at the default)")
+    parser.add_argument("--rerun", action="store_true", help="Ignore stored results and recompute every combo")
+    parser.add_argument("--optimizer", choices=METHODS, help="Search the parameter space instead of sweeping the full grid")
+    parser.add_argument("--trials", type=int, help="Optimizer budget in backtests")
+    parser.add_argument("--time-budget", type=float, help="Optimizer budget in wall-clock seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Optimizer random seed")
+    parser.add_argument("--fill", choices=FILL_MODES, help="Exit fills for kernel strategies (default: intrabar high/low)")
+    parser.add_argument("--spread", type=float, help="Bid/ask spread in price units for intrabar fills (e.g. 0.02 for USDJPY)")
+    parser.add_argument("--ambiguous", choices=AMBIGUOUS_RULES, help="Outcome of a bar touching both TP and SL (default: sl)")
+    parser.add_argument("--local", action="store_true", help="Run in this process even when a sweep daemon is listening")
+    return parser
+
 
-    # Pass symbol override to tuner_engine
-    run_parameter_sweep(args.strategy, symbol=args.symbol)
+def main(argv):
+    args = build_parser().parse_args(argv)
+    # Exit-model options join every combo's params
+    fixed_params = {k: v for k, v in (("fill", args.fill), ("spread", args.spread), ("ambiguous", args.ambiguous)) if v is not None}
 
+    if args.optimizer:
+        from optimizer import run_optimization
+        run_optimization(args.strategy, args.symbol, args.optimizer, args.trials, args.time_budget, seed=args.seed,
+                         fixed_params=fixed_params)
+    else:
+        from tuner_engine import run_parameter_sweep
+        # Pass symbol override to tuner_engine
+        for timeframe in args.timeframe:
+            run_parameter_sweep(args.strategy, symbol=args.symbol, workers=args.workers,
+                                charts=args.charts, top_k=args.top_k, resume=not args.rerun, timeframe=timeframe,
+                                profile=args.profile, robustness=args.robustness, simulations=args.simulations,
+                                fixed_params=fixed_params)
+
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    returncode = None if "--local" in argv else sweep_server.forward(argv)
+    if returncode is None:
+        main(argv)
+    else:
+        raise SystemExit(returncode)
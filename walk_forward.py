@@ -0,0 +1,199 @@
+# walk_forward.py
+# Walk-forward optimization: tune on rolling train windows, trade the winner
+# on the following unseen test window.
+#
+# Every fold runs on the full M5/M30 frames with only the trading window set
+# (attrs["window"], see backtest_kernel.trading_window). Indicators are causal,
+# so nothing after a window leaks into it, and every fold hits the same
+# indicator cache entries instead of recomputing them for its own slice.
+#
+#     python walk_forward.py --strategy rci_strategy --symbol USDJPY --folds 6 --workers 4
+
+import os
+import argparse
+from itertools import product
+from collections import Counter
+from concurrent.futures import as_completed
+import numpy as np
+import pandas as pd
+from strategies import get_strategy_config
+from candle_store import load_candles
+from indicator_cache import default_cache, merge_stats, format_stats
+from backtest_kernel import INITIAL_BALANCE
+from tuner_engine import run_batch_backtest, group_combos, worker_pool, worker_data
+
+
+def make_folds(n_bars, folds=5, train_bars=None, test_bars=None):
+    # Rolling (train_start, train_end, test_end) bar ranges; the test window is [train_end, test_end)
+    test_bars = test_bars or n_bars // (folds + 3)
+    train_bars = train_bars or 3 * test_bars
+    windows = []
+    start = 0
+    while start + train_bars + test_bars <= n_bars and len(windows) < folds:
+        windows.append((start, start + train_bars, start + train_bars + test_bars))
+        start += test_bars
+    return windows
+
+
+def windowed(df, first, end):
+    # Same data (and indicator cache keys), different trading window
+    view = df.copy(deep=False)
+    view.attrs["window"] = (first, end)
+    return view
+
+
+def best_combo(config, m5_df, m30_df, combos, metric="net_profit"):
+    scores = np.full(len(combos), -np.inf)
+    for group in group_combos(combos, config.get("vectorized_params", [])):
+        try:
+            outputs = run_batch_backtest(config, m5_df, m30_df, [combos[i] for i in group])
+        except Exception as e:
+            print(f"❌ Failed on {[combos[i] for i in group]}: {e}")
+            continue
+        for i, (_, _, stats) in zip(group, outputs):
+            scores[i] = stats.get(metric, -np.inf)
+    best = int(np.argmax(scores))
+    return combos[best], float(scores[best])
+
+
+def run_fold(config, m5_df, m30_df, combos, fold, window, metric="net_profit"):
+    train_start, train_end, test_end = window
+    params, in_sample = best_combo(config, windowed(m5_df, train_start, train_end), m30_df, combos, metric)
+    trades, _, stats = run_batch_backtest(config, windowed(m5_df, train_end, test_end), m30_df, [params])[0]
+    return {
+        "fold": fold,
+        "window": window,
+        "params": params,
+        "in_sample": in_sample,
+        "stats": stats,
+        "exits": [(t["exit_time"], t["profit"]) for t in trades],
+    }
+
+
+def _run_fold_task(combos, fold, window, metric):
+    result = run_fold(*worker_data(), combos, fold, window, metric)
+    return result, (os.getpid(), default_cache.stats())
+
+
+def stability_report(fold_results):
+    rows = []
+    for name in fold_results[0]["params"]:
+        values = [r["params"][name] for r in fold_results]
+        value, count = Counter(map(repr, values)).most_common(1)[0]
+        row = {
+            "Parameter": name,
+            "Values": values,
+            "Distinct": len(set(map(repr, values))),
+            "Most Common": value,
+            "Share": count / len(values),
+        }
+        if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            mean = float(np.mean(values))
+            row["Mean"] = mean
+            row["Std"] = float(np.std(values))
+            row["CV"] = row["Std"] / abs(mean) if mean else np.nan
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def oos_equity(fold_results, index):
+    # Test windows placed end to end; realized balance after every test bar
+    bars, balance = [], []
+    running = INITIAL_BALANCE
+    for r in sorted(fold_results, key=lambda r: r["fold"]):
+        _, first, end = r["window"]
+        realized = np.zeros(end - first)
+        for exit_time, profit in r["exits"]:
+            realized[index.searchsorted(exit_time) - first] += profit
+        curve = running + np.cumsum(realized)
+        running = curve[-1] if len(curve) else running
+        bars.append(np.arange(first, end))
+        balance.append(curve)
+    bars = np.concatenate(bars) if bars else np.zeros(0, dtype="int64")
+    return pd.DataFrame({"Equity": np.concatenate(balance) if balance else []}, index=index[bars])
+
+
+def run_walk_forward(strategy_name, symbol, data_path="data", output_path="output", folds=5,
+                     train_bars=None, test_bars=None, workers=1, metric="net_profit"):
+    config = get_strategy_config(strategy_name)
+    keys, values = zip(*config["params"].items())
+    combos = [dict(zip(keys, v)) for v in product(*values)]
+
+    m5_df = load_candles(symbol, "M5", data_path)
+    m30_df = load_candles(symbol, "M30", data_path)
+    windows = make_folds(len(m5_df), folds, train_bars, test_bars)
+    if not windows:
+        raise ValueError(f"Not enough data for {folds} folds ({len(m5_df)} M5 bars)")
+    print(f"🧭 Walk-forward {strategy_name} on {symbol}: {len(windows)} folds x {len(combos)} combos, "
+          f"train {windows[0][1] - windows[0][0]} / test {windows[0][2] - windows[0][1]} bars")
+
+    default_cache.reset_stats()
+    fold_results = []
+    cache_stats = {}
+
+    def report(result):
+        fold_results.append(result)
+        train_start, train_end, test_end = result["window"]
+        print(f"✅ Fold {result['fold']}: train {m5_df.index[train_start]} → {m5_df.index[train_end - 1]}, "
+              f"best {result['params']} ({metric} {result['in_sample']:.2f}), "
+              f"out-of-sample net {result['stats'].get('net_profit', 0):.2f} over {result['stats'].get('total_trades', 0)} trades")
+
+    if workers and workers > 1:
+        with worker_pool(strategy_name, m5_df, m30_df, min(workers, len(windows))) as pool:
+            futures = [pool.submit(_run_fold_task, combos, k + 1, window, metric) for k, window in enumerate(windows)]
+            for future in as_completed(futures):
+                result, (pid, worker_cache) = future.result()
+                cache_stats[pid] = worker_cache
+                report(result)
+        cache_stats = merge_stats(cache_stats.values())
+    else:
+        for k, window in enumerate(windows):
+            report(run_fold(config, m5_df, m30_df, combos, k + 1, window, metric))
+        cache_stats = default_cache.stats()
+    print(f"🧮 Indicator cache: {format_stats(cache_stats)}")
+
+    fold_results.sort(key=lambda r: r["fold"])
+    os.makedirs(output_path, exist_ok=True)
+    prefix = os.path.join(output_path, f"{symbol}_{strategy_name}_walk_forward")
+
+    folds_df = pd.DataFrame([{
+        "Fold": r["fold"],
+        "Train Start": m5_df.index[r["window"][0]],
+        "Test Start": m5_df.index[r["window"][1]],
+        "Test End": m5_df.index[r["window"][2] - 1],
+        "Parameters": r["params"],
+        f"In-Sample {metric}": r["in_sample"],
+        "OOS Trades": r["stats"].get("total_trades", 0),
+        "OOS Net Profit": r["stats"].get("net_profit", 0),
+        "OOS Win Rate": r["stats"].get("win_rate", 0),
+    } for r in fold_results])
+    folds_df.to_csv(f"{prefix}_folds.csv", index=False)
+
+    stability = stability_report(fold_results)
+    stability.to_csv(f"{prefix}_stability.csv", index=False)
+
+    equity = oos_equity(fold_results, m5_df.index)
+    equity.to_csv(f"{prefix}_equity.csv", index_label="timestamp")
+
+    print("📊 Parameter stability across folds:")
+    print(stability[["Parameter", "Distinct", "Most Common", "Share"]].to_string(index=False))
+    final = equity["Equity"].iloc[-1] if len(equity) else INITIAL_BALANCE
+    print(f"🏁 Out-of-sample: {folds_df['OOS Trades'].sum()} trades, "
+          f"net {final - INITIAL_BALANCE:.2f}, final equity {final:.2f}")
+    print(f"[DEBUG] Saving walk-forward reports to: {prefix}_*.csv")
+    return folds_df, stability, equity
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--strategy", required=True, help="Name of a registered strategy")
+    parser.add_argument("--symbol", required=True, help="Symbol to test, e.g. USDJPY")
+    parser.add_argument("--folds", type=int, default=5, help="Number of walk-forward folds")
+    parser.add_argument("--train-bars", type=int, help="M5 bars per train window (default: 3x the test window)")
+    parser.add_argument("--test-bars", type=int, help="M5 bars per test window (default: history / (folds + 3))")
+    parser.add_argument("--workers", type=int, default=1, help="Processes running folds in parallel")
+    parser.add_argument("--metric", default="net_profit", help="Stat the train windows are tuned on")
+    args = parser.parse_args()
+
+    run_walk_forward(args.strategy, args.symbol, folds=args.folds, train_bars=args.train_bars,
+                     test_bars=args.test_bars, workers=args.workers, metric=args.metric)
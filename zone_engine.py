@@ -0,0 +1,56 @@
+# zone_engine.py
+# Price-indexed book of active liquidation zones.
+#
+# Zones are kept sorted by their lower bound. A zone can only contain a price p
+# if its bot lies in [p - widest zone, p), so each lookup bisects to that slice
+# instead of scanning every zone ever created. Triggered zones are removed from
+# the book, so inactive zones cost nothing on later bars.
+
+from bisect import bisect_left, bisect_right
+
+
+class ZoneBook:
+    def __init__(self):
+        self.bots = []    # sorted lower bounds, parallel to self.zones
+        self.zones = []
+        self.max_width = 0.0
+        self.created = 0
+
+    def __len__(self):
+        return len(self.zones)
+
+    def add(self, bot, top, kind, strength=0.0):
+        zone = {
+            "id": self.created,
+            "top": top,
+            "bot": bot,
+            "type": kind,
+            "strength": strength,
+        }
+        self.created += 1
+        # A zone with no width (or NaN bounds) can never contain a price
+        if not top > bot:
+            return zone
+        # Later zones go after equal bots so ties keep creation order
+        pos = bisect_right(self.bots, bot)
+        self.bots.insert(pos, bot)
+        self.zones.insert(pos, zone)
+        self.max_width = max(self.max_width, top - bot)
+        return zone
+
+    def trigger(self, price):
+        # Remove and return every zone with bot < price < top, oldest first
+        lo = bisect_left(self.bots, price - self.max_width)
+        hi = bisect_left(self.bots, price)
+        hit = [pos for pos in range(lo, hi) if self.zones[pos]["top"] > price]
+        if not hit:
+            return []
+
+        triggered = [self.zones[pos] for pos in hit]
+        for pos in reversed(hit):
+            del self.bots[pos]
+            del self.zones[pos]
+        if not self.zones:
+            self.max_width = 0.0
+        triggered.sort(key=lambda zone: zone["id"])
+        return triggered